@@ -0,0 +1,260 @@
+'''
+Characteristic curves (mass flow rate in function of pressure) of all measurement cases.
+
+Curves of all cases are fitted at once, as batched NumPy computation over matrices cases x files of mean pressure and
+mass flow rate (pressure_avr and mass_flow_avr of data_arr, see also result_container.case_matrix).
+Cases can have different number of files, missing values (NaN) are skipped. Models:
+- 'polynomial' - m = a0 + a1*P + ... + an*P^n (degree n), least squares of all cases at once,
+- 'sqrt' - flow coefficient, m = C*sqrt(P-P_ref), where P_ref is reference (ambient) pressure,
+- 'power' - m = C*(P-P_ref)^k, fitted as line in log-log scale.
+P is in bar inside of the models (parameters are given for pressure in bar), but all functions take pressure in Pa,
+the same as pressure_avr.
+
+    curves = characteristic_curves.fit(pressure_avr,mass_flow_avr,cases_list,model='sqrt')
+    curves.save('campaign.curves.json') # or fit_cached, see below
+    curves.predict('case_1',4e5)        # predicted mass flow rate [g/s] of case_1 at 4 bar
+    curves.interpolate('case_1',4e5)    # linear interpolation between measured points
+
+fit_cached saves the curves with fingerprint of measurement files (paths, size and modification time of files of every case,
+as result_cache does), model and analysis parameters. As long as the files are not changed, the curves are loaded
+from the file without reading measurement files (mass_flow_rate_analysis.curves_from_dir).
+The default cache file is saved next to the list of measurement cases (see curves_path).
+Parameters, R2 and RMSE of a case are NaN if it has too few points to determine the curve: less than degree+1 different
+pressures (polynomial), no point above reference pressure (sqrt), less than 2 such points with positive mass flow rate (power).
+'''
+import os
+import json
+import hashlib
+import numpy as np
+
+models=('polynomial','sqrt','power')
+pressure_scale=100000 # Pa -> bar
+fit_version=2 # part of fingerprint of cached curves (see fit_cached), it has to be increased when results of fit change
+
+
+def batched_polyfit(x,y,mask,degree):
+    '''Least squares polynomial of all rows at once.
+    Input:
+    x, y - matrices (rows x points)
+    mask - matrix of points used by the fit (other points can be NaN)
+    Returns coefficients (rows x degree+1), from constant term. Coefficients of a row are NaN if it has less than degree+1
+    different x values, such polynomial is not determined (pinv would return meaningless minimum norm solution).
+    '''
+    x=np.where(mask,x,0.0)
+    sorted_x=np.sort(np.where(mask,x,np.nan),axis=1) # NaN at the end
+    nb_of_distinct=np.sum(np.diff(sorted_x,axis=1) > 0,axis=1)+mask.any(axis=1)
+    vandermonde=x[...,None]**np.arange(degree+1)*mask[...,None] # skipped points are zero rows
+    coefficients=(np.linalg.pinv(vandermonde)@np.where(mask,y,0.0)[...,None])[...,0]
+    coefficients[nb_of_distinct < degree+1]=np.nan
+    return coefficients
+
+def polynomial_value(coefficients,x):
+    '''Value of polynomials (rows x degree+1) at points x (rows x points or points, the same for all rows)'''
+    x=np.asarray(x,dtype=float)
+    if x.ndim < 2:
+        x=np.broadcast_to(x,(len(coefficients),)+x.shape)
+    result=np.zeros(x.shape)
+    for idx in range(coefficients.shape[1]-1,-1,-1): # Horner scheme
+        result=result*x+coefficients[:,idx].reshape((-1,)+(1,)*(x.ndim-1))
+    return result
+
+def model_value(model,parameters,options,pressure):
+    '''Mass flow rate [g/s] of curves (parameters - rows x parameters) at pressure [Pa]: value, points (the same for all rows)
+    or matrix rows x points. Returns matrix rows x points'''
+    pressure=np.asarray(pressure,dtype=float)
+    if pressure.ndim == 0:
+        pressure=pressure[None]
+    if model == 'polynomial':
+        return polynomial_value(parameters,pressure/pressure_scale)
+    delta=np.clip((pressure-options['reference_pressure'])/pressure_scale,0,None)
+    if delta.ndim < 2:
+        delta=np.broadcast_to(delta,(len(parameters),)+delta.shape)
+    if model == 'sqrt':
+        return parameters[:,:1]*np.sqrt(delta)
+    return parameters[:,:1]*delta**parameters[:,1:2]
+
+
+class characteristic_curves:
+    def __init__(self,cases_list,model,parameters,options,r2,rmse,points,fingerprint=None):
+        '''
+        Input:
+        cases_list - names of cases
+        model - name of the model, see models
+        parameters - fitted parameters (cases x parameters): polynomial - a0...an, sqrt - C, power - C, k
+        options - degree (polynomial) or reference_pressure [Pa] (sqrt, power)
+        r2, rmse - coefficient of determination and root mean square error [g/s] of every case
+        points - measured mean pressure [Pa] and mass flow rate of every case, (pressure,mass_flow) matrices sorted by pressure
+        fingerprint - hash of measurement files, model and parameters, see fit_fingerprint
+        '''
+        self.cases_list=list(cases_list)
+        self.model=model
+        self.parameters=np.asarray(parameters,dtype=float)
+        self.options=dict(options)
+        self.r2=np.asarray(r2,dtype=float)
+        self.rmse=np.asarray(rmse,dtype=float)
+        self.points=tuple(np.asarray(matrix,dtype=float) for matrix in points)
+        self.fingerprint=fingerprint
+        self.case_index={case:idx for idx,case in enumerate(self.cases_list)}
+
+    @classmethod
+    def fit(cls,pressure_avr,mass_flow_avr,cases_list,model='polynomial',degree=2,reference_pressure=101325.0):
+        '''
+        Fit curves of all cases.
+        Input:
+        pressure_avr, mass_flow_avr - matrices cases x files (mean pressure [Pa] and mass flow rate [g/s] of every file), NaN - no file
+        model - 'polynomial', 'sqrt' or 'power'
+        degree - degree of polynomial
+        reference_pressure - reference (ambient) pressure [Pa] of sqrt and power models
+        '''
+        if model not in models:
+            raise ValueError('Unknown model: '+str(model)+', available: '+str(models))
+        pressure=np.atleast_2d(np.asarray(pressure_avr,dtype=float))
+        mass_flow=np.atleast_2d(np.asarray(mass_flow_avr,dtype=float))
+        mask=np.isfinite(pressure) & np.isfinite(mass_flow)
+        options=model_options(model,degree,reference_pressure)
+        if model == 'polynomial':
+            parameters=batched_polyfit(pressure/pressure_scale,mass_flow,mask,int(degree))
+        else:
+            delta=(pressure-reference_pressure)/pressure_scale
+            if model == 'sqrt':
+                root=np.sqrt(np.where(mask & (delta > 0),delta,0.0))
+                with np.errstate(invalid='ignore',divide='ignore'):
+                    parameters=(np.sum(np.where(mask,mass_flow,0.0)*root,axis=1)/np.sum(root**2,axis=1))[:,None]
+            else:
+                fitted=mask & (delta > 0) & (mass_flow > 0)
+                with np.errstate(invalid='ignore',divide='ignore'):
+                    line=batched_polyfit(np.log(delta),np.log(mass_flow),fitted,1)
+                parameters=np.column_stack((np.exp(line[:,0]),line[:,1]))
+        order=np.argsort(np.where(mask,pressure,np.inf),axis=1) # NaN at the end
+        points=(np.take_along_axis(np.where(mask,pressure,np.nan),order,axis=1),np.take_along_axis(np.where(mask,mass_flow,np.nan),order,axis=1))
+        curves=cls(cases_list,model,parameters,options,np.full(len(pressure),np.nan),np.full(len(pressure),np.nan),points)
+        residuals=np.where(mask,mass_flow-curves.predict_all(pressure),0.0)
+        nb_of_points=mask.sum(axis=1)
+        with np.errstate(invalid='ignore',divide='ignore'):
+            curves.rmse=np.sqrt(np.sum(residuals**2,axis=1)/nb_of_points)
+            mean=np.sum(np.where(mask,mass_flow,0.0),axis=1)/nb_of_points
+            curves.r2=1-np.sum(residuals**2,axis=1)/np.sum(np.where(mask,mass_flow-mean[:,None],0.0)**2,axis=1)
+        # zero variance of mass flow rate: R2 is 1 if the curve passes through the points, otherwise it is not defined
+        constant=np.max(np.where(mask,mass_flow,-np.inf),axis=1) == np.min(np.where(mask,mass_flow,np.inf),axis=1)
+        curves.r2[constant]=np.where(curves.rmse[constant] <= 1e-9*np.abs(mean[constant]),1.0,np.nan)
+        not_fitted=~np.all(np.isfinite(parameters),axis=1) # too few points
+        curves.r2[not_fitted]=np.nan
+        curves.rmse[not_fitted]=np.nan
+        return curves
+
+    def predict_all(self,pressure):
+        '''Predicted mass flow rate [g/s] of all cases at pressure [Pa]: value, points (the same for all cases)
+        or matrix cases x points. Returns matrix cases x points (cases x 1 for single value)'''
+        return model_value(self.model,self.parameters,self.options,pressure)
+
+    def predict(self,case,pressure):
+        '''Predicted mass flow rate [g/s] of the case (name) at pressure [Pa] (value or array)'''
+        idx=self.case_index[case]
+        pressure=np.asarray(pressure,dtype=float)
+        result=model_value(self.model,self.parameters[idx:idx+1],self.options,pressure.reshape(-1))[0]
+        return result.reshape(pressure.shape) if pressure.ndim else result[0]
+
+    def interpolate(self,case,pressure):
+        '''Mass flow rate [g/s] of the case at pressure [Pa], linear interpolation between measured points
+        (mean values of files), outside of the measured range values of the first and the last point are returned'''
+        idx=self.case_index[case]
+        measured_pressure,measured_mass_flow=self.points
+        valid=np.isfinite(measured_pressure[idx])
+        return np.interp(pressure,measured_pressure[idx][valid],measured_mass_flow[idx][valid])
+
+    def pressure_range(self,case):
+        '''Minimum and maximum measured pressure [Pa] of the case'''
+        pressure=self.points[0][self.case_index[case]]
+        return np.nanmin(pressure),np.nanmax(pressure)
+
+    def parameter_names(self):
+        if self.model == 'polynomial':
+            return ['a'+str(idx) for idx in range(self.parameters.shape[1])]
+        if self.model == 'sqrt':
+            return ['C']
+        return ['C','k']
+
+    def table(self):
+        '''Parameters and quality of fit of all cases as rows (see to_frame)'''
+        header=['Case']+self.parameter_names()+['R2','RMSE [g/s]']
+        rows=[[case]+self.parameters[idx].tolist()+[self.r2[idx],self.rmse[idx]] for idx,case in enumerate(self.cases_list)]
+        return header,rows
+
+    def to_frame(self):
+        import pandas as pd
+        header,rows=self.table()
+        return pd.DataFrame(rows,columns=header).set_index('Case')
+
+    def to_dict(self):
+        nan_to_none=lambda matrix: np.where(np.isfinite(matrix),matrix,None).tolist() # JSON has no NaN
+        return {'cases_list':self.cases_list,'model':self.model,'options':self.options,'fingerprint':self.fingerprint,
+                'parameters':nan_to_none(self.parameters),'r2':nan_to_none(self.r2),'rmse':nan_to_none(self.rmse),
+                'points':[nan_to_none(matrix) for matrix in self.points]}
+
+    @classmethod
+    def from_dict(cls,data):
+        to_array=lambda values: np.array(values,dtype=float) # None -> NaN
+        return cls(data['cases_list'],data['model'],to_array(data['parameters']),data['options'],to_array(data['r2']),to_array(data['rmse']),
+                   [to_array(matrix) for matrix in data['points']],data.get('fingerprint'))
+
+    def save(self,path):
+        temp_path=path+'.tmp'
+        with open(temp_path,'w') as f:
+            json.dump(self.to_dict(),f,indent=1)
+        os.replace(temp_path,path)
+
+    @classmethod
+    def load(cls,path):
+        with open(path) as f:
+            return cls.from_dict(json.load(f))
+
+
+def curves_path(dir_list_path):
+    '''Default file of fitted curves, next to the list of measurement cases, e.g. direcory_list.curves.json'''
+    return os.path.splitext(dir_list_path)[0]+'.curves.json'
+
+def model_options(model,degree=2,reference_pressure=101325.0):
+    return {'degree':int(degree)} if model == 'polynomial' else {'reference_pressure':float(reference_pressure)}
+
+def fit_fingerprint(case_files,model,options,parameters=()):
+    '''Hash of measurement files, model and analysis parameters, fitted curves are valid as long as it is the same.
+    Input:
+    case_files - dictionary: case name - list of paths of measurement files
+    parameters - analysis parameters which change mean pressure or mass flow rate (e.g. columns, window size)
+    Only identities of files (path, size, modification time) are used, the files are not read.
+    '''
+    files=list()
+    for case,paths in case_files.items():
+        for file_path in paths:
+            stat=os.stat(file_path)
+            files.append([case,os.path.abspath(file_path),stat.st_size,stat.st_mtime_ns])
+    return hashlib.sha1(json.dumps([fit_version,list(case_files),files,model,options,list(parameters)]).encode()).hexdigest()
+
+def load_valid(path,fingerprint):
+    '''Curves from the file if they have given fingerprint, otherwise None (missing, damaged or not valid file)'''
+    if not os.path.exists(path):
+        return None
+    try:
+        curves=characteristic_curves.load(path)
+    except (ValueError,KeyError): # damaged file is replaced
+        return None
+    return curves if curves.fingerprint == fingerprint else None
+
+def fit_cached(path,case_files,fit_data,model='polynomial',degree=2,reference_pressure=101325.0,parameters=()):
+    '''characteristic_curves.fit with results saved in JSON file (path). If the file has curves of the same measurement files,
+    model and parameters (see fit_fingerprint), they are returned without reading the files and fitting, otherwise
+    fit_data() is called, curves are fitted and saved.
+    Input:
+    case_files - dictionary: case name - list of paths of measurement files
+    fit_data - function returning pressure_avr and mass_flow_avr (matrices cases x files) of the files, e.g. from data_container
+    Returns curves and True if they were taken from the file.'''
+    options=model_options(model,degree,reference_pressure)
+    fingerprint=fit_fingerprint(case_files,model,options,parameters)
+    curves=load_valid(path,fingerprint)
+    if curves is not None:
+        return curves,True
+    pressure_avr,mass_flow_avr=fit_data()
+    curves=characteristic_curves.fit(pressure_avr,mass_flow_avr,list(case_files),model,degree,reference_pressure)
+    curves.fingerprint=fingerprint
+    curves.save(path)
+    return curves,False
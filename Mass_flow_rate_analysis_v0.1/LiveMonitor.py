@@ -0,0 +1,186 @@
+'''
+Live analysis of measurement files which are still written by the acquisition system.
+
+Directories of measurement cases (see direcory_list.json) are checked periodically (polling).
+New files are detected and for files which grow only appended bytes are read. Only complete lines are parsed,
+the rest is read in the next check. File which is replaced (other inode), truncated or rewritten (bytes before the reading position changed)
+is read again from the beginning. New samples are added to window function (see StreamingWindow),
+so the window table and summary of cases (mass flow rate, pressure) are updated without reading the files again.
+
+    monitor = live_monitor('direcory_list.json',window_size=50)
+    monitor.run(interval=0.5,callback=lambda monitor,updates: print(monitor.summary()))
+
+Command line usage:
+python LiveMonitor.py <direcory_list.json> [window_size] [interval_s]
+'''
+import io
+import os
+import sys
+import time
+import numpy as np
+import pandas as pd
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+from StreamingWindow import window_accumulator
+
+
+class file_state:
+    '''Reading position and results of one measurement file'''
+    def __init__(self,path):
+        self.path = path
+        self.offset = 0 # bytes already read, always at the beginning of a line
+        self.identity = None # device and inode of the file
+        self.mtime_ns = None # modification time at last check
+        self.tail = b'' # last bytes read (before offset), they are compared to detect rewritten file
+        self.header_lines = list()
+        self.date = None
+        self.hour = None
+        self.data_rate = None
+        self.columns = None
+        self.rows_to_drop = 0
+        self.accumulator = None
+
+
+class live_monitor:
+    tail_size = 256 # bytes compared to detect rewritten file, see same_tail
+
+    def __init__(self,dir_list,idx_df_weight=4,idx_df_pressure=3,window_size=100,stride=None,header_index=[0,1],initial_drop_rows=10):
+        '''
+        Input:
+        dir_list - path to dictionary file (*.json) with measurement cases directories, or the dictionary itself
+        idx_df_weight, idx_df_pressure, window_size, stride - see mass_flow_rate_analysis.clc_avr_window
+        header_index, initial_drop_rows - see mass_flow_rate_analysis.read_file
+        '''
+        self.analysis = mass_flow_rate_analysis(idx_df_weight,idx_df_pressure,window_size)
+        if isinstance(dir_list,str):
+            dir_list = self.analysis.open_dir_list(dir_list)
+        self.dir_list = dir_list
+        self.idx_df_weight = idx_df_weight
+        self.idx_df_pressure = idx_df_pressure
+        self.window_size = window_size
+        self.stride = stride
+        self.header_index = header_index
+        self.initial_drop_rows = initial_drop_rows
+        self.files = {case:{} for case in dir_list} # case - {file name - file_state}
+
+    def read_new_lines(self,state):
+        '''Read complete lines appended to the file since last check'''
+        try:
+            stat = os.stat(state.path)
+        except OSError:
+            return b''
+        identity = (stat.st_dev,stat.st_ino)
+        if state.offset > 0 and (identity != state.identity or stat.st_size < state.offset or
+                                 (stat.st_mtime_ns != state.mtime_ns and not self.same_tail(state))):
+            self.reset_file(state) # file was replaced, truncated or rewritten, read it again
+        state.identity,state.mtime_ns = identity,stat.st_mtime_ns
+        if stat.st_size == state.offset:
+            return b''
+        with open(state.path,'rb') as f:
+            f.seek(state.offset)
+            data = f.read(stat.st_size-state.offset)
+        end = data.rfind(b'\n')+1 # incomplete line is left for the next check
+        state.tail = (state.tail+data[max(0,end-self.tail_size):end])[-self.tail_size:]
+        state.offset += end
+        return data[:end]
+
+    def same_tail(self,state):
+        '''True if bytes already read are unchanged (only their end is compared), i.e. data was only appended to the file'''
+        try:
+            with open(state.path,'rb') as f:
+                f.seek(state.offset-len(state.tail))
+                return f.read(len(state.tail)) == state.tail
+        except OSError:
+            return False
+
+    def reset_file(self,state):
+        state.__init__(state.path)
+
+    def parse_header(self,state,data):
+        '''Take header lines from the beginning of the file, returns the rest of data'''
+        nb_of_header_lines = max(self.header_index)+2
+        while len(state.header_lines) < nb_of_header_lines and data:
+            line,_,data = data.partition(b'\n')
+            state.header_lines.append(line.decode().rstrip('\r'))
+        if len(state.header_lines) == nb_of_header_lines and state.accumulator is None:
+            state.date,state.hour,state.data_rate = self.analysis.parse_parameters_line(state.header_lines[0])
+            header_rows = [state.header_lines[1+i].split('\t') for i in self.header_index]
+            if len(self.header_index) > 1:
+                state.columns = [self.analysis.join_tuple(line) for line in pd.MultiIndex.from_arrays(header_rows)]
+            else:
+                state.columns = header_rows[0]
+            state.rows_to_drop = self.initial_drop_rows
+            state.accumulator = window_accumulator(self.window_size,state.data_rate,self.stride)
+        return data
+
+    def update_file(self,state):
+        '''Parse new rows of the file, returns DataFrame with new window rows (None if there is nothing new)'''
+        data = self.read_new_lines(state)
+        if state.accumulator is None:
+            data = self.parse_header(state,data)
+        if not data.strip() or state.accumulator is None:
+            return None
+        block = pd.read_csv(io.BytesIO(data),sep='\t',header=None,names=range(len(state.columns)),dtype=np.float64).to_numpy()
+        drop = min(state.rows_to_drop,len(block))
+        state.rows_to_drop -= drop
+        block = block[drop:]
+        rows = state.accumulator.update(block[:,self.idx_df_weight],block[:,self.idx_df_pressure])
+        return pd.DataFrame(rows,columns=state.accumulator.window_header)
+
+    def poll(self):
+        '''Check all directories once. Returns list of (case, file name, DataFrame with new window rows)'''
+        updates = list()
+        for case,directory in self.dir_list.items():
+            if not os.path.isdir(directory):
+                continue
+            for file in self.analysis.get_files_from_dir(directory):
+                if file not in self.files[case]:
+                    self.files[case][file] = file_state(os.path.join(directory,file))
+                rows = self.update_file(self.files[case][file])
+                if rows is not None:
+                    updates.append((case,file,rows))
+        return updates
+
+    def windows(self,case,file):
+        '''Window table of the file so far, the same as data_df of clc_avr_window'''
+        return self.files[case][file].accumulator.data_df()
+
+    def case_summary(self,case):
+        '''Mean pressure and total mass flow rate of all files of the case so far'''
+        states = [state for state in self.files[case].values() if state.accumulator is not None]
+        return pd.DataFrame({'Pressure, [bar]':[state.accumulator.mean_pressure()/100000 for state in states],
+                             'Mass flow rate, [g/s]':[state.accumulator.total_mfr() for state in states],
+                             'Time [s]':[state.accumulator.nb_of_samples/state.data_rate for state in states]},
+                            index=[os.path.basename(state.path) for state in states])
+
+    def summary(self):
+        '''Summary of all cases, see case_summary'''
+        frames = {case:self.case_summary(case) for case in self.files}
+        frames = {case:df for case,df in frames.items() if len(df)}
+        if not frames:
+            return pd.DataFrame()
+        return pd.concat(frames)
+
+    def run(self,interval=0.5,callback=None,duration=None):
+        '''Check the directories every interval seconds, until duration (seconds, None - until KeyboardInterrupt).
+        callback(monitor,updates) is called after every check with new data'''
+        start = time.monotonic()
+        try:
+            while duration is None or time.monotonic()-start < duration:
+                check_start = time.monotonic()
+                updates = self.poll()
+                if updates and callback is not None:
+                    callback(self,updates)
+                time.sleep(max(0,interval-(time.monotonic()-check_start)))
+        except KeyboardInterrupt:
+            pass
+        return self.summary()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    window_size = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    interval = float(sys.argv[3]) if len(sys.argv) > 3 else 0.5
+    monitor = live_monitor(sys.argv[1],window_size=window_size)
+    monitor.run(interval,callback=lambda monitor,updates: print(time.strftime('%H:%M:%S'),'\n',monitor.summary(),flush=True))
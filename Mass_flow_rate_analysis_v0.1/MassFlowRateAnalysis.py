@@ -14,23 +14,48 @@ Measurement file - a result of single measurement
 import pandas as pd
 import numpy as np
 import os
+import io
+import sys
 import json
 import string
 import itertools
-from openpyxl import load_workbook
-from openpyxl.styles import Alignment
-from openpyxl import Workbook
-from openpyxl.chart import (
-    ScatterChart,
-    Series,
-    Reference
-)
+import colorsys
+from concurrent.futures import ProcessPoolExecutor
+from ResultContainer import result_container
+from StreamingWindow import window_accumulator
+from WindowPyramid import window_pyramid
+# modules shared with add_file_to_database application are kept in common folder of the repository
+common_dir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'common')
+if common_dir not in sys.path:
+    sys.path.append(common_dir)
+from result_cache import result_cache
+from stage_profiler import stage_profiler
+from prefetch_pipeline import prefetch_config,pipeline
+from CharacteristicCurves import characteristic_curves,fit_cached
+# openpyxl is imported by functions which write Excel file, so reading and analysis of files start faster
 
 class mass_flow_rate_analysis:
-    def __init__(self,idx_df_weight = 4,idx_df_pressure = 3,window_size=100):
+    chart_colors=['e6194B', '3cb44b', 'ffe119', '4363d8', 'f58231', '911eb4', '42d4f4', 'f032e6', 'bfef45', 'fabed4', '469990',
+                  'dcbeff', '9A6324', 'fffac8', '800000', 'aaffc3', '808000', 'ffd8b1', '000075', 'a9a9a9', 'ffffff'] # next colours are generated, see chart_color
+
+    def __init__(self,idx_df_weight = 4,idx_df_pressure = 3,window_size=100,cache_dir=None,cache_size=1024**3,chunk_rows=None,profiler=None,
+                 prefetch=None):
+        '''
+        cache_dir - (optional) directory of on-disk cache with results of measurement files, see common/result_cache.py
+        cache_size - maximum size of the cache in bytes
+        chunk_rows - (optional) read measurement files in chunks of given number of rows (streaming mode, see stream_file),
+        by default whole file is read at once
+        profiler - (optional) stage_profiler which measures time and memory of processing stages (see common/stage_profiler.py), disabled by default
+        prefetch - (optional) number of files read ahead by background threads while earlier files are processed,
+        or prefetch_options (depth, readers, read function), see common/prefetch_pipeline.py and process_files. Not used in streaming mode.
+        '''
         self.idx_df_weight = idx_df_weight
         self.idx_df_pressure = idx_df_pressure
         self.window_size = window_size 
+        self.cache = result_cache(cache_dir,cache_size) if cache_dir is not None else None
+        self.chunk_rows = chunk_rows
+        self.profiler = profiler if profiler is not None else stage_profiler(enabled=False)
+        self.prefetch = prefetch_config(prefetch)
         # self.horizontal_offset=horizontal_offset
 
     def open_dir_list(self,json_file_path):
@@ -48,11 +73,16 @@ class mass_flow_rate_analysis:
                 files.append(file)
         return files
     
+    def parse_parameters_line(self,line):
+        '''Split first line of measurement file into date, hour and data rate'''
+        fields=line.rstrip('\r\n').split('\t')
+        date,hour,data_rate=fields[0],fields[1],int(fields[3])
+        return date,hour,data_rate
+
     def read_parameters_from_header(self,file_path):
         '''Read basic parameters from measurement file header'''
-        df_head=pd.read_csv(file_path,sep='\t',header=[0])
-        date,hour,data_rate=df_head.columns[0],df_head.columns[1],df_head.columns[3]
-        data_rate=int(data_rate)
+        with open(file_path) as f:
+            date,hour,data_rate=self.parse_parameters_line(f.readline())
         return date,hour,data_rate
     
     def join_tuple(self,tuple,comma_separator=True):
@@ -93,54 +123,134 @@ class mass_flow_rate_analysis:
             yield from (''.join(group) for group in itertools.product(string.ascii_uppercase, repeat=n))
             n += 1
 
+    def chart_color(self,idx):
+        '''Colour (HEX) of case with given index in charts. The first colours are taken from chart_colors, next ones are generated:
+        hue is moved by golden angle, so neighbouring cases have distinct colours, saturation and brightness alternate.
+        Number of cases is not limited.'''
+        if idx < len(self.chart_colors):
+            return self.chart_colors[idx]
+        n=idx-len(self.chart_colors)
+        hue=(0.1+n*0.618033988749895)%1
+        red,green,blue=colorsys.hsv_to_rgb(hue,(0.9,0.6,0.75)[n%3],(0.85,0.65,0.95)[(n//3)%3])
+        return '%02x%02x%02x' % (round(red*255),round(green*255),round(blue*255))
+
+    def read_file(self,path,header_index=[0,1],initial_drop_rows=10,data=None):
+        '''Read measurement file in single pass. The file is opened only once:
+        the first line gives date, hour and data rate, next lines are the header (name and unit rows),
+        the rest is numeric data which is loaded directly as float64 block.
+        Input:
+        path - path to measurement file
+        header_index - rows of the header, counted from the second line of the file
+        initial_drop_rows - number of first data rows to skip, in most cases they are incorrect
+        data - (optional) content of the file (bytes) already read, e.g. by prefetch, then the file is not opened
+        '''
+        with open(path) if data is None else io.StringIO(data.decode()) as f:
+            date,hour,data_rate=self.parse_parameters_line(f.readline())
+            header_rows=[f.readline().rstrip('\r\n').split('\t') for _ in range(max(header_index)+1)]
+            header_rows=[header_rows[i] for i in header_index]
+            df=pd.read_csv(f,sep='\t',header=None,names=range(len(header_rows[0])),dtype=np.float64,
+                           skiprows=initial_drop_rows if initial_drop_rows > 0 else None)
+        # save orignal header
+        if len(header_index) > 1:
+            orignal_header=pd.MultiIndex.from_arrays(header_rows)
+            df.columns=[self.join_tuple(line) for line in orignal_header] # New header
+        else:
+            orignal_header=pd.Index(header_rows[0])
+            df.columns=orignal_header
+        return date,hour,data_rate,df,orignal_header
+
+    def read_file_chunks(self,path,chunk_rows=100000,header_index=[0,1],initial_drop_rows=10):
+        '''Read measurement file in chunks, the same data as read_file, but only one chunk is kept in memory.
+        The function returns date, hour, data rate, orignal header and generator of DataFrame chunks (at most chunk_rows rows each).
+        The file is read when the chunks are iterated.
+        '''
+        with open(path) as f:
+            date,hour,data_rate=self.parse_parameters_line(f.readline())
+            header_rows=[f.readline().rstrip('\r\n').split('\t') for _ in range(max(header_index)+1)]
+            data_offset=f.tell()
+        header_rows=[header_rows[i] for i in header_index]
+        if len(header_index) > 1:
+            orignal_header=pd.MultiIndex.from_arrays(header_rows)
+            columns=[self.join_tuple(line) for line in orignal_header]
+        else:
+            orignal_header=pd.Index(header_rows[0])
+            columns=orignal_header
+
+        def chunks():
+            with open(path) as f:
+                f.seek(data_offset)
+                reader=pd.read_csv(f,sep='\t',header=None,names=range(len(header_rows[0])),dtype=np.float64,
+                                   skiprows=initial_drop_rows if initial_drop_rows > 0 else None,chunksize=chunk_rows)
+                for df in reader:
+                    df.columns=columns
+                    yield df
+        return date,hour,data_rate,orignal_header,chunks()
+
+    def stream_file(self,path,idx_df_weight,idx_df_pressure,window_size,chunk_rows=100000,stride=None,keep_windows=False,
+                    header_index=[0,1],initial_drop_rows=10):
+        '''Calculate window function of measurement file chunk by chunk (see StreamingWindow).
+        The generator yields DataFrame with window rows completed in every chunk and window_accumulator with running totals:
+        total_mfr() - the same as clc_total_mfr, mean_pressure() - mean pressure, stats_df() - the same as data_stats_df of clc_avr_window.
+        Memory usage depends on chunk_rows, not on length of the file.
+        '''
+        date,hour,data_rate,oh,chunks=self.read_file_chunks(path,chunk_rows,header_index,initial_drop_rows)
+        accumulator=window_accumulator(window_size,data_rate,stride,keep_windows)
+        for df in chunks:
+            rows=accumulator.update(df.iloc[:,idx_df_weight].to_numpy(dtype=float),df.iloc[:,idx_df_pressure].to_numpy(dtype=float))
+            data_df=pd.DataFrame(rows,columns=accumulator.window_header)
+            yield data_df,accumulator
+
     def read_data(self,path,header_index=[0,1],initial_drop_rows=10):
         '''Read data from file and convert it into DataFrame'''
-        df=pd.read_csv(path,sep='\t',skiprows=1,header=header_index)
-        if initial_drop_rows > 0:
-            df.drop(df.index[0:initial_drop_rows],inplace=True) # first few rows are incorrect, in most cases
-        df.reset_index(inplace=True,drop=True)
-        orignal_header = df.columns # save orignal header
-        # New header
-        if len(header_index) > 1:
-            new_header=list()
-            for line in orignal_header:
-                new_header.append(self.join_tuple(line))
-            df.columns=new_header
+        date,hour,data_rate,df,orignal_header=self.read_file(path,header_index,initial_drop_rows)
         return df,orignal_header
 
-    def clc_avr_window(self, df, idx_df_weight, idx_df_pressure, window_size,data_rate):
-        '''Periodic mean of the data based on given period (window size). 
-        Calculate a mean from window and move to following. Windows don't overlapped each other.
+    def window_starts(self,nb_of_samples,window_size,stride=None):
+        '''Start indexes of all full windows in the data.
+        Input:
+        nb_of_samples - length of the data
+        window_size - number of samples in one window
+        stride - step between two following windows, by default equal to window size (windows don't overlap).
+        Stride smaller than window size gives overlapping (sliding) windows, bigger one skips samples between windows.
+        '''
+        if stride is None:
+            stride = window_size
+        if window_size < 1 or stride < 1:
+            raise ValueError('window_size and stride have to be positive integers')
+        return np.arange(0,nb_of_samples-window_size+1,stride)
+
+    def clc_avr_window(self, df, idx_df_weight, idx_df_pressure, window_size,data_rate,stride=None):
+        '''Periodic mean of the data based on given period (window size).
+        Calculate a mean from window and move to following. By default windows don't overlapped each other.
+        All windows are calculated at once by means of numpy arrays.
         Input:
         df-Dataframe
         idx_df_weight-index of weight data column in dataframe
         idx_df_pressure-index of pressure data column in dataframe
         window_size-window size to average
         data_rate-data rate of gathered data
+        stride-(optional) step between windows, see window_starts
         '''
-        window_start,window_end=0,0
+        if stride is None:
+            stride = window_size
         window_time=window_size/data_rate
-        nb_full_periods=len(df)//window_size # Only full window can be averaged.
-
-        data_temp=list()
-        weight_avr_arr=list()
-        mass_flow_rate_arr=list()
-        pressure_avr_arr=list()
-        nb=list()
-
-        for x in range(nb_full_periods):
-            window_start=window_end
-            window_end+=window_size
-            weight_avr = df.iloc[window_end-1,idx_df_weight] - df.iloc[window_start,idx_df_weight]
-            weight_avr_arr.append(weight_avr)
-            mass_flow_rate_arr.append(weight_avr/window_time)
-            pressure_avr_arr.append(df.iloc[window_start:window_end,idx_df_pressure].mean())
-            nb.append(x+1)
-        
-        data_arr=np.concatenate((np.array(nb)[np.newaxis, :],np.array(weight_avr_arr)[np.newaxis, :],np.array(mass_flow_rate_arr)[np.newaxis, :],
-                             np.array(pressure_avr_arr)[np.newaxis, :],np.array(pressure_avr_arr)[np.newaxis, :]/100000))
+        weight=df.iloc[:,idx_df_weight].to_numpy(dtype=float)
+        pressure=df.iloc[:,idx_df_pressure].to_numpy(dtype=float)
+        window_start=self.window_starts(len(df),window_size,stride) # Only full window can be averaged.
+        window_end=window_start+window_size
+
+        weight_avr_arr=weight[window_end-1]-weight[window_start]
+        mass_flow_rate_arr=weight_avr_arr/window_time
+        if len(window_start) > 0:
+            windows=np.lib.stride_tricks.sliding_window_view(pressure,window_size)[::stride] # view, without copy of the data
+            pressure_avr_arr=windows.mean(axis=1)
+        else:
+            pressure_avr_arr=np.empty(0)
+        nb=np.arange(1,len(window_start)+1)
+
+        data_arr=np.column_stack((nb,weight_avr_arr,mass_flow_rate_arr,pressure_avr_arr,pressure_avr_arr/100000))
         # Dataframe with averaged data
-        data_df=pd.DataFrame(data_arr).transpose()
+        data_df=pd.DataFrame(data_arr)
         data_df.columns=['Nb.','Weight-avr [g]','Mass flow rate - avr [g/s]','Pressure - avr [Pa]','Pressure - avr [bar]']
         # Summary of whole Dataframe
         data_stats=[data_rate,window_time,window_size,np.mean(mass_flow_rate_arr),np.ptp(mass_flow_rate_arr),np.mean(pressure_avr_arr),np.ptp(pressure_avr_arr)]
@@ -149,7 +259,189 @@ class mass_flow_rate_analysis:
         'Pressure - avr [Pa]', 'Range of Pressure [Pa]']
         return data_stats_df,data_df
     
-    def data_arr(self, dir,idx_df_weight,idx_df_pressure,window_size):
+    def cache_parameters(self,idx_df_weight,idx_df_pressure,window_size,header_index,initial_drop_rows):
+        '''Parameters of cache entry of process_file'''
+        return (idx_df_weight,idx_df_pressure,window_size,tuple(header_index),initial_drop_rows)
+
+    def process_file(self,full_path,idx_df_weight,idx_df_pressure,window_size,header_index=[0,1],initial_drop_rows=10,case=None,data=None):
+        '''Read single measurement file and calculate its results. Files are independent from each other,
+        so the function can be run in separate process.
+        If the cache is enabled, results of unchanged files are taken from the cache.
+        If chunk_rows is set, the file is read in chunks (see stream_file).
+        The function returns total mass flow rate, mean pressure, statistics and averaged data from window function.
+        case - (optional) name of measurement case, used only by the profiler
+        data - (optional) content of the file already read (see prefetch_file)
+        '''
+        file = os.path.basename(full_path)
+        with self.profiler.stage('process_file',file=file,case=case) as file_stage:
+            parameters = self.cache_parameters(idx_df_weight,idx_df_pressure,window_size,header_index,initial_drop_rows)
+            if self.cache is not None:
+                with self.profiler.stage('cache_get',file=file,case=case):
+                    result = self.cache.get(full_path,parameters)
+                if result is not None:
+                    file_stage.rows = len(result['data_df'])
+                    return result['mass_flow'],result['pressure'],result['data_stats_df'],result['data_df']
+            if self.chunk_rows is not None: # streaming mode, mean values can differ on the level of floating point rounding
+                with self.profiler.stage('stream_file',file=file,case=case,path=full_path) as stage:
+                    date,hour,data_rate,oh,chunks = self.read_file_chunks(full_path,self.chunk_rows,header_index,initial_drop_rows)
+                    accumulator = window_accumulator(window_size,data_rate)
+                    for df in chunks:
+                        accumulator.update(df.iloc[:,idx_df_weight].to_numpy(dtype=float),df.iloc[:,idx_df_pressure].to_numpy(dtype=float))
+                    mass_flow,pressure = accumulator.total_mfr(),accumulator.mean_pressure()
+                    data_stats_df,data_df = accumulator.stats_df(),accumulator.data_df()
+                    stage.rows = accumulator.nb_of_samples
+            else:
+                with self.profiler.stage('read_file',file=file,case=case,path=full_path) as stage:
+                    date,hour,data_rate,df,oh = self.read_file(full_path,header_index,initial_drop_rows,data)
+                    stage.rows = len(df)
+                with self.profiler.stage('clc_total_mfr',file=file,case=case,rows=len(df)):
+                    mass_flow = self.clc_total_mfr(df,idx_df_weight,data_rate)
+                    pressure = df.iloc[:,idx_df_pressure].mean()
+                with self.profiler.stage('clc_avr_window',file=file,case=case,rows=len(df)):
+                    data_stats_df,data_df = self.clc_avr_window(df,idx_df_weight,idx_df_pressure,window_size,data_rate)
+            file_stage.rows = len(data_df)
+            if self.cache is not None:
+                with self.profiler.stage('cache_put',file=file,case=case):
+                    result = {'date':date,'hour':hour,'data_rate':data_rate,'header':oh.tolist(),
+                              'mass_flow':mass_flow,'pressure':pressure,'data_stats_df':data_stats_df,'data_df':data_df}
+                    self.cache.put(full_path,parameters,result)
+        return mass_flow,pressure,data_stats_df,data_df
+
+    def process_file_profiled(self,*args):
+        '''process_file in worker process, returns results and records of the profiler (see process_files)'''
+        self.profiler = stage_profiler(trace_memory=self.profiler.trace_memory)
+        return self.process_file(*args),self.profiler.records
+
+    def prefetch_file(self,args):
+        '''Content of the file read by prefetch thread (args of process_file), None if results are in the cache'''
+        if self.cache is not None and os.path.exists(self.cache.entry_path(args[0],self.cache_parameters(*args[1:6]))):
+            return None
+        return self.prefetch.read(args[0])
+
+    def process_file_data(self,args,data):
+        '''process_file with prefetched data in worker process, returns results and records of the profiler (see process_files)'''
+        if not self.profiler.enabled:
+            return self.process_file(*args,data=data),None
+        self.profiler = stage_profiler(trace_memory=self.profiler.trace_memory)
+        return self.process_file(*args,data=data),self.profiler.records
+
+    def process_files(self,paths,idx_df_weight,idx_df_pressure,window_size,workers=None,cases=None):
+        '''Process list of measurement files (see process_file) and return results in the same order as paths.
+        Input:
+        workers - number of worker processes, by default (None) files are processed one after another in current process
+        cases - (optional) names of cases of the files, used only by the profiler
+        If prefetch is set (see __init__), next files are read by background threads while earlier ones are processed.
+        '''
+        n=len(paths)
+        args=(paths,[idx_df_weight]*n,[idx_df_pressure]*n,[window_size]*n,[[0,1]]*n,[10]*n,cases if cases is not None else [None]*n)
+        with self.profiler.stage('process_files',rows=n):
+            if self.prefetch is not None and self.chunk_rows is None:
+                results=self.process_files_prefetched(list(zip(*args)),workers)
+            elif workers is None or workers <= 1:
+                results=list(map(self.process_file,*args))
+            elif not self.profiler.enabled:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results=list(executor.map(self.process_file,*args,chunksize=max(1,n//(4*workers))))
+            else: # records of the profiler are measured in worker processes and sent back
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    results=list()
+                    for result,records in executor.map(self.process_file_profiled,*args,chunksize=max(1,n//(4*workers))):
+                        results.append(result)
+                        self.profiler.add_records(records)
+            if self.cache is not None:
+                with self.profiler.stage('cache_evict'):
+                    self.cache.evict()
+        return results
+
+    def process_files_prefetched(self,args,workers=None):
+        '''Pipelined process_files: reading of files (threads) overlaps with processing (current or worker processes)'''
+        if workers is None or workers <= 1:
+            return list(pipeline(args,lambda item,data: self.process_file(*item,data=data),self.prefetch,self.prefetch_file,
+                                 profiler=self.profiler))
+        results=list()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            for result,records in pipeline(args,self.process_file_data,self.prefetch,self.prefetch_file,executor,self.profiler):
+                results.append(result)
+                if records is not None:
+                    self.profiler.add_records(records)
+        return results
+
+    def case_file_paths(self,dir):
+        '''Files of measurement case directories (see data_arr): dictionary case name - list of files,
+        list of paths of all files and list of case names of the paths'''
+        dir_list=self.open_dir_list(dir)
+        case_files={case:self.get_files_from_dir(direcotry) for case,direcotry in dir_list.items()}
+        paths=[os.path.join(dir_list[case],file) for case,files in case_files.items() for file in files]
+        cases=[case for case,files in case_files.items() for file in files]
+        return case_files,paths,cases
+
+    def data_container(self,dir,idx_df_weight,idx_df_pressure,window_size,workers=None,files=None):
+        '''Read measurement case directories (see data_arr) and return results of all files in result_container (see ResultContainer).
+        Cases can have different number of files and files can have different length.
+        files - (optional) files returned by case_file_paths(dir), the directories are not listed again
+        '''
+        with self.profiler.stage('data_container'):
+            case_files,paths,cases=self.case_file_paths(dir) if files is None else files
+            results=self.process_files(paths,idx_df_weight,idx_df_pressure,window_size,workers,cases)
+            with self.profiler.stage('result_container',rows=len(results)):
+                return result_container.from_results(case_files,results)
+
+    def build_pyramid(self,full_path,idx_df_weight,idx_df_pressure,header_index=[0,1],initial_drop_rows=10,case=None):
+        '''Read single measurement file and precompute its window_pyramid (see WindowPyramid), so results for any window size
+        can be calculated later without reading the file. If the cache is enabled, pyramids of unchanged files are taken from the cache.
+        '''
+        file = os.path.basename(full_path)
+        with self.profiler.stage('build_pyramid',file=file,case=case) as file_stage:
+            parameters = ('window_pyramid',idx_df_weight,idx_df_pressure,tuple(header_index),initial_drop_rows)
+            if self.cache is not None:
+                with self.profiler.stage('cache_get',file=file,case=case):
+                    pyramid = self.cache.get(full_path,parameters)
+                if pyramid is not None:
+                    file_stage.rows = pyramid.nb_of_samples
+                    return pyramid
+            with self.profiler.stage('read_file',file=file,case=case,path=full_path) as stage:
+                if self.chunk_rows is not None: # only weight and pressure columns are kept in memory
+                    date,hour,data_rate,oh,chunks = self.read_file_chunks(full_path,self.chunk_rows,header_index,initial_drop_rows)
+                    columns = [(df.iloc[:,idx_df_weight].to_numpy(dtype=float),df.iloc[:,idx_df_pressure].to_numpy(dtype=float)) for df in chunks]
+                    weight = np.concatenate([w for w,p in columns]) if columns else np.empty(0)
+                    pressure = np.concatenate([p for w,p in columns]) if columns else np.empty(0)
+                else:
+                    date,hour,data_rate,df,oh = self.read_file(full_path,header_index,initial_drop_rows)
+                    weight,pressure = df.iloc[:,idx_df_weight].to_numpy(dtype=float),df.iloc[:,idx_df_pressure].to_numpy(dtype=float)
+                stage.rows = len(weight)
+            with self.profiler.stage('window_pyramid',file=file,case=case,rows=len(weight)):
+                pyramid = window_pyramid(weight,pressure,data_rate)
+            file_stage.rows = len(weight)
+            if self.cache is not None:
+                with self.profiler.stage('cache_put',file=file,case=case):
+                    self.cache.put(full_path,parameters,pyramid)
+        return pyramid
+
+    def data_pyramids(self,dir,idx_df_weight,idx_df_pressure,workers=None):
+        '''Read measurement case directories (see data_container) and precompute window_pyramid of every file.
+        Returns dictionary case name - list of files and list of pyramids of all files (in the same order), see pyramid_container.
+        '''
+        with self.profiler.stage('data_pyramids'):
+            case_files,paths,cases=self.case_file_paths(dir)
+            n=len(paths)
+            args=(paths,[idx_df_weight]*n,[idx_df_pressure]*n,[[0,1]]*n,[10]*n,cases)
+            if workers is None or workers <= 1 or self.profiler.enabled:
+                pyramids=list(map(self.build_pyramid,*args))
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    pyramids=list(executor.map(self.build_pyramid,*args,chunksize=max(1,n//(4*workers))))
+            if self.cache is not None:
+                self.cache.evict()
+        return case_files,pyramids
+
+    def pyramid_container(self,case_files,pyramids,window_size,stride=None):
+        '''Results of all files for given window size and stride from precomputed pyramids (see data_pyramids),
+        the files are not read. Returns result_container, the same as data_container.
+        '''
+        with self.profiler.stage('pyramid_container',rows=len(pyramids)):
+            return result_container.from_results(case_files,[pyramid.results(window_size,stride) for pyramid in pyramids])
+
+    def data_arr(self, dir,idx_df_weight,idx_df_pressure,window_size,workers=None):
         '''Using the functions defined above, read measurement case directory (one or more) and load measurement files.
         Next, by means of window function calculate periodic mean for each file and add data into aggregation array (data_case)
         then into data_all-array which is intended for all cases. 
@@ -163,49 +455,50 @@ class mass_flow_rate_analysis:
         cases_list - List of all measurement case names
         data_df_header - Header which fits to data_case and data_all, intended to build pandas Dataframe
         data_stats_header  - Header which fits to data_stat_case and data_stat_all, intended to build pandas Dataframe
+        Files can be processed in parallel by means of worker processes (workers - number of processes, see process_files),
+        the order of results is the same as in sequential mode.
+        The arrays are views of result_container (see data_container), all cases have to have the same number of files
+        and all files the same number of windows.
         '''
-        data_all=list()
-        mass_flow_avr=list()
-        pressure_avr_=list()
-        cases_list = list()
-        for case, direcotry in self.open_dir_list(dir).items():
-            files = list()
-            data_case=list()
-            mass_flow_avr_case=list()
-            pressure_avr_case=list()
-            cases_list.append(case)
-            for idx, file in enumerate(self.get_files_from_dir(direcotry)):
-                files.append(file)
-                full_path = os.path.join(direcotry, file)
-                date,hour,data_rate = self.read_parameters_from_header(full_path)
-                df,oh = self.read_data(full_path)
-                mass_flow_avr_case.append(self.clc_total_mfr(df,idx_df_weight,data_rate))
-                pressure_avr_case.append(df.iloc[:,idx_df_pressure].mean())
-                data_stats_df,data_df = self.clc_avr_window(df,idx_df_weight,idx_df_pressure,window_size,data_rate)
-
-                if np.any(data_case) == False: #check if array exist
-                    data_case.append(data_df.values)
-                    data_stat_case=data_stats_df.values
-                    data_case=np.array(data_case)
-                else:
-                    data_case=np.concatenate((data_case,data_df.values.reshape(-1,data_df.values.shape[0],data_df.values.shape[1])))
-                    data_stat_case=np.vstack((data_stat_case,data_stats_df.values))
-            data_stats_header,data_df_header=data_stats_df.columns,data_df.columns
-            mass_flow_avr_case = np.array(mass_flow_avr_case)
-            pressure_avr_case = np.array(pressure_avr_case)
-  
-            if np.any(data_all) == False:
-                data_all.append(data_case)
-                data_all=np.array(data_all)
-                data_stat_all = data_stat_case.reshape(-1,data_stat_case.shape[0],data_stat_case.shape[1])
-                mass_flow_avr = mass_flow_avr_case.reshape(-1,mass_flow_avr_case.shape[0])
-                pressure_avr = pressure_avr_case.reshape(-1,pressure_avr_case.shape[0])
-            else:
-                data_all=np.concatenate((data_all,data_case.reshape(-1,data_case.shape[0],data_case.shape[1],data_case.shape[2])))
-                data_stat_all=np.concatenate((data_stat_all,data_stat_case.reshape(-1,data_stat_case.shape[0],data_stat_case.shape[1])))
-                mass_flow_avr=np.vstack((mass_flow_avr,mass_flow_avr_case.reshape(-1,mass_flow_avr_case.shape[0])))
-                pressure_avr=np.vstack((pressure_avr,pressure_avr_case.reshape(-1,pressure_avr_case.shape[0])))
-        return data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_case,data_stat_case,data_df_header,data_stats_header
+        return self.data_container(dir,idx_df_weight,idx_df_pressure,window_size,workers).to_arrays()
+
+    def curve_data(self,results):
+        '''pressure_avr, mass_flow_avr and cases_list of result_container (see data_container) or of data returned by data_arr'''
+        if isinstance(results,result_container):
+            return results.case_matrix(results.pressure),results.case_matrix(results.mass_flow),results.cases_list
+        return results[3],results[2],results[4]
+
+    def fit_curves(self,results,model='polynomial',degree=2,reference_pressure=101325.0):
+        '''
+        Fit characteristic curves (mass flow rate in function of pressure) of all cases at once, see CharacteristicCurves.
+        Input:
+        results - result_container (see data_container) or data returned by data_arr (mass_flow_avr, pressure_avr and cases_list are used)
+        model - 'polynomial' (degree), 'sqrt' (m = C*sqrt(P-reference_pressure)) or 'power' (m = C*(P-reference_pressure)^k)
+        Returns characteristic_curves, e.g. curves.predict('case_1',4e5) - mass flow rate of case_1 at 4 bar
+        '''
+        pressure_avr,mass_flow_avr,cases_list=self.curve_data(results)
+        with self.profiler.stage('fit_curves',rows=len(cases_list)):
+            return characteristic_curves.fit(pressure_avr,mass_flow_avr,cases_list,model,degree,reference_pressure)
+
+    def curves_from_dir(self,dir,idx_df_weight,idx_df_pressure,window_size,cache_path,model='polynomial',degree=2,
+                        reference_pressure=101325.0,workers=None):
+        '''
+        Characteristic curves of measurement case directories (see data_container) cached in JSON file (cache_path,
+        e.g. curves_path(dir)). If the file has curves of the same files (size and modification time), model and parameters,
+        they are loaded without reading the measurement files, otherwise the files are processed and curves are fitted and saved
+        (see fit_cached). Returns characteristic_curves and True if they were loaded from the file.
+        '''
+        with self.profiler.stage('curves_from_dir'):
+            files=self.case_file_paths(dir)
+            case_files,paths,cases=files
+            case_paths={case:list() for case in case_files}
+            for case,file_path in zip(cases,paths):
+                case_paths[case].append(file_path)
+            def fit_data(): # the same files as in the fingerprint
+                results=self.data_container(dir,idx_df_weight,idx_df_pressure,window_size,workers,files)
+                return self.curve_data(results)[:2]
+            parameters=self.cache_parameters(idx_df_weight,idx_df_pressure,window_size,[0,1],10)
+            return fit_cached(cache_path,case_paths,fit_data,model,degree,reference_pressure,parameters)
 
     def draw_xl_chart(self,ws,title,series_name,
                   Xax_title_r,Xax_title_c,Yax_title_r,Yax_title_c,
@@ -235,6 +528,7 @@ class mass_flow_rate_analysis:
         marker_line_color - Line color in HEX
         chart_position - Chart position in worksheet eg. B1
         '''
+        from openpyxl.chart import ScatterChart,Series,Reference
         horizontal_offset=10
         chart = ScatterChart()
         chart.title = title
@@ -279,247 +573,403 @@ class mass_flow_rate_analysis:
         chart.width = 15
         ws.add_chart(chart, chart_position)
 
-    def save_excel(self,path,data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header):
+    def report_container(self,data_all,data_stat_all=None,mass_flow_avr=None,pressure_avr=None,cases_list=None,data_df_header=None,data_stats_header=None):
+        '''Results to be saved in report as result_container. data_all is either result_container (other arguments are not needed)
+        or array returned by data_arr, then all arrays from data_arr are needed.'''
+        if isinstance(data_all,result_container):
+            return data_all
+        return result_container.from_arrays(data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header)
+
+    def report_sheets(self,results,dict_chart_coord):
         '''
-        Save array data into Excel. The workbook consist with 'main' sheet which is summary of all cases and contains mean values of pressure and mass flow rate.
-        There is also separate sheet intended for each case with detailed information for all measurements within a case.
-        The fuction returns        
+        Prepare data of Excel report, worksheet after worksheet. The workbook consist with 'main' sheet which is summary of all cases
+        and contains mean values of pressure and mass flow rate. There is also separate sheet intended for each case
+        with detailed information for all measurements within a case.
+        Input:
+        results - result_container, cases can have different number of files and runs different number of windows
+        The generator yields: sheet name, list of DataFrames with to_excel options (position in the sheet) and data needed to draw charts:
+        df_main for 'main' sheet and (temp_df_1,temp_df_3,temp_df_4,run_lengths) for case sheet.
+        Positions of the data are saved into dict_chart_coord.
         '''
         nb_of_charts=3 # In current version there is possibility to draw three set of detailed charts within one measurement case
-        dict_chart_coord={} # Dictionary with initial position 
-        arr=list()
-        head_case=list()
-        ####### Prepare and write data into main worksheet #########
-        pressure_avr=pressure_avr/100000 # conversion of pressure from Pa to bar
-        for i in range(mass_flow_avr.shape[0]):
-            temp=np.column_stack((pressure_avr[i],mass_flow_avr[i]))
-            head_case.append(cases_list[i])
-            if np.any(arr) == False:
-                arr=temp
-            else:
-                arr=np.column_stack((arr,temp))
+        ####### Prepare data of main worksheet #########
         columns_header = ['Pressure, [bar]','Mass flow rate, [g/s]']
-        two_row_header = pd.MultiIndex.from_product([head_case,columns_header])
-        df_main=pd.DataFrame(arr,columns=two_row_header,index=[x for x in range(1,arr.shape[0]+1)]) # Dataframe to be saved in main worksheet
-        
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "main"
+        case_frames=list()
+        for i,case in enumerate(results.cases_list):
+            temp=np.column_stack((results.case_pressure(i)/100000,results.case_mass_flow(i))) # conversion of pressure from Pa to bar
+            case_frames.append(pd.DataFrame(temp,columns=pd.MultiIndex.from_product([[case],columns_header]),
+                                            index=[x for x in range(1,temp.shape[0]+1)]))
+        df_main=pd.concat(case_frames,axis=1) # Dataframe to be saved in main worksheet, shorter cases are filled with NaN
+
         startcol_main=1 # index-like
         startrow_main=19 # index-like
         dict_chart_coord['main']=[startcol_main,startrow_main]
-        with pd.ExcelWriter(path,
-            mode='w',
-            engine="openpyxl",
-        ) as writer:
-            df_main.to_excel(writer,index=True,index_label='File nb.', sheet_name='main', startcol=startcol_main,startrow=startrow_main)
+        yield 'main',[(df_main,dict(index=True,index_label='File nb.',startcol=startcol_main,startrow=startrow_main))],df_main
         #################################################################
 
-        ####### Prepare and write data into seperate case worksheet #########
-        for idx,case in enumerate(cases_list):
-            wb.create_sheet(case)
-            ws = wb[case]          
+        ####### Prepare data of seperate case worksheet #########
+        for idx,case in enumerate(results.cases_list):
+            frames=list()
             # temp_df_1 - summary for a case, which consists of mean pressure and mass flow rate for all single measurement within a case
-            temp_df_1=pd.DataFrame(df_main.iloc[:,(0+idx*2):(2+idx*2)])
+            temp_df_1=case_frames[idx].copy()
             temp_df_1.columns = temp_df_1.columns[0][1],temp_df_1.columns[1][1] # instead 2 row header only 1 line header 
             _startcol=2 
             _startrow=4
             dict_chart_coord[case]=[[_startrow,_startcol]] # Add coordinates of saved data
-            with pd.ExcelWriter(path,
-                mode='a',
-                engine="openpyxl",
-                if_sheet_exists="overlay",
-            ) as writer:
-                temp_df_1.to_excel(writer,index=True, sheet_name=case, startcol=_startcol,startrow=_startrow)
+            frames.append((temp_df_1,dict(index=True,startcol=_startcol,startrow=_startrow)))
 
             # temp_df_2 - Summary for single measurement within a case
             # temp_df_3 - Averaged data from window function 
-            for idy,run in enumerate(data_all[idx]):
-                temp_df_2=pd.DataFrame(data_stat_all[idx][idy]).transpose()
-                temp_df_2.columns=data_stats_header
-                temp_df_3=pd.DataFrame(data_all[idx][idy],columns=data_df_header)
-                if idy == 0:
-                    temp_data_4 = run
-                else:
-                    temp_data_4 = np.vstack((temp_data_4,run))
+            run_lengths=results.run_lengths(idx)
+            for idy,run in enumerate(results.case_runs(idx)):
+                temp_df_2=pd.DataFrame(results.stats[run]).transpose()
+                temp_df_2.columns=results.data_stats_header
+                temp_df_3=pd.DataFrame(results.run_windows(run),columns=results.data_df_header)
                 _startcol=0+(len(temp_df_2.columns)+3)*idy
                 _startrow=len(temp_df_1)+13+nb_of_charts*19+3
-                with pd.ExcelWriter(path,
-                    mode='a',
-                    engine="openpyxl",
-                    if_sheet_exists="overlay",
-                ) as writer:
-                    temp_df_2.to_excel(writer,index=False, sheet_name=case, startcol=_startcol,startrow=_startrow)
-                    temp_df_3.to_excel(writer,index=False, sheet_name=case, startcol=_startcol,startrow=_startrow+2)
+                frames.append((temp_df_2,dict(index=False,startcol=_startcol,startrow=_startrow)))
+                frames.append((temp_df_3,dict(index=False,startcol=_startcol,startrow=_startrow+2)))
                 if idy == 0: # Only initial coordinates are needed
                     dict_chart_coord[case].append([_startrow,_startcol])
 
             # temp_df_4 - Aggregation of all temp_df_3 data in one dataframe
-            temp_df_4=pd.DataFrame(temp_data_4,columns=data_df_header)
+            temp_df_4=pd.DataFrame(results.case_windows(idx),columns=results.data_df_header)
             _startcol=0
-            _startrow=len(temp_df_1)+13+nb_of_charts*19+3+len(temp_df_2)+len(temp_df_3)+5
+            _startrow=len(temp_df_1)+13+nb_of_charts*19+3+len(temp_df_2)+max(run_lengths)+5 # below the longest run
             dict_chart_coord[case].append([_startrow,_startcol])
-            with pd.ExcelWriter(path,
-                mode='a',
-                engine="openpyxl",
-                if_sheet_exists="overlay",
-            ) as writer:
-                temp_df_4.to_excel(writer,index=True, sheet_name=case, startcol=_startcol,startrow=_startrow)
-        return df_main,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord
-    
-    def add_chart(self,path,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord):
+            frames.append((temp_df_4,dict(index=True,startcol=_startcol,startrow=_startrow)))
+            yield case,frames,(temp_df_1,temp_df_3,temp_df_4,run_lengths)
+
+    def save_excel(self,path,data_all,data_stat_all=None,mass_flow_avr=None,pressure_avr=None,cases_list=None,data_df_header=None,data_stats_header=None):
         '''
-        Based on provided Excel workbook and data draw charts.
-        The function draw summary chart in main worksheet and set of charts in every sheet intended for separated case.
+        Save array data into Excel, see report_sheets. The workbook is opened and saved only once.
+        Data is either result_container (see data_container) or arrays returned by data_arr.
+        The fuction returns df_main, temp_df_1, temp_df_3, temp_df_4 (of the last case) and coordinates of data in worksheets (see add_chart)
         '''
-        colors=['e6194B', '3cb44b', 'ffe119', '4363d8', 'f58231', '911eb4', '42d4f4', 'f032e6', 'bfef45', 'fabed4', '469990',
-                'dcbeff', '9A6324', 'fffac8', '800000', 'aaffc3', '808000', 'ffd8b1', '000075', 'a9a9a9', 'ffffff'] # In current version number of cases is limited to 21
-        excel_columns=list(itertools.islice(self.excel_cols(), 80))
-        horizontal_offset=10
-        wb=load_workbook(path)
-        sheetnames=wb.sheetnames
-        for idx,sheet in enumerate(sheetnames):
-            wb.active=wb[sheet]
-            ws = wb.active
+        results=self.report_container(data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header)
+        dict_chart_coord={} # Dictionary with initial position 
+        writer=pd.ExcelWriter(path,
+            mode='w',
+            engine="openpyxl",
+        )
+        for idx,(sheet,frames,chart_data) in enumerate(self.report_sheets(results,dict_chart_coord)):
+            with self.profiler.stage('write_sheet',case=sheet,rows=sum(len(df) for df,options in frames)):
+                for df,options in frames:
+                    df.to_excel(writer,sheet_name=sheet,**options)
             if idx == 0:
-                startcol_main=1 # index-like
-                startrow_main=19
-                wb.active = wb[sheet]
-                ws = wb.active
-                chart = ScatterChart()
-                chart.title = 'Mass flow rate'
-                chart.style = 13
-                _row=startrow_main+2
-                _x_column=startcol_main+2 #pressure
-                _y_column=startcol_main+3 #mass flow
-                chart.x_axis.title = ws.cell(row=_row,column=_x_column).value #pressure
-                chart.y_axis.title = ws.cell(row=_row,column=_y_column).value #mass flow
-                chart.x_axis.scaling.min = 1
-                _row=startrow_main+4
-                for idw in range(len(sheetnames)-1):
-                    xvalues = Reference(ws, min_col=_x_column+idw*2, min_row=_row, max_row=_row+len(temp_df_1)-1) #pressure
-                    values = Reference(ws, min_col=_y_column+idw*2, min_row=_row, max_row=_row+len(temp_df_1)-1) #mass flow
-                    series = Series(values, xvalues, title_from_data=False,title=sheetnames[idw+1])
-                    chart.series.append(series)
-
-                    series.marker.symbol = "square"
-                    series.marker.size = 8
-                    series.marker.graphicalProperties.solidFill = colors[idw] # Marker filling
-                    series.marker.graphicalProperties.line.solidFill = colors[idw] # Marker outline
-                    series.graphicalProperties.line.width = 20000
-                    series.graphicalProperties.line.solidFill = colors[idw]
-
-                chart.legend.position = 'b'
-                chart.height = 10 
-                chart.width = 15 
-                ws.add_chart(chart, "B1")
-
-                #### make_beautiful ####
-                for idxx in range(len(sheetnames)*2+10): #aprox. column range
-                    ws.column_dimensions[excel_columns[idxx]].width = 12
-                    for ad in range(startrow_main+1,startrow_main+3):
-                        _adress=excel_columns[idxx]+str(ad)
-                        _cell=ws[_adress]
-                        _cell.alignment = Alignment(horizontal="center", vertical="center",wrap_text=True)
+                df_main=chart_data
+            else:
+                temp_df_1,temp_df_3,temp_df_4,run_lengths=chart_data
+        with self.profiler.stage('save_workbook'):
+            writer.close()
+        return df_main,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord
 
+    def save_report(self,path,data_all,data_stat_all=None,mass_flow_avr=None,pressure_avr=None,cases_list=None,data_df_header=None,data_stats_header=None,
+                    write_only=False):
+        '''
+        Save array data and all charts into Excel in one pass, the same report as save_excel and add_chart, but the workbook is saved only once.
+        Data is either result_container (see data_container) or arrays returned by data_arr.
+        Input:
+        write_only - use streaming (write-only) workbook, rows are generated from DataFrames while the worksheet is written, see WriteOnlySheet.
+        The fuction returns the same data as save_excel
+        '''
+        results=self.report_container(data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header)
+        return self.write_report(path,results,write_only)
+
+    def write_report(self,path,results,write_only=False,first_case=0,main_sheet=True):
+        '''
+        Write report of results (result_container) into Excel file, see save_report.
+        Input:
+        first_case - index of the first case of results in whole campaign, it sets colours of charts (see save_report_sharded)
+        main_sheet - if False, only sheets of cases are written (shard of report) and all of them are formatted
+        '''
+        from openpyxl import Workbook
+        from WriteOnlySheet import write_only_sheet
+        dict_chart_coord={}
+        cases_list=results.cases_list
+        if write_only:
+            wb=Workbook(write_only=True)
+        else:
+            writer=pd.ExcelWriter(path,mode='w',engine="openpyxl")
+        for idx,(sheet,frames,chart_data) in enumerate(self.report_sheets(results,dict_chart_coord)):
+            if idx == 0 and not main_sheet:
+                df_main=chart_data
+                continue
+            with self.profiler.stage('write_sheet',case=sheet,rows=sum(len(df) for df,options in frames)):
+                if write_only:
+                    ws=write_only_sheet(sheet)
+                    for df,options in frames:
+                        ws.write_frame(df,**options)
+                else:
+                    for df,options in frames:
+                        df.to_excel(writer,sheet_name=sheet,**options)
+                    ws=writer.book[sheet]
+            with self.profiler.stage('draw_charts',case=sheet):
+                if idx == 0:
+                    df_main=chart_data
+                    self.draw_main_chart(ws,cases_list,[results.nb_of_files(i) for i in range(len(cases_list))])
+                else:
+                    temp_df_1,temp_df_3,temp_df_4,run_lengths=chart_data
+                    self.draw_case_charts(ws,first_case+idx,sheet,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord,run_lengths)
+                    if idx == len(cases_list) or not main_sheet: # the same as in add_chart, only last sheet
+                        self.format_case_sheet(ws,sheet,temp_df_1,dict_chart_coord)
+            if write_only:
+                with self.profiler.stage('write_sheet',case=sheet):
+                    ws.save_to(wb)
+        with self.profiler.stage('save_workbook'):
+            if write_only:
+                wb.save(path)
             else:
-                _mass_flow_column,_pressure_column=dict_chart_coord[sheet][0][1]+2,dict_chart_coord[sheet][0][0]+1
-                _title_row,_data_row=dict_chart_coord[sheet][0][0]+1,dict_chart_coord[sheet][0][0]+2
-                _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c=_title_row,_mass_flow_column,_title_row,_pressure_column
-                _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_mass_flow_column,_data_row,_data_row+6-1
-                _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_pressure_column,_Xvalue_r_min,_Xvalue_r_max
-                self.draw_xl_chart(ws,'MFR','def',
-                                _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
-                                _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
-                                _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
-                                colors[idx-1],colors[idx-1],'G1',x_axis_scale_min=1)
-                #### make_beautiful ####
-                for idyy in range(3,5):
-                    _adress=excel_columns[idyy]+str(5)
-                    _cell=ws[_adress]
-                    _cell.alignment = Alignment(horizontal="center", vertical="center",wrap_text=True)
-                
-                _pressure_column,_mass_flow_column=dict_chart_coord[sheet][2][1]+6,dict_chart_coord[sheet][2][1]+4
-                _title_row,_data_row=dict_chart_coord[sheet][2][0]+1,dict_chart_coord[sheet][2][0]+2
-                _Xax_title_r,_Xax_title_c=_title_row,_pressure_column
-                _Yax_title_r,_Yax_title_c=_title_row,_mass_flow_column
-                _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_Xax_title_c,_data_row,_data_row + len(temp_df_4) -1
-                _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_Yax_title_c,_data_row,_data_row + len(temp_df_4) -1
-                _series_name='points'
-                self.draw_xl_chart(ws,'Mass flow rate - points',_series_name,
-                                   _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
-                                   _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
-                                   _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
-                                   colors[idx-1],colors[idx-1],'P1',line_no_fill=True,
-                                   style=5,marker_symbol='circle',marker_size=5,
-                                   marker_outline_color='000000')
-                initial_vertical_step=19
-                _index_row=dict_chart_coord[sheet][1][0] 
-                for idz in range(len(temp_df_1)):
-                    adress1=excel_columns[idz*10]+str(initial_vertical_step+1)
-                    adress2=excel_columns[idz*10]+str(2*initial_vertical_step+1)
-                    adress3=excel_columns[idz*10]+str(3*initial_vertical_step+1)
-
-                    ######## Pressure - Mass flow rate ###############
-                    _mass_flow_column,_pressure_column=3,5
-                    _Xax_title_r,_Xax_title_c=_index_row+3,_pressure_column+idz*horizontal_offset
-                    _Yax_title_r,_Yax_title_c=_Xax_title_r,_mass_flow_column+idz*horizontal_offset
-                    _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_Xax_title_c,_index_row+4,_index_row+4+len(temp_df_3)-1
-                    _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_Yax_title_c,_Xvalue_r_min,_Xvalue_r_max
-                    _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_Xax_title_c).value,1)))+'bar'
-                    self.draw_xl_chart(ws,'Pressure - Mass flow rate',_series_name,
-                                       _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
-                                       _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
-                                       _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
-                                       colors[idx-1],colors[idx-1],adress1,line_no_fill=True)
-                    ######################################
-
-                    ######## Mass flow rate per case ###############
-                    _Nb_column=1
-                    _Xax_title_r,_Xax_title_c=_index_row+3,_Nb_column+idz*horizontal_offset
-                    _Yax_title_r,_Yax_title_c=_Xax_title_r,_mass_flow_column+idz*horizontal_offset
-
-                    _Xvalue_c_min=_Xax_title_c
-                    _Xvalue_r_min=_index_row+4
-                    _Xvalue_r_max=_index_row+4+len(temp_df_3)-1
-
-                    _Yvalue_c_min=_Yax_title_c
-                    _Yvalue_r_min=_Xvalue_r_min
-                    _Yvalue_r_max=_Xvalue_r_max
-
-                    _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_pressure_column+idz*horizontal_offset).value,1)))+'bar'
-                    
-                    self.draw_xl_chart(ws,'Mass flow rate per case',_series_name,
-                            _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
-                            _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
-                            _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
-                            colors[idx-1],colors[idx-1],adress2,line_no_fill=True)
-                    ######################################
-
-                    ######## Pressure - Mass flow rate ###############
-                    _Xax_title_r=_index_row+3
-                    _Xax_title_c=_Nb_column+idz*horizontal_offset
-                    _Yax_title_r=_Xax_title_r
-                    _Yax_title_c=_pressure_column+idz*horizontal_offset
-
-                    _Xvalue_c_min=_Xax_title_c
-                    _Xvalue_r_min=_index_row+4
-                    _Xvalue_r_max=_index_row+4+len(temp_df_3)-1
-
-                    _Yvalue_c_min=_Yax_title_c
-                    _Yvalue_r_min=_Xvalue_r_min
-                    _Yvalue_r_max=_Xvalue_r_max
-
-                    _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_pressure_column+idz*horizontal_offset).value,1)))+'bar'
-
-                    self.draw_xl_chart(ws,'Absolute pressure',_series_name,
-                            _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
-                            _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
-                            _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
-                            colors[idx-1],colors[idx-1],adress3,line_no_fill=True)                 
-                    ######################################
-
-                ### make_beautiful ####
+                writer.close()
+        return df_main,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord
+
+    def shard_paths(self,path,nb_of_shards):
+        '''Paths of shards of report, next to index workbook, e.g. report.shard1.xlsx, report.shard2.xlsx...'''
+        root,ext=os.path.splitext(path)
+        return [root+'.shard'+str(idx+1)+ext for idx in range(nb_of_shards)]
+
+    def write_report_shard(self,path,results,write_only=False,first_case=0):
+        '''write_report of shard (sheets of cases only) in worker process, returns coordinates of data and records of the profiler'''
+        if not self.profiler.enabled:
+            return self.write_report(path,results,write_only,first_case,main_sheet=False)[-1],None
+        self.profiler = stage_profiler(trace_memory=self.profiler.trace_memory)
+        return self.write_report(path,results,write_only,first_case,main_sheet=False)[-1],self.profiler.records
+
+    def write_report_index(self,path,results,shards):
+        '''
+        Write index workbook of sharded report: 'main' sheet with summary of all cases and chart (the same as in save_report)
+        and 'shards' sheet with links to sheets of cases. Names of cases in 'main' sheet are linked as well.
+        Input:
+        shards - list of (path of shard, names of cases in the shard)
+        '''
+        from openpyxl.styles import Font
+        dict_chart_coord={}
+        sheet,frames,df_main=next(self.report_sheets(results,dict_chart_coord)) # only 'main' sheet is prepared
+        writer=pd.ExcelWriter(path,mode='w',engine="openpyxl")
+        with self.profiler.stage('write_sheet',case=sheet,rows=len(df_main)):
+            for df,options in frames:
+                df.to_excel(writer,sheet_name=sheet,**options)
+        ws=writer.book[sheet]
+        with self.profiler.stage('draw_charts',case=sheet):
+            self.draw_main_chart(ws,results.cases_list,[results.nb_of_files(i) for i in range(results.nb_of_cases())])
+        links={}
+        for shard_path,cases in shards:
+            for case in cases:
+                # relative link, the report can be moved together with its shards
+                links[case]=os.path.basename(shard_path)+"#'"+case+"'!A1"
+        startcol_main,startrow_main=dict_chart_coord['main']
+        for idx,case in enumerate(results.cases_list): # names of cases in header of main sheet (see report_sheets)
+            cell=ws.cell(row=startrow_main+1,column=startcol_main+2+idx*2)
+            cell.hyperlink=links[case]
+            cell.font=Font(bold=True,underline='single',color='0563C1')
+        ws=writer.book.create_sheet('shards')
+        ws.append(['Case','Workbook','Number of files'])
+        for idx,(case,(shard_path,_)) in enumerate((case,shard) for shard in shards for case in shard[1]):
+            ws.append([case,os.path.basename(shard_path),results.nb_of_files(idx)])
+            ws.cell(row=idx+2,column=1).hyperlink=links[case]
+            ws.cell(row=idx+2,column=1).font=Font(underline='single',color='0563C1')
+        ws.column_dimensions['A'].width=30
+        ws.column_dimensions['B'].width=30
+        with self.profiler.stage('save_workbook',path=path):
+            writer.close()
+        return df_main
+
+    def save_report_sharded(self,path,data_all,data_stat_all=None,mass_flow_avr=None,pressure_avr=None,cases_list=None,data_df_header=None,
+                            data_stats_header=None,cases_per_shard=1,workers=None,write_only=False):
+        '''
+        Save report of large campaign into several workbooks, so no workbook is large and shards are written in parallel:
+        - shards - sheets of cases (the same as in save_report), cases_per_shard cases in one workbook, see shard_paths,
+        - index (path) - 'main' sheet with summary of all cases and chart, and links to sheets of cases in shards.
+        Data is either result_container (see data_container) or arrays returned by data_arr.
+        Input:
+        cases_per_shard - number of cases in one shard
+        workers - number of worker processes writing shards, by default shards are written one after another
+        write_only - use streaming (write-only) workbooks for shards, see save_report
+        Returns df_main, coordinates of data in worksheets and paths of shards
+        '''
+        results=self.report_container(data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header)
+        if cases_per_shard < 1:
+            raise ValueError('cases_per_shard has to be positive integer')
+        first_cases=list(range(0,results.nb_of_cases(),cases_per_shard))
+        paths=self.shard_paths(path,len(first_cases))
+        args=(paths,[results.case_slice(first,min(first+cases_per_shard,results.nb_of_cases())) for first in first_cases],[write_only]*len(paths),first_cases)
+        dict_chart_coord={}
+        with self.profiler.stage('write_shards',rows=len(paths)):
+            if workers is None or workers <= 1:
+                for coord in map(self.write_report,*args,[False]*len(paths)):
+                    dict_chart_coord.update(coord[-1])
+            else:
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for coord,records in executor.map(self.write_report_shard,*args):
+                        dict_chart_coord.update(coord)
+                        if records is not None:
+                            self.profiler.add_records(records)
+        df_main=self.write_report_index(path,results,[(shard_path,shard.cases_list) for shard_path,shard in zip(paths,args[1])])
+        return df_main,dict_chart_coord,paths
+
+    def draw_main_chart(self,ws,cases_list,nb_of_files):
+        '''
+        Draw summary chart of mass flow rate of all cases in main worksheet.
+        Input:
+        cases_list - names of cases (series of the chart)
+        nb_of_files - number of files (rows of data) of each case
+        '''
+        from openpyxl.chart import ScatterChart,Series,Reference
+        from openpyxl.styles import Alignment
+        excel_columns=list(itertools.islice(self.excel_cols(), max(80,len(cases_list)*2+12)))
+        startcol_main=1 # index-like
+        startrow_main=19
+        chart = ScatterChart()
+        chart.title = 'Mass flow rate'
+        chart.style = 13
+        _row=startrow_main+2
+        _x_column=startcol_main+2 #pressure
+        _y_column=startcol_main+3 #mass flow
+        chart.x_axis.title = ws.cell(row=_row,column=_x_column).value #pressure
+        chart.y_axis.title = ws.cell(row=_row,column=_y_column).value #mass flow
+        chart.x_axis.scaling.min = 1
+        _row=startrow_main+4
+        for idw in range(len(cases_list)):
+            xvalues = Reference(ws, min_col=_x_column+idw*2, min_row=_row, max_row=_row+nb_of_files[idw]-1) #pressure
+            values = Reference(ws, min_col=_y_column+idw*2, min_row=_row, max_row=_row+nb_of_files[idw]-1) #mass flow
+            series = Series(values, xvalues, title_from_data=False,title=cases_list[idw])
+            chart.series.append(series)
+
+            series.marker.symbol = "square"
+            series.marker.size = 8
+            series.marker.graphicalProperties.solidFill = self.chart_color(idw) # Marker filling
+            series.marker.graphicalProperties.line.solidFill = self.chart_color(idw) # Marker outline
+            series.graphicalProperties.line.width = 20000
+            series.graphicalProperties.line.solidFill = self.chart_color(idw)
+
+        chart.legend.position = 'b'
+        chart.height = 10 
+        chart.width = 15 
+        ws.add_chart(chart, "B1")
+
+        #### make_beautiful ####
+        for idxx in range(len(cases_list)*2+12): #aprox. column range
+            ws.column_dimensions[excel_columns[idxx]].width = 12
+            for ad in range(startrow_main+1,startrow_main+3):
+                _adress=excel_columns[idxx]+str(ad)
+                _cell=ws[_adress]
+                _cell.alignment = Alignment(horizontal="center", vertical="center",wrap_text=True)
+
+    def draw_case_charts(self,ws,idx,sheet,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord,run_lengths=None):
+        '''
+        Draw set of charts in worksheet of measurement case.
+        Input:
+        idx - index of the worksheet in workbook (1 - first case)
+        sheet - name of the worksheet (case)
+        temp_df_1,temp_df_3,temp_df_4,dict_chart_coord - see save_excel
+        run_lengths - (optional) number of windows of every run, by default all runs have the same length as temp_df_3
+        '''
+        from openpyxl.styles import Alignment
+        if run_lengths is None:
+            run_lengths=[len(temp_df_3)]*len(temp_df_1)
+        color=self.chart_color(idx-1)
+        excel_columns=list(itertools.islice(self.excel_cols(), max(80,len(temp_df_1)*10+1)))
+        horizontal_offset=10
+        _mass_flow_column,_pressure_column=dict_chart_coord[sheet][0][1]+2,dict_chart_coord[sheet][0][0]+1
+        _title_row,_data_row=dict_chart_coord[sheet][0][0]+1,dict_chart_coord[sheet][0][0]+2
+        _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c=_title_row,_mass_flow_column,_title_row,_pressure_column
+        _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_mass_flow_column,_data_row,_data_row+6-1
+        _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_pressure_column,_Xvalue_r_min,_Xvalue_r_max
+        self.draw_xl_chart(ws,'MFR','def',
+                        _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
+                        _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
+                        _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
+                        color,color,'G1',x_axis_scale_min=1)
+        #### make_beautiful ####
+        for idyy in range(3,5):
+            _adress=excel_columns[idyy]+str(5)
+            _cell=ws[_adress]
+            _cell.alignment = Alignment(horizontal="center", vertical="center",wrap_text=True)
+        
+        _pressure_column,_mass_flow_column=dict_chart_coord[sheet][2][1]+6,dict_chart_coord[sheet][2][1]+4
+        _title_row,_data_row=dict_chart_coord[sheet][2][0]+1,dict_chart_coord[sheet][2][0]+2
+        _Xax_title_r,_Xax_title_c=_title_row,_pressure_column
+        _Yax_title_r,_Yax_title_c=_title_row,_mass_flow_column
+        _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_Xax_title_c,_data_row,_data_row + len(temp_df_4) -1
+        _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_Yax_title_c,_data_row,_data_row + len(temp_df_4) -1
+        _series_name='points'
+        self.draw_xl_chart(ws,'Mass flow rate - points',_series_name,
+                           _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
+                           _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
+                           _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
+                           color,color,'P1',line_no_fill=True,
+                           style=5,marker_symbol='circle',marker_size=5,
+                           marker_outline_color='000000')
+        initial_vertical_step=19
+        _index_row=dict_chart_coord[sheet][1][0] 
+        for idz in range(len(temp_df_1)):
+            adress1=excel_columns[idz*10]+str(initial_vertical_step+1)
+            adress2=excel_columns[idz*10]+str(2*initial_vertical_step+1)
+            adress3=excel_columns[idz*10]+str(3*initial_vertical_step+1)
+
+            ######## Pressure - Mass flow rate ###############
+            _mass_flow_column,_pressure_column=3,5
+            _Xax_title_r,_Xax_title_c=_index_row+3,_pressure_column+idz*horizontal_offset
+            _Yax_title_r,_Yax_title_c=_Xax_title_r,_mass_flow_column+idz*horizontal_offset
+            _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max=_Xax_title_c,_index_row+4,_index_row+4+run_lengths[idz]-1
+            _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max=_Yax_title_c,_Xvalue_r_min,_Xvalue_r_max
+            _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_Xax_title_c).value,1)))+'bar'
+            self.draw_xl_chart(ws,'Pressure - Mass flow rate',_series_name,
+                               _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
+                               _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
+                               _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
+                               color,color,adress1,line_no_fill=True)
+            ######################################
+
+            ######## Mass flow rate per case ###############
+            _Nb_column=1
+            _Xax_title_r,_Xax_title_c=_index_row+3,_Nb_column+idz*horizontal_offset
+            _Yax_title_r,_Yax_title_c=_Xax_title_r,_mass_flow_column+idz*horizontal_offset
+
+            _Xvalue_c_min=_Xax_title_c
+            _Xvalue_r_min=_index_row+4
+            _Xvalue_r_max=_index_row+4+run_lengths[idz]-1
+
+            _Yvalue_c_min=_Yax_title_c
+            _Yvalue_r_min=_Xvalue_r_min
+            _Yvalue_r_max=_Xvalue_r_max
+
+            _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_pressure_column+idz*horizontal_offset).value,1)))+'bar'
+            
+            self.draw_xl_chart(ws,'Mass flow rate per case',_series_name,
+                    _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
+                    _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
+                    _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
+                    color,color,adress2,line_no_fill=True)
+            ######################################
+
+            ######## Pressure - Mass flow rate ###############
+            _Xax_title_r=_index_row+3
+            _Xax_title_c=_Nb_column+idz*horizontal_offset
+            _Yax_title_r=_Xax_title_r
+            _Yax_title_c=_pressure_column+idz*horizontal_offset
+
+            _Xvalue_c_min=_Xax_title_c
+            _Xvalue_r_min=_index_row+4
+            _Xvalue_r_max=_index_row+4+run_lengths[idz]-1
+
+            _Yvalue_c_min=_Yax_title_c
+            _Yvalue_r_min=_Xvalue_r_min
+            _Yvalue_r_max=_Xvalue_r_max
+
+            _series_name='P='+str(int(round(ws.cell(row=_Yax_title_r+1,column=_pressure_column+idz*horizontal_offset).value,1)))+'bar'
+
+            self.draw_xl_chart(ws,'Absolute pressure',_series_name,
+                    _Xax_title_r,_Xax_title_c,_Yax_title_r,_Yax_title_c,
+                    _Xvalue_c_min,_Xvalue_r_min,_Xvalue_r_max,
+                    _Yvalue_c_min,_Yvalue_r_min,_Yvalue_r_max,
+                    color,color,adress3,line_no_fill=True)                 
+            ######################################
+
+    def format_case_sheet(self,ws,sheet,temp_df_1,dict_chart_coord):
+        '''Set width of columns and alignment of headers in worksheet of measurement case'''
+        from openpyxl.styles import Alignment
+        excel_columns=list(itertools.islice(self.excel_cols(), max(80,len(temp_df_1)*10)))
         for idzz in range(len(temp_df_1)*10):
             ws.column_dimensions[excel_columns[idzz]].width = 10
             _adress=excel_columns[idzz]+str(dict_chart_coord[sheet][1][0]+1)
@@ -531,4 +981,24 @@ class mass_flow_rate_analysis:
             _adress=excel_columns[idzz]+str(dict_chart_coord[sheet][2][0]+1)
             _cell=ws[_adress]
             _cell.alignment = Alignment(horizontal="center", vertical="center",wrap_text=True)
-        wb.save(path)
\ No newline at end of file
+
+    def add_chart(self,path,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord):
+        '''
+        Based on provided Excel workbook and data draw charts.
+        The function draw summary chart in main worksheet and set of charts in every sheet intended for separated case.
+        '''
+        from openpyxl import load_workbook
+        with self.profiler.stage('load_workbook',path=path):
+            wb=load_workbook(path)
+        sheetnames=wb.sheetnames
+        for idx,sheet in enumerate(sheetnames):
+            wb.active=wb[sheet]
+            ws = wb.active
+            with self.profiler.stage('draw_charts',case=sheet):
+                if idx == 0:
+                    self.draw_main_chart(ws,sheetnames[1:],[len(temp_df_1)]*(len(sheetnames)-1))
+                else:
+                    self.draw_case_charts(ws,idx,sheet,temp_df_1,temp_df_3,temp_df_4,dict_chart_coord)
+        self.format_case_sheet(ws,sheet,temp_df_1,dict_chart_coord)
+        with self.profiler.stage('save_workbook'):
+            wb.save(path)
@@ -0,0 +1,144 @@
+'''
+Compact container of results of the whole measurement campaign.
+
+Results of all measurement files are kept in a few flat arrays, one row per file (run) or per window,
+and offsets arrays point to the rows of every run and every case (the same idea as CSR sparse matrix):
+
+windows[run_offsets[i]:run_offsets[i+1]] - averaged data from window function of run i (see clc_avr_window)
+stats[i], mass_flow[i], pressure[i] - statistics, total mass flow rate and mean pressure of run i
+case_offsets[j]:case_offsets[j+1] - runs of case j
+
+Arrays are allocated once, when number of all windows is known, so runs of different length
+and cases with different number of files are stored without copying the data.
+Rows of one case are contiguous, so data of a case (or a run) is returned as a view of the arrays.
+'''
+import numpy as np
+
+
+class result_container:
+    def __init__(self,cases_list,case_offsets,run_offsets,windows,stats,mass_flow,pressure,data_df_header,data_stats_header):
+        '''
+        Input:
+        cases_list - names of measurement cases
+        case_offsets - index of first run of every case, the last element is number of all runs
+        run_offsets - index of first window of every run, the last element is number of all windows
+        windows - averaged data of all runs (windows x columns of data_df_header)
+        stats - statistics of all runs (runs x columns of data_stats_header)
+        mass_flow - total mass flow rate of all runs
+        pressure - mean pressure of all runs
+        '''
+        self.cases_list = list(cases_list)
+        self.case_offsets = np.asarray(case_offsets,dtype=np.int64)
+        self.run_offsets = np.asarray(run_offsets,dtype=np.int64)
+        self.windows = windows
+        self.stats = stats
+        self.mass_flow = mass_flow
+        self.pressure = pressure
+        self.data_df_header = data_df_header
+        self.data_stats_header = data_stats_header
+
+    @classmethod
+    def from_results(cls,case_files,results):
+        '''Build the container from results of measurement files.
+        Input:
+        case_files - dictionary: case name - list of files
+        results - list of (mass_flow,pressure,data_stats_df,data_df) of all files, in the same order as case_files (see process_file)
+        '''
+        results = list(results)
+        nb_of_files = [len(files) for files in case_files.values()]
+        case_offsets = np.concatenate(([0],np.cumsum(nb_of_files)))
+        run_offsets = np.concatenate(([0],np.cumsum([len(data_df) for _,_,_,data_df in results])))
+        data_df_header,data_stats_header = results[-1][3].columns,results[-1][2].columns
+        windows = np.empty((run_offsets[-1],len(data_df_header)))
+        stats = np.empty((len(results),len(data_stats_header)))
+        mass_flow = np.empty(len(results))
+        pressure = np.empty(len(results))
+        for idx,(mass_flow_run,pressure_run,data_stats_df,data_df) in enumerate(results):
+            windows[run_offsets[idx]:run_offsets[idx+1]] = data_df.values
+            stats[idx] = data_stats_df.values[0]
+            mass_flow[idx] = mass_flow_run
+            pressure[idx] = pressure_run
+        return cls(case_files.keys(),case_offsets,run_offsets,windows,stats,mass_flow,pressure,data_df_header,data_stats_header)
+
+    @classmethod
+    def from_arrays(cls,data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_df_header,data_stats_header):
+        '''Build the container from arrays returned by mass_flow_rate_analysis.data_arr (the same number of files and windows in every case)'''
+        data_all = np.asarray(data_all)
+        nb_of_cases,nb_of_files,nb_of_windows = data_all.shape[:3]
+        case_offsets = np.arange(nb_of_cases+1)*nb_of_files
+        run_offsets = np.arange(nb_of_cases*nb_of_files+1)*nb_of_windows
+        return cls(cases_list,case_offsets,run_offsets,data_all.reshape(-1,data_all.shape[-1]),
+                   np.asarray(data_stat_all).reshape(nb_of_cases*nb_of_files,-1),
+                   np.asarray(mass_flow_avr).reshape(-1),np.asarray(pressure_avr).reshape(-1),data_df_header,data_stats_header)
+
+    def nb_of_cases(self):
+        return len(self.cases_list)
+
+    def nb_of_files(self,case_idx):
+        '''Number of files (runs) of the case'''
+        return int(self.case_offsets[case_idx+1]-self.case_offsets[case_idx])
+
+    def case_runs(self,case_idx):
+        '''Indexes of runs of the case'''
+        return range(self.case_offsets[case_idx],self.case_offsets[case_idx+1])
+
+    def run_windows(self,run_idx):
+        '''Averaged data of the run (view)'''
+        return self.windows[self.run_offsets[run_idx]:self.run_offsets[run_idx+1]]
+
+    def run_lengths(self,case_idx):
+        '''Number of windows of every run of the case'''
+        return np.diff(self.run_offsets[self.case_offsets[case_idx]:self.case_offsets[case_idx+1]+1])
+
+    def case_windows(self,case_idx):
+        '''Averaged data of all runs of the case, one after another (view)'''
+        return self.windows[self.run_offsets[self.case_offsets[case_idx]]:self.run_offsets[self.case_offsets[case_idx+1]]]
+
+    def case_stats(self,case_idx):
+        return self.stats[self.case_offsets[case_idx]:self.case_offsets[case_idx+1]]
+
+    def case_mass_flow(self,case_idx):
+        return self.mass_flow[self.case_offsets[case_idx]:self.case_offsets[case_idx+1]]
+
+    def case_pressure(self,case_idx):
+        return self.pressure[self.case_offsets[case_idx]:self.case_offsets[case_idx+1]]
+
+    def case_matrix(self,values):
+        '''Values of runs (e.g. mass_flow or pressure) as matrix cases x files, shorter cases are filled with NaN
+        (the same as mass_flow_avr and pressure_avr of data_arr for uniform container)'''
+        nb_of_files = np.diff(self.case_offsets)
+        matrix = np.full((self.nb_of_cases(),int(nb_of_files.max()) if len(nb_of_files) else 0),np.nan)
+        matrix[np.repeat(np.arange(self.nb_of_cases()),nb_of_files),
+               np.arange(len(values))-np.repeat(self.case_offsets[:-1],nb_of_files)] = values
+        return matrix
+
+    def case_slice(self,start,stop):
+        '''Container of cases start...stop-1, arrays are views of this container (e.g. shard of report, see save_report_sharded)'''
+        first_run,last_run = self.case_offsets[start],self.case_offsets[stop]
+        first_window,last_window = self.run_offsets[first_run],self.run_offsets[last_run]
+        return result_container(self.cases_list[start:stop],self.case_offsets[start:stop+1]-first_run,
+                                self.run_offsets[first_run:last_run+1]-first_window,self.windows[first_window:last_window],
+                                self.stats[first_run:last_run],self.mass_flow[first_run:last_run],self.pressure[first_run:last_run],
+                                self.data_df_header,self.data_stats_header)
+
+    def is_uniform(self):
+        '''True if all cases have the same number of files and all runs the same number of windows'''
+        return len(set(np.diff(self.case_offsets).tolist())) <= 1 and len(set(np.diff(self.run_offsets).tolist())) <= 1
+
+    def to_arrays(self):
+        '''Arrays in format of mass_flow_rate_analysis.data_arr:
+        data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list,data_case,data_stat_case,data_df_header,data_stats_header
+        Arrays are views of the container. It is possible only if the container is uniform (see is_uniform).
+        '''
+        if not self.is_uniform():
+            raise ValueError('Cases have different number of files or runs have different number of windows, '
+                             'such results can not be saved in one array - use result_container directly')
+        nb_of_cases = self.nb_of_cases()
+        nb_of_files = self.nb_of_files(0)
+        nb_of_windows = int(self.run_offsets[1]-self.run_offsets[0]) if len(self.run_offsets) > 1 else 0
+        data_all = self.windows.reshape(nb_of_cases,nb_of_files,nb_of_windows,self.windows.shape[1])
+        data_stat_all = self.stats.reshape(nb_of_cases,nb_of_files,self.stats.shape[1])
+        mass_flow_avr = self.mass_flow.reshape(nb_of_cases,nb_of_files)
+        pressure_avr = self.pressure.reshape(nb_of_cases,nb_of_files)
+        return (data_all,data_stat_all,mass_flow_avr,pressure_avr,list(self.cases_list),data_all[-1],data_stat_all[-1],
+                self.data_df_header,self.data_stats_header)
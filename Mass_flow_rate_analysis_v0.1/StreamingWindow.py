@@ -0,0 +1,136 @@
+'''
+Online (streaming) version of the window function, see mass_flow_rate_analysis.clc_avr_window.
+
+The data is given in chunks of any length, e.g. from chunked reading of a long measurement file.
+Samples which do not make a full window yet are kept until the next chunk, so the windows are exactly the same
+as for the whole file read at once. Only the last incomplete window and the running totals are kept in memory,
+window rows are returned for every chunk.
+
+    accumulator = window_accumulator(window_size=100,data_rate=1000)
+    for weight,pressure in chunks:
+        rows = accumulator.update(weight,pressure) # new window rows
+    accumulator.total_mfr(), accumulator.mean_pressure(), accumulator.stats_df()
+'''
+import numpy as np
+import pandas as pd
+
+
+class window_accumulator:
+    window_header = ['Nb.','Weight-avr [g]','Mass flow rate - avr [g/s]','Pressure - avr [Pa]','Pressure - avr [bar]']
+    stats_header = ['Data rate [Hz]','Window time [s]', 'Samples per window [-]', 'Mass flow rate - avr [g/s]', 'Range of MFR [g/s]',
+                    'Pressure - avr [Pa]', 'Range of Pressure [Pa]']
+
+    def __init__(self,window_size,data_rate,stride=None,keep_windows=True):
+        '''
+        Input:
+        window_size - number of samples in one window
+        data_rate - data rate of gathered data
+        stride - (optional) step between windows, by default equal to window size, see mass_flow_rate_analysis.window_starts
+        keep_windows - keep all window rows, so they can be returned at the end as DataFrame (see data_df)
+        '''
+        if stride is None:
+            stride = window_size
+        if window_size < 1 or stride < 1:
+            raise ValueError('window_size and stride have to be positive integers')
+        self.window_size = window_size
+        self.data_rate = data_rate
+        self.stride = stride
+        self.window_time = window_size/data_rate
+        self.keep_windows = keep_windows
+        self.windows = list()
+        # samples of incomplete window, they start at the beginning of the next window
+        self.pending_weight = np.empty(0)
+        self.pending_pressure = np.empty(0)
+        self.skip = 0 # samples to drop before the next window (stride bigger than window size)
+        # running totals of the whole file
+        self.nb_of_samples = 0
+        self.first_weight = None
+        self.last_weight = None
+        self.pressure_sum = 0.0
+        # running statistics of windows
+        self.nb_of_windows = 0
+        self.mfr_sum = 0.0
+        self.mfr_min = np.inf
+        self.mfr_max = -np.inf
+        self.pressure_avr_sum = 0.0
+        self.pressure_avr_min = np.inf
+        self.pressure_avr_max = -np.inf
+
+    def update(self,weight,pressure):
+        '''Add next chunk of samples and return array with rows of completed windows (columns as window_header)'''
+        weight = np.asarray(weight,dtype=float)
+        pressure = np.asarray(pressure,dtype=float)
+        if len(weight) == 0:
+            return np.empty((0,len(self.window_header)))
+        if self.first_weight is None:
+            self.first_weight = weight[0]
+        self.last_weight = weight[-1]
+        self.nb_of_samples += len(weight)
+        self.pressure_sum += pressure.sum()
+
+        skip = min(self.skip,len(weight))
+        self.skip -= skip
+        weight = np.concatenate((self.pending_weight,weight[skip:]))
+        pressure = np.concatenate((self.pending_pressure,pressure[skip:]))
+        window_start = np.arange(0,len(weight)-self.window_size+1,self.stride)
+        window_end = window_start+self.window_size
+        next_start = len(window_start)*self.stride
+        if next_start <= len(weight):
+            self.pending_weight,self.pending_pressure = weight[next_start:].copy(),pressure[next_start:].copy()
+        else:
+            self.pending_weight,self.pending_pressure = np.empty(0),np.empty(0)
+            self.skip = next_start-len(weight)
+        if len(window_start) == 0:
+            return np.empty((0,len(self.window_header)))
+
+        weight_avr_arr = weight[window_end-1]-weight[window_start]
+        mass_flow_rate_arr = weight_avr_arr/self.window_time
+        pressure_avr_arr = np.lib.stride_tricks.sliding_window_view(pressure,self.window_size)[::self.stride].mean(axis=1)
+        nb = np.arange(self.nb_of_windows+1,self.nb_of_windows+len(window_start)+1)
+        rows = np.column_stack((nb,weight_avr_arr,mass_flow_rate_arr,pressure_avr_arr,pressure_avr_arr/100000))
+
+        self.nb_of_windows += len(window_start)
+        self.mfr_sum += mass_flow_rate_arr.sum()
+        self.mfr_min = min(self.mfr_min,mass_flow_rate_arr.min())
+        self.mfr_max = max(self.mfr_max,mass_flow_rate_arr.max())
+        self.pressure_avr_sum += pressure_avr_arr.sum()
+        self.pressure_avr_min = min(self.pressure_avr_min,pressure_avr_arr.min())
+        self.pressure_avr_max = max(self.pressure_avr_max,pressure_avr_arr.max())
+        if self.keep_windows:
+            self.windows.append(rows)
+        return rows
+
+    def total_mfr(self):
+        '''Total mass flow rate of all samples so far, see mass_flow_rate_analysis.clc_total_mfr'''
+        if self.nb_of_samples == 0:
+            return np.nan
+        return (self.last_weight-self.first_weight)/(self.nb_of_samples/self.data_rate)
+
+    def mean_pressure(self):
+        '''Mean pressure of all samples so far'''
+        if self.nb_of_samples == 0:
+            return np.nan
+        return self.pressure_sum/self.nb_of_samples
+
+    def stats(self):
+        '''Statistics of windows so far, the same as data_stats_df of clc_avr_window'''
+        if self.nb_of_windows == 0:
+            return [self.data_rate,self.window_time,self.window_size,np.nan,np.nan,np.nan,np.nan]
+        return [self.data_rate,self.window_time,self.window_size,
+                self.mfr_sum/self.nb_of_windows,self.mfr_max-self.mfr_min,
+                self.pressure_avr_sum/self.nb_of_windows,self.pressure_avr_max-self.pressure_avr_min]
+
+    def stats_df(self):
+        data_stats_df = pd.DataFrame(self.stats()).transpose()
+        data_stats_df.columns = self.stats_header
+        return data_stats_df
+
+    def data_df(self):
+        '''All window rows as DataFrame (only if keep_windows is set)'''
+        if self.windows:
+            data_arr = np.concatenate(self.windows)
+        else:
+            data_arr = np.empty((0,len(self.window_header)))
+        data_df = pd.DataFrame(data_arr)
+        data_df.columns = self.window_header
+        return data_df
@@ -0,0 +1,79 @@
+'''
+Precomputed aggregates of a measurement file, so the window function can be calculated for any window size and stride
+without reading the file again (see mass_flow_rate_analysis.pyramid_container).
+
+window_pyramid keeps weight samples and prefix sums of pressure. Window rows for any window size and stride are
+calculated from them in O(number of windows): weight difference from two samples, mean pressure from difference
+of two prefix sums.
+
+    pyramid = window_pyramid(weight,pressure,data_rate)
+    for window_size in (10,50,100,1000):
+        mass_flow,pressure,data_stats_df,data_df = pyramid.results(window_size) # the same as process_file
+
+Pressure is stored relatively to the first sample, so prefix sums stay small. Mean values can differ from clc_avr_window
+on the level of floating point rounding, mass flow rate is exactly the same.
+'''
+import numpy as np
+import pandas as pd
+from StreamingWindow import window_accumulator
+
+
+class window_pyramid:
+    window_header = window_accumulator.window_header
+    stats_header = window_accumulator.stats_header
+
+    def __init__(self,weight,pressure,data_rate):
+        '''
+        Input:
+        weight, pressure - samples of weight and pressure channels of the file
+        data_rate - data rate of gathered data
+        '''
+        self.data_rate = data_rate
+        self.weight = np.array(weight,dtype=float)
+        pressure = np.asarray(pressure,dtype=float)
+        self.nb_of_samples = len(self.weight)
+        self.pressure_offset = pressure[0] if len(pressure) else 0.0
+        self.pressure_prefix = np.concatenate(([0.0],np.cumsum(pressure-self.pressure_offset)))
+
+    @classmethod
+    def from_df(cls,df,idx_df_weight,idx_df_pressure,data_rate):
+        return cls(df.iloc[:,idx_df_weight].to_numpy(dtype=float),df.iloc[:,idx_df_pressure].to_numpy(dtype=float),data_rate)
+
+    def total_mfr(self):
+        '''Total mass flow rate of the file, see mass_flow_rate_analysis.clc_total_mfr'''
+        if self.nb_of_samples == 0:
+            return np.nan
+        return (self.weight[-1]-self.weight[0])/(self.nb_of_samples/self.data_rate)
+
+    def mean_pressure(self):
+        if self.nb_of_samples == 0:
+            return np.nan
+        return self.pressure_offset+self.pressure_prefix[-1]/self.nb_of_samples
+
+    def window_rows(self,window_size,stride=None):
+        '''Rows of window function (columns as window_header), the same windows as clc_avr_window'''
+        if stride is None:
+            stride = window_size
+        if window_size < 1 or stride < 1:
+            raise ValueError('window_size and stride have to be positive integers')
+        window_start = np.arange(0,self.nb_of_samples-window_size+1,stride)
+        window_end = window_start+window_size
+        weight_avr_arr = self.weight[window_end-1]-self.weight[window_start]
+        mass_flow_rate_arr = weight_avr_arr/(window_size/self.data_rate)
+        pressure_avr_arr = self.pressure_offset+(self.pressure_prefix[window_end]-self.pressure_prefix[window_start])/window_size
+        nb = np.arange(1,len(window_start)+1)
+        return np.column_stack((nb,weight_avr_arr,mass_flow_rate_arr,pressure_avr_arr,pressure_avr_arr/100000))
+
+    def window_stats(self,rows,window_size):
+        '''Statistics of window rows, the same as data_stats_df of clc_avr_window'''
+        if len(rows) == 0:
+            return [self.data_rate,window_size/self.data_rate,window_size,np.nan,np.nan,np.nan,np.nan]
+        return [self.data_rate,window_size/self.data_rate,window_size,np.mean(rows[:,2]),np.ptp(rows[:,2]),np.mean(rows[:,3]),np.ptp(rows[:,3])]
+
+    def results(self,window_size,stride=None):
+        '''Results of the file for given window size and stride, the same as mass_flow_rate_analysis.process_file:
+        total mass flow rate, mean pressure, data_stats_df and data_df'''
+        rows = self.window_rows(window_size,stride)
+        data_df = pd.DataFrame(rows,columns=self.window_header)
+        data_stats_df = pd.DataFrame([self.window_stats(rows,window_size)],columns=self.stats_header)
+        return self.total_mfr(),self.mean_pressure(),data_stats_df,data_df
@@ -0,0 +1,237 @@
+'''
+Worksheet for streaming (write-only) Excel workbook.
+
+openpyxl write-only workbook keeps memory usage low, but rows can only be appended and cells cannot be read back.
+write_only_sheet behaves like regular openpyxl worksheet in the scope needed to draw charts and to format the report
+(cell, ws['A1'], column_dimensions, add_chart), see mass_flow_rate_analysis.save_report.
+DataFrames are not copied into cells: the sheet keeps references to them and only headers and cells changed by
+charts or formatting are kept as cells. When the worksheet is complete, its rows are generated from the DataFrames
+and appended one by one into write-only workbook.
+'''
+import math
+import heapq
+from collections import defaultdict
+import pandas as pd
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Alignment, Border, Font, Side
+from openpyxl.utils.cell import coordinate_from_string, column_index_from_string, get_column_letter
+
+
+def excel_value(value):
+    '''Value of cell as written by DataFrame.to_excel: missing values are empty, infinity is written as text'''
+    if pd.api.types.is_scalar(value) and pd.isna(value):
+        return ''
+    if isinstance(value,float) and math.isinf(value):
+        return 'inf' if value > 0 else '-inf'
+    return value
+
+
+class buffered_cell:
+    __slots__ = ('value','alignment','font','border')
+
+    def __init__(self,value=None):
+        self.value = value
+        self.alignment = None
+        self.font = None
+        self.border = None
+
+
+class column_dimension:
+    __slots__ = ('width',)
+
+    def __init__(self):
+        self.width = None
+
+
+class frame_block:
+    '''Rows of DataFrame written by write_only_sheet.write_frame: index (optional) and data, from data_row'''
+    __slots__ = ('df','data_row','column','data_column','index')
+
+    def __init__(self,df,data_row,column,data_column,index):
+        self.df = df
+        self.data_row = data_row
+        self.column = column
+        self.data_column = data_column
+        self.index = index
+
+    @property
+    def last_row(self):
+        return self.data_row+len(self.df)-1
+
+    def value(self,row,column):
+        '''Value of cell, None if the cell is outside of the block'''
+        idx = row-self.data_row
+        if idx < 0 or idx >= len(self.df):
+            return None
+        if self.index and column == self.column:
+            return excel_value(self.df.index[idx])
+        idy = column-self.data_column
+        if 0 <= idy < len(self.df.columns):
+            return excel_value(self.df.iat[idx,idy])
+        return None
+
+    def rows(self):
+        '''Iterator of rows: list of (column, value, True if it is cell of index)'''
+        index = self.df.index if self.index else None
+        for idx,values in enumerate(self.df.itertuples(index=False,name=None)):
+            cells = [(self.data_column+idy,excel_value(value),False) for idy,value in enumerate(values)]
+            if index is not None:
+                cells.insert(0,(self.column,excel_value(index[idx]),True))
+            yield cells
+
+
+class write_only_sheet:
+    thin = Side(style='thin')
+    header_font = Font(bold=True)
+    header_border = Border(left=thin,right=thin,top=thin,bottom=thin)
+    header_alignment = Alignment(horizontal='center',vertical='top')
+    styled_header = int(pd.__version__.split('.')[0]) < 3 # DataFrame.to_excel of pandas 3 writes header and index without style
+
+    def __init__(self,title):
+        self.title = title
+        self.rows = defaultdict(dict) # row number - {column number - cell}, only headers and cells accessed by cell()
+        self.blocks = list() # data of DataFrames, see frame_block
+        self.column_dimensions = defaultdict(column_dimension)
+        self.merged_cells = list()
+        self.charts = list()
+
+    def cell(self,row,column,value=None):
+        '''Return cell (1-based row and column numbers, as in openpyxl), the cell is created if not exists'''
+        cells = self.rows[row]
+        if column not in cells:
+            cells[column] = buffered_cell(self.block_value(row,column))
+        if value is not None:
+            cells[column].value = value
+        return cells[column]
+
+    def block_value(self,row,column):
+        '''Value of cell in data of DataFrames, the last written DataFrame wins (as in DataFrame.to_excel)'''
+        for block in reversed(self.blocks):
+            value = block.value(row,column)
+            if value is not None:
+                return value
+        return None
+
+    def __getitem__(self,address):
+        column,row = coordinate_from_string(address)
+        return self.cell(row,column_index_from_string(column))
+
+    def add_chart(self,chart,anchor):
+        self.charts.append((chart,anchor))
+
+    def header_cell(self,row,column,value):
+        '''Cell of header or index, the same style as DataFrame.to_excel'''
+        cell = self.cell(row,column)
+        cell.value = excel_value(value)
+        if self.styled_header:
+            self.style_header(cell)
+
+    def style_header(self,cell):
+        cell.font = self.header_font
+        cell.border = self.header_border
+        cell.alignment = self.header_alignment
+
+    def write_frame(self,df,startrow=0,startcol=0,index=True,index_label=None):
+        '''Write DataFrame into the sheet, the same layout as DataFrame.to_excel (merge_cells=True):
+        levels of MultiIndex columns are written in separate rows and equal neighbouring labels are merged,
+        then the row of index label and data. Data is not copied, the DataFrame must not be changed until save_to.
+        Frames with MultiIndex rows (index cells merged across rows) are not supported, they have to be written by to_excel.'''
+        if isinstance(df.index,pd.MultiIndex):
+            raise ValueError('write_frame writes index in one column, DataFrame with MultiIndex rows has to be written by DataFrame.to_excel')
+        nb_of_levels = df.columns.nlevels
+        if nb_of_levels > 1 and not index:
+            raise ValueError('DataFrame with MultiIndex columns has to be written with index (as required by DataFrame.to_excel)')
+        row,column = startrow+1,startcol+1 # numbers of openpyxl cells start from 1
+        data_column = column+1 if index else column
+        if nb_of_levels > 1:
+            labels = list(df.columns)
+            for level in range(nb_of_levels):
+                self.header_cell(row+level,column,df.columns.names[level])
+                start = 0
+                for idx in range(1,len(labels)+1): # labels of upper levels with the same parents are merged
+                    if idx < len(labels) and level < nb_of_levels-1 and labels[idx][:level+1] == labels[start][:level+1]:
+                        continue
+                    self.header_cell(row+level,data_column+start,labels[start][level])
+                    if idx-start > 1:
+                        self.merged_cells.append('%s%d:%s%d' % (get_column_letter(data_column+start),row+level,
+                                                                get_column_letter(data_column+idx-1),row+level))
+                    start = idx
+            data_row = row+nb_of_levels+1 # below the row of index label
+        else:
+            for idx,name in enumerate(df.columns):
+                self.header_cell(row,data_column+idx,name)
+            data_row = row+1
+        if index:
+            label = index_label or df.index.name
+            if label:
+                self.header_cell(data_row-1,column,label)
+        block = frame_block(df,data_row,column,data_column,index)
+        for row_number in [row_number for row_number in self.rows if data_row <= row_number <= block.last_row]:
+            # cells created before are overwritten, as by DataFrame.to_excel
+            cells = self.rows[row_number]
+            for idy in [idy for idy in cells if column <= idy < data_column+len(df.columns)]:
+                del cells[idy]
+        self.blocks.append(block)
+
+    def save_to(self,wb):
+        '''Write the sheet into write-only workbook as new worksheet, rows are generated from DataFrames one by one,
+        then references to the DataFrames are released'''
+        ws = wb.create_sheet(self.title)
+        for letter,dimension in self.column_dimensions.items():
+            if dimension.width is not None:
+                ws.column_dimensions[letter].width = dimension.width
+        for merged in self.merged_cells:
+            ws.merged_cells.add(merged)
+        last_row = max(list(self.rows)+[block.last_row for block in self.blocks]+[0])
+        pending = [(block.data_row,order,block.rows()) for order,block in enumerate(self.blocks) if len(block.df) > 0]
+        heapq.heapify(pending)
+        active = list() # (order, iterator of rows) of blocks which cover current row
+        for row in range(1,last_row+1):
+            while pending and pending[0][0] == row:
+                _,order,rows = heapq.heappop(pending)
+                active.append((order,rows))
+            active.sort(key=lambda item: item[0]) # later DataFrames overwrite earlier ones
+            values = dict()
+            for order,rows in list(active):
+                cells = next(rows,None)
+                if cells is None:
+                    active.remove((order,rows))
+                    continue
+                for column,value,header in cells:
+                    values[column] = (value,header)
+            for column,cell in self.rows.get(row,{}).items():
+                values[column] = cell
+            if not values:
+                ws.append([])
+                continue
+            line = [None]*max(values)
+            for column,value in values.items():
+                line[column-1] = self.output_cell(ws,value)
+            ws.append(line)
+        for chart,anchor in self.charts:
+            ws.add_chart(chart,anchor)
+        self.rows.clear()
+        self.blocks = list()
+        self.charts = list()
+        return ws
+
+    def output_cell(self,ws,value):
+        '''Value or WriteOnlyCell of cell of the sheet: buffered_cell or (value, True if it is cell of index)'''
+        if isinstance(value,tuple):
+            value,header = value
+            if not (header and self.styled_header):
+                return value
+            styled = WriteOnlyCell(ws,value=value)
+            self.style_header(styled)
+            return styled
+        cell = value
+        if cell.alignment is None and cell.font is None and cell.border is None:
+            return cell.value
+        styled = WriteOnlyCell(ws,value=cell.value)
+        if cell.alignment is not None:
+            styled.alignment = cell.alignment
+        if cell.font is not None:
+            styled.font = cell.font
+        if cell.border is not None:
+            styled.border = cell.border
+        return styled
@@ -0,0 +1,14 @@
+import os
+import sys
+import pytest
+
+benchmarks_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'benchmarks')
+if benchmarks_dir not in sys.path:
+    sys.path.insert(0,benchmarks_dir)
+from generate_campaign import generate_mfr_campaign
+
+
+@pytest.fixture
+def campaign(tmp_path):
+    '''Synthetic campaign: 2 cases x 3 files, returns path of direcory_list.json'''
+    return generate_mfr_campaign(str(tmp_path),nb_of_cases=2,files_per_case=3,nb_of_samples=1200,data_rate=10)
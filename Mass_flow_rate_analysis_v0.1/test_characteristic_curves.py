@@ -0,0 +1,56 @@
+import os
+import numpy as np
+import pytest
+from CharacteristicCurves import batched_polyfit,characteristic_curves,curves_path
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+
+
+@pytest.mark.parametrize('degree',[1,2,3])
+def test_batched_polyfit_matches_polyfit_with_nan(degree):
+    rng = np.random.default_rng(3)
+    x = rng.uniform(1,8,(6,9))
+    y = 0.3+0.2*x-0.01*x**2+rng.normal(0,0.01,x.shape)
+    x[1,[2,5]] = np.nan # missing files of a case
+    y[2,7] = np.nan
+    x[3,:] = np.nan # case without data
+    mask = ~np.isnan(x) & ~np.isnan(y)
+    coefficients = batched_polyfit(x,y,mask,degree)
+    for row in range(len(x)):
+        if mask[row].sum() == 0:
+            assert np.isnan(coefficients[row]).all()
+            continue
+        expected = np.polyfit(x[row,mask[row]],y[row,mask[row]],degree)[::-1] # from constant term
+        np.testing.assert_allclose(coefficients[row],expected,rtol=1e-7,atol=1e-10)
+
+
+def test_batched_polyfit_underdetermined_is_nan():
+    x = np.array([[2.0,2.0,2.0],[1.0,2.0,np.nan]])
+    y = np.array([[1.0,1.1,0.9],[1.0,2.0,np.nan]])
+    coefficients = batched_polyfit(x,y,~np.isnan(x),2)
+    assert np.isnan(coefficients).all() # one distinct pressure, two points - less than degree+1
+
+
+def test_fit_cached_loads_curves_without_reading_files(campaign,monkeypatch):
+    mfra = mass_flow_rate_analysis()
+    path = curves_path(campaign)
+    curves,cached = mfra.curves_from_dir(campaign,4,3,100,path,'sqrt')
+    assert not cached and os.path.exists(path)
+    expected = characteristic_curves.fit(*mfra.curve_data(mfra.data_container(campaign,4,3,100)),'sqrt')
+    np.testing.assert_allclose(curves.parameters,expected.parameters)
+
+    def no_reading(*args,**kwargs):
+        raise AssertionError('measurement files were read')
+    monkeypatch.setattr(mfra,'data_container',no_reading)
+    loaded,cached = mfra.curves_from_dir(campaign,4,3,100,path,'sqrt')
+    assert cached
+    np.testing.assert_allclose(loaded.predict_all(4e5),curves.predict_all(4e5))
+    monkeypatch.undo()
+
+    assert not mfra.curves_from_dir(campaign,4,3,100,path,'power')[1] # other model
+    assert not mfra.curves_from_dir(campaign,4,3,50,path,'power')[1] # other window size
+    directory = mfra.open_dir_list(campaign)['case_2']
+    changed = os.path.join(directory,mfra.get_files_from_dir(directory)[0])
+    stat = os.stat(changed)
+    os.utime(changed,ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9))
+    assert not mfra.curves_from_dir(campaign,4,3,50,path,'power')[1] # changed file
+    assert mfra.curves_from_dir(campaign,4,3,50,path,'power')[1]
@@ -0,0 +1,53 @@
+import os
+import numpy as np
+import pytest
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+
+
+def baseline_results(mfra,dir_list,idx_df_weight,idx_df_pressure,window_size):
+    '''Results of every file as calculated by the original per-file loop of data_arr'''
+    results = {}
+    for case,directory in mfra.open_dir_list(dir_list).items():
+        for file in mfra.get_files_from_dir(directory):
+            full_path = os.path.join(directory,file)
+            date,hour,data_rate = mfra.read_parameters_from_header(full_path)
+            df,oh = mfra.read_data(full_path)
+            data_stats_df,data_df = mfra.clc_avr_window(df,idx_df_weight,idx_df_pressure,window_size,data_rate)
+            results.setdefault(case,[]).append((mfra.clc_total_mfr(df,idx_df_weight,data_rate),df.iloc[:,idx_df_pressure].mean(),
+                                                data_stats_df.values[0],data_df.values))
+    return results
+
+
+@pytest.mark.parametrize('options',[{},{'chunk_rows':250},{'prefetch':2}])
+def test_data_container_matches_baseline(campaign,options):
+    mfra = mass_flow_rate_analysis(**options)
+    results = mfra.data_container(campaign,4,3,100)
+    expected = baseline_results(mfra,campaign,4,3,100)
+    assert results.cases_list == list(expected)
+    for idx,case in enumerate(results.cases_list):
+        files = expected[case]
+        assert results.nb_of_files(idx) == len(files)
+        np.testing.assert_allclose(results.case_mass_flow(idx),[file[0] for file in files])
+        np.testing.assert_allclose(results.case_pressure(idx),[file[1] for file in files])
+        np.testing.assert_allclose(results.case_stats(idx),[file[2] for file in files])
+        for run,file in zip(results.case_runs(idx),files):
+            np.testing.assert_allclose(results.run_windows(run),file[3])
+
+
+def test_data_arr_matches_baseline(campaign):
+    mfra = mass_flow_rate_analysis()
+    data_all,data_stat_all,mass_flow_avr,pressure_avr,cases_list = mfra.data_arr(campaign,4,3,50)[:5]
+    expected = baseline_results(mfra,campaign,4,3,50)
+    assert cases_list == list(expected)
+    np.testing.assert_allclose(data_all,[[file[3] for file in files] for files in expected.values()])
+    np.testing.assert_allclose(data_stat_all,[[file[2] for file in files] for files in expected.values()])
+    np.testing.assert_allclose(mass_flow_avr,[[file[0] for file in files] for files in expected.values()])
+    np.testing.assert_allclose(pressure_avr,[[file[1] for file in files] for files in expected.values()])
+
+
+def test_cached_results_are_the_same(campaign,tmp_path):
+    mfra = mass_flow_rate_analysis(cache_dir=str(tmp_path/'cache'))
+    first = mfra.data_container(campaign,4,3,100)
+    second = mfra.data_container(campaign,4,3,100) # from the cache
+    np.testing.assert_array_equal(first.windows,second.windows)
+    np.testing.assert_array_equal(first.mass_flow,second.mass_flow)
@@ -0,0 +1,43 @@
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+from StreamingWindow import window_accumulator
+
+
+def samples(nb_of_samples,seed=0):
+    rng = np.random.default_rng(seed)
+    weight = np.cumsum(rng.uniform(0,0.1,nb_of_samples))
+    pressure = 4e5+rng.normal(0,500,nb_of_samples)
+    return weight,pressure
+
+
+@pytest.mark.parametrize('window_size,stride',[(10,None),(7,3),(5,9),(64,64),(300,None)])
+def test_chunks_match_clc_avr_window(window_size,stride):
+    weight,pressure = samples(1037)
+    df = pd.DataFrame({'weight':weight,'pressure':pressure})
+    data_stats_df,data_df = mass_flow_rate_analysis().clc_avr_window(df,0,1,window_size,100,stride)
+    rng = np.random.default_rng(1)
+    bounds = np.unique(np.concatenate(([0,len(weight)],rng.integers(0,len(weight),15)))) # chunks of random length, also 1 sample
+    accumulator = window_accumulator(window_size,100,stride)
+    rows = [accumulator.update(weight[start:end],pressure[start:end]) for start,end in zip(bounds[:-1],bounds[1:])]
+    rows = np.concatenate(rows) if rows else np.empty((0,5))
+    np.testing.assert_allclose(rows,data_df.values,rtol=1e-12)
+    np.testing.assert_allclose(accumulator.data_df().values,data_df.values,rtol=1e-12)
+    np.testing.assert_allclose(accumulator.stats_df().values,data_stats_df.values,rtol=1e-12)
+    assert accumulator.total_mfr() == pytest.approx(mass_flow_rate_analysis().clc_total_mfr(df,0,100))
+    assert accumulator.mean_pressure() == pytest.approx(pressure.mean())
+
+
+def test_stream_file_matches_process_file(campaign):
+    mfra = mass_flow_rate_analysis()
+    directory = mfra.open_dir_list(campaign)['case_1']
+    path = os.path.join(directory,mfra.get_files_from_dir(directory)[0])
+    mass_flow,pressure,data_stats_df,data_df = mfra.process_file(path,4,3,100)
+    chunks = list(mfra.stream_file(path,4,3,100,chunk_rows=333))
+    accumulator = chunks[-1][1]
+    np.testing.assert_allclose(pd.concat([rows for rows,_ in chunks]).values,data_df.values)
+    np.testing.assert_allclose(accumulator.stats_df().values,data_stats_df.values)
+    assert accumulator.total_mfr() == pytest.approx(mass_flow)
+    assert accumulator.mean_pressure() == pytest.approx(pressure)
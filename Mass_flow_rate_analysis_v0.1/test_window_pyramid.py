@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+from WindowPyramid import window_pyramid
+
+
+@pytest.mark.parametrize('window_size,stride',[(1,None),(10,None),(16,4),(50,75),(1000,None)])
+def test_results_match_direct_windows(window_size,stride):
+    rng = np.random.default_rng(2)
+    df = pd.DataFrame({'weight':np.cumsum(rng.uniform(0,0.2,3001)),'pressure':6e5+rng.normal(0,800,3001)})
+    mfra = mass_flow_rate_analysis()
+    data_stats_df,data_df = mfra.clc_avr_window(df,0,1,window_size,50,stride)
+    mass_flow,pressure,pyramid_stats_df,pyramid_df = window_pyramid.from_df(df,0,1,50).results(window_size,stride)
+    np.testing.assert_allclose(pyramid_df.values,data_df.values,rtol=1e-9)
+    np.testing.assert_allclose(pyramid_stats_df.values,data_stats_df.values,rtol=1e-9)
+    assert mass_flow == pytest.approx(mfra.clc_total_mfr(df,0,50))
+    assert pressure == pytest.approx(df['pressure'].mean())
+
+
+def test_pyramid_container_matches_data_container(campaign):
+    mfra = mass_flow_rate_analysis()
+    case_files,pyramids = mfra.data_pyramids(campaign,4,3)
+    for window_size in (20,100):
+        expected = mfra.data_container(campaign,4,3,window_size)
+        results = mfra.pyramid_container(case_files,pyramids,window_size)
+        assert results.cases_list == expected.cases_list
+        np.testing.assert_allclose(results.windows,expected.windows)
+        np.testing.assert_allclose(results.stats,expected.stats)
+        np.testing.assert_allclose(results.mass_flow,expected.mass_flow)
+        np.testing.assert_allclose(results.pressure,expected.pressure)
@@ -0,0 +1,27 @@
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+from MassFlowRateAnalysis import mass_flow_rate_analysis
+from WriteOnlySheet import write_only_sheet
+
+
+def workbook_content(path):
+    wb = load_workbook(path)
+    return {ws.title:({cell.coordinate:cell.value for row in ws.iter_rows() for cell in row if cell.value is not None},
+                      sorted(str(merged) for merged in ws.merged_cells.ranges),len(ws._charts)) for ws in wb.worksheets}
+
+
+def test_write_only_report_matches_to_excel(campaign,tmp_path):
+    mfra = mass_flow_rate_analysis()
+    results = mfra.data_container(campaign,4,3,100)
+    mfra.save_report(str(tmp_path/'regular.xlsx'),results)
+    mfra.save_report(str(tmp_path/'write_only.xlsx'),results,write_only=True)
+    assert workbook_content(tmp_path/'write_only.xlsx') == workbook_content(tmp_path/'regular.xlsx')
+
+
+def test_unsupported_frames_raise_value_error():
+    sheet = write_only_sheet('sheet')
+    with pytest.raises(ValueError):
+        sheet.write_frame(pd.DataFrame({'a':[1]},index=pd.MultiIndex.from_tuples([(1,2)])))
+    with pytest.raises(ValueError):
+        sheet.write_frame(pd.DataFrame([[1,2]],columns=pd.MultiIndex.from_product([['x'],['a','b']])),index=False)
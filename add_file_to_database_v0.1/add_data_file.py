@@ -1,50 +1,91 @@
+import os
 import pandas as pd
-from header_fit import *
-from SLPM_to_sgps import *
+from read_measurement_file import *
+from database_model import *
 
-def add_data_file(file_name,path,d_measurements,general_date,case_name,description,additional_info):
+record_format=1 # version of records prepared by read_run_file, records of other version in the cache are not used
+
+def read_run_file(file_name,path,additional_info,data=None,compact=False):
+    '''Read single measurement file and prepare its record for the database.
+    Returns run name, number of columns and the record.
+    Files are independent from each other, so the function can be run in separate process.
+    data - (optional) content of the file already read (see prefetch_pipeline)
+    compact - if True the record is run_record (raw data in typed arrays, see database_model), otherwise dictionary
+    with raw data as list of rows
+    '''
     name=file_name.split('.txt')[0]
-    full_path=path+'\\'+ file_name
-    df=pd.read_csv(full_path,sep='\t',skiprows=1,header=[0,1])
-    df.columns=header_fit(len(df.columns))
-    column_list=pd.read_csv(full_path,sep='\t').columns.tolist()
-    date,time,data_rate_Hz=column_list[0],column_list[1],int(column_list[3])
-
-    ix_nb=[]
-    for x,y in enumerate(df.columns):
-        if y.find('SLPM')>=0:
-            ix_nb.append(x)
-    
-    if len(ix_nb)==2:
-        for i,j in enumerate(ix_nb):
-            new_column_list='Mass flow rate - A'+ str(i+1) +' [g/s]'
-            df[new_column_list]=SLPM_to_sgps(df.iloc[:,j])
-            column_list.append( new_column_list)
-
-    elif len(ix_nb)==1:
-        new_column_list='Mass flow rate [g/s]'
-        df[new_column_list]=SLPM_to_sgps(df.iloc[:,ix_nb[0]])
-        column_list.append(new_column_list)  
-
-    d_measurements[general_date][case_name]['data'][name]={}
-    d_measurements[general_date][case_name]['data'][name]['file_info']={}
-    d_measurements[general_date][case_name]['data'][name]['time_date']={}
-    d_measurements[general_date][case_name]['nb_of_columns']=len(df.columns)
+    full_path=os.path.join(path,file_name)
+    date,time,data_rate_Hz,df,plan=read_measurement_file_schema(full_path,data=data)
+    df=plan.kernel.convert_frame(df) # mass flow rate from flow columns, see schema_registry and mass_flow_kernel
+
+    df_avr=df.describe()
+    data_avr={}
+    data_avr['data']=df_avr.to_numpy().tolist()
+    data_avr['header_columns'] = df_avr.columns.tolist()
+    data_avr['header_rows'] = df_avr.index.tolist()
+
+    file_info={'file_name':file_name,'path':full_path}
+    time_date={'date':date,'hour':time}
+    if compact:
+        return name,len(df.columns),run_record.from_frame(df,file_info,time_date,data_rate_Hz,additional_info,data_avr)
+
+    run={}
+    run['file_info']=file_info
+    run['time_date']=time_date
+    run['data_rate_Hz']=data_rate_Hz
+    run['data_frame']={}
+
+    run['data_frame']['data'] = df.to_numpy().tolist()
+    run['data_frame']['header_columns'] = df.columns.tolist()
+    run['additional_info']=additional_info
+    run['data_avr']=data_avr
+    return name,len(df.columns),run
+
+def run_cache_parameters(additional_info,compact=False):
+    '''Parameters of cached record of a file (see result_cache): format of the record and fingerprint of registered layouts
+    (see schema_registry), so records read with other schemas are read again'''
+    parameters=('read_run_file',record_format,schemas_fingerprint(),additional_info)
+    if compact:
+        return parameters+('compact',)
+    return parameters
+
+def read_run_file_cached(file_name,path,additional_info,cache=None,data=None,compact=False):
+    '''The same as read_run_file, but records of unchanged files are taken from the cache (see result_cache)'''
+    if cache is None:
+        return read_run_file(file_name,path,additional_info,data,compact)
+    full_path=os.path.join(path,file_name)
+    parameters=run_cache_parameters(additional_info,compact)
+    result=cache.get(full_path,parameters)
+    if result is None:
+        result=read_run_file(file_name,path,additional_info,data,compact)
+        cache.put(full_path,parameters,result)
+    return result
+
+def prefetch_run_file(file_name,path,additional_info,cache,read,compact=False):
+    '''Content of the file read by prefetch thread, None if the record is in the cache'''
+    full_path=os.path.join(path,file_name)
+    if cache is not None and os.path.exists(cache.entry_path(full_path,run_cache_parameters(additional_info,compact))):
+        return None
+    return read(full_path)
+
+def read_run_item(item,data=None,cache=None,compact=False):
+    '''read_run_file_cached of item: (file name, path, additional info), arguments in order used by pipeline (see prefetch_pipeline),
+    so files of many folders can be read by one pipeline'''
+    file_name,path,additional_info=item
+    return read_run_file_cached(file_name,path,additional_info,cache,data,compact)
+
+def prefetch_run_item(item,cache,read,compact=False):
+    '''prefetch_run_file of item: (file name, path, additional info)'''
+    file_name,path,additional_info=item
+    return prefetch_run_file(file_name,path,additional_info,cache,read,compact)
+
+def insert_run(d_measurements,general_date,case_name,description,name,nb_of_columns,run):
+    '''Insert prepared run record (see read_run_file) into database'''
+    d_measurements[general_date][case_name]['data'][name]=run
+    d_measurements[general_date][case_name]['nb_of_columns']=nb_of_columns
     d_measurements[general_date][case_name]['description'] = description
-    d_measurements[general_date][case_name]['data'][name]['file_info']['file_name']=file_name
-    d_measurements[general_date][case_name]['data'][name]['file_info']['path']=full_path
-    d_measurements[general_date][case_name]['data'][name]['time_date']['date']=date
-    d_measurements[general_date][case_name]['data'][name]['time_date']['hour']=time
-    d_measurements[general_date][case_name]['data'][name]['data_rate_Hz']=data_rate_Hz
-    d_measurements[general_date][case_name]['data'][name]['data_frame']={}
-
-    d_measurements[general_date][case_name]['data'][name]['data_frame']['data'] = df.to_numpy().tolist()
-    d_measurements[general_date][case_name]['data'][name]['data_frame']['header_columns'] = df.columns.tolist()
-    d_measurements[general_date][case_name]['data'][name]['additional_info']=additional_info
-
-    d_measurements[general_date][case_name]['data'][name]['data_avr']={}
-    d_measurements[general_date][case_name]['data'][name]['data_avr']['data']=df.describe().to_numpy().tolist()
-    d_measurements[general_date][case_name]['data'][name]['data_avr']['header_columns'] = df.describe().columns.tolist()
-    d_measurements[general_date][case_name]['data'][name]['data_avr']['header_rows'] = df.describe().index.tolist()
-    
-    return d_measurements
\ No newline at end of file
+    return d_measurements
+
+def add_data_file(file_name,path,d_measurements,general_date,case_name,description,additional_info):
+    name,nb_of_columns,run=read_run_file(file_name,path,additional_info)
+    return insert_run(d_measurements,general_date,case_name,description,name,nb_of_columns,run)
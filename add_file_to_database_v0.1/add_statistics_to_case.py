@@ -1,43 +1,113 @@
 
+import warnings
 import pandas as pd
 import numpy as np
+from database_model import run_record,raw_frame
 
-def extract_from_files(case_data_frame,to_avr,value_type):
-    df=pd.DataFrame(case_data_frame['data'],
-                            columns=case_data_frame['header_columns'])
-    to_avr.append(df.describe().iloc[value_type].values)
-    return df
+# Statistics calculated by DataFrame.describe, they are saved for every file in 'data_avr'
+describe_rows=['count','mean','std','min','25%','50%','75%','max']
+aliases={'median':'50%'}
+
+def percentile(name):
+    '''Percentile from statistic name, e.g. '90%' -> 90.0, None if the name is not a percentile'''
+    if name.endswith('%'):
+        try:
+            return float(name[:-1])
+        except ValueError:
+            return None
+    return None
+
+def statistic_name(fun):
+    '''Name of statistic as in DataFrame.describe: count, mean, std, min, max or percentile e.g. 25%, 90%.
+    'median' is the same as '50%', unknown names are replaced by mean. Percentile outside of [0, 100] raises ValueError.'''
+    fun=aliases.get(fun,fun)
+    if fun in describe_rows:
+        return fun
+    value=percentile(fun)
+    if value is not None:
+        if not 0 <= value <= 100:
+            raise ValueError('Percentile has to be between 0%% and 100%%, got %s' % fun)
+        return fun
+    return 'mean'
+
+def union_columns(headers):
+    '''Columns of all files in order of first appearance, files of a case can have different layouts'''
+    return list(dict.fromkeys(column for header in headers for column in header))
+
+def clc_statistics(block,names):
+    '''Calculate statistics of data block in one pass.
+    Input:
+    block - array (files x samples x columns), shorter files are filled with NaN
+    names - list of statistics names, see statistic_name
+    Returns dictionary: name - array (files x columns)
+    '''
+    result={}
+    with warnings.catch_warnings(): # columns missing in a file are all NaN, their statistics are NaN
+        warnings.simplefilter('ignore',RuntimeWarning)
+        percentiles=[name for name in names if percentile(name) is not None]
+        if percentiles:
+            values=np.nanpercentile(block,[percentile(name) for name in percentiles],axis=1) # linear, as in describe
+            result.update(zip(percentiles,values))
+        for name in names:
+            if name == 'count':
+                result[name]=np.sum(~np.isnan(block),axis=1).astype(float)
+            elif name == 'mean':
+                result[name]=np.nanmean(block,axis=1)
+            elif name == 'std':
+                result[name]=np.nanstd(block,axis=1,ddof=1)
+            elif name == 'min':
+                result[name]=np.nanmin(block,axis=1)
+            elif name == 'max':
+                result[name]=np.nanmax(block,axis=1)
+    return result
+
+def case_statistics(m_dict,names):
+    '''Calculate statistics for all files within measurement case.
+    If all statistics are already saved in 'data_avr' of files (see add_data_file), they are taken from there
+    without reading raw data. Otherwise raw data of all files are joined into one block and statistics are calculated at once.
+    Files can have different columns (e.g. 7, 10 or 14 columns), header is union of columns of all files
+    and statistics of columns missing in a file are NaN.
+    Returns header (columns) and dictionary: name - array (files x columns)
+    '''
+    runs=list(m_dict['data'].values())
+    if all('data_avr' in run and set(names) <= set(run['data_avr']['header_rows']) for run in runs):
+        header=union_columns(run['data_avr']['header_columns'] for run in runs)
+        position={column:idx for idx,column in enumerate(header)}
+        result={name:np.full((len(runs),len(header)),np.nan) for name in names}
+        for idx,run in enumerate(runs):
+            columns=[position[column] for column in run['data_avr']['header_columns']]
+            for name in names:
+                result[name][idx,columns]=run['data_avr']['data'][run['data_avr']['header_rows'].index(name)]
+        return header,result
+    frames=[run.frame() if isinstance(run,run_record) else raw_frame(run['data_frame'])
+            for run in runs] # compact records and columns of *.npz database are not copied
+    numeric=[df.select_dtypes(include='number').columns.tolist() for df in frames] # the same columns as in describe
+    header=union_columns(numeric)
+    position={column:idx for idx,column in enumerate(header)}
+    block=np.full((len(frames),max(len(df) for df in frames),len(header)),np.nan)
+    for idx,(df,columns) in enumerate(zip(frames,numeric)):
+        block[idx,:len(df),[position[column] for column in columns]]=df[columns].to_numpy(dtype=float).T
+    return header,clc_statistics(block,names)
 
 def avr(m_dict,fun='mean'):
-    if fun == 'mean':
-        colmn = 1
-        name = 'mean'
-    elif fun == 'std': #standard deviation
-        colmn = 2
-        name = 'std'
-    elif fun == 'min':
-        colmn = 3
-        name = 'min'
-    elif fun == 'max':
-        colmn = 7
-        name = 'max'
-    else:
-        colmn = 1
-        name = 'mean'
-    temp_value_list=[]
-    for k1 in m_dict['data'].keys():
-        df=extract_from_files(m_dict['data'][k1]['data_frame'],temp_value_list,colmn)
-    temp_x=np.array(temp_value_list,dtype=float)
-    df2=pd.DataFrame(temp_x.reshape(temp_x.shape[0],temp_x.shape[-1]),columns=df.describe().columns)
+    name=statistic_name(fun)
+    header,result=case_statistics(m_dict,[name])
+    df2=pd.DataFrame(result[name],columns=header)
     return df2,name
 
 def add_statistics_to_case(db_dictionary,function='mean'):
-    
+    '''Calculate statistics of all files for every measurement case.
+    function - name of statistic or list of names, e.g. ['mean','std','min','max','90%','count'] (see statistic_name).
+    All statistics of a case are calculated in one pass.
+    '''
+    if isinstance(function,str):
+        function=[function]
+    names=list(dict.fromkeys(statistic_name(fun) for fun in function))
     for k in db_dictionary.keys():
         for k2 in db_dictionary[k].keys():
-            df3,name=avr(db_dictionary[k][k2],function)
-            db_dictionary[k][k2][name]={}
-            db_dictionary[k][k2][name]['data']=df3.values.tolist()
-            db_dictionary[k][k2][name]['header']=df3.columns.values.tolist()
+            header,result=case_statistics(db_dictionary[k][k2],names)
+            for name in names:
+                db_dictionary[k][k2][name]={}
+                db_dictionary[k][k2][name]['data']=result[name].tolist()
+                db_dictionary[k][k2][name]['header']=list(header)
     return db_dictionary
-
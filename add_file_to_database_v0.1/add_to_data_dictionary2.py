@@ -1,22 +1,78 @@
 import os
+from itertools import repeat
+from functools import partial
 from add_data_file import *
+import shared_modules
+from stage_profiler import *
+from prefetch_pipeline import *
 
-def add_to_data_dictionary2(folder_path,d_measurements,general_date='20000101',case_name='case_1',description='default',additional_info='default'):
-    path=folder_path
+def folder_files(path):
+    '''Measurement files in folder, sorted by number of measurement (the last part of file name)'''
     dir_list=os.listdir(path)
-    file_list=[dir_list[f] for f in range(len(dir_list)) if os.path.isfile(path+'\\'+dir_list[f])] #delete folder in directory from dir list
+    file_list=[dir_list[f] for f in range(len(dir_list)) if os.path.isfile(os.path.join(path,dir_list[f]))] #delete folder in directory from dir list
 
     def select_data_to_sort(file_name):
         '''sort files in directory'''
         return int(file_name.split('.txt')[0].split('_')[-1])
     file_list.sort(key=select_data_to_sort)
-    
+    return file_list
+
+def read_runs(items,executor=None,cache=None,profiler=None,prefetch=None,compact=False):
+    '''Iterator of records of files (see read_run_file) in order of items: (file name, path, additional info).
+    Items can be files of many folders, so prefetch and worker processes are not stopped between folders.
+    Arguments are the same as of add_to_data_dictionary2.
+    '''
+    prefetch=prefetch_config(prefetch)
+    if prefetch is not None:
+        return pipeline(items,partial(read_run_item,cache=cache,compact=compact),prefetch,
+                        partial(prefetch_run_item,cache=cache,read=prefetch.read,compact=compact),executor,profiler)
+    if executor is None:
+        return map(read_run_item,items,repeat(None),repeat(cache),repeat(compact))
+    return executor.map(read_run_item,items,repeat(None),repeat(cache),repeat(compact))
+
+def add_to_data_dictionary2(folder_path,d_measurements,general_date='20000101',case_name='case_1',description='default',additional_info='default',executor=None,cache=None,
+                            profiler=None,prefetch=None,compact=False,runs=None,file_list=None):
+    '''Add all files from folder into database.
+    executor - (optional) concurrent.futures executor, e.g. ProcessPoolExecutor, used to read files in parallel.
+    cache - (optional) result_cache with records of already read files
+    profiler - (optional) stage_profiler, time of every file is measured (with executor it is time of waiting for the file)
+    prefetch - (optional) number of files read ahead by background threads while earlier files are processed,
+    or prefetch_options (depth, readers, read function), see prefetch_pipeline
+    compact - if True records of files are run_record, raw data is kept in typed arrays (see database_model)
+    runs - (optional) iterator of records of files, already started for files of this and next folders (see read_runs),
+    e.g. one pipeline over files of all folders (see final_add_files). By default files of the folder are read here.
+    file_list - files of the folder queued into runs (required with runs), the folder is not listed again, so files
+    created or deleted in the meantime do not shift records to other files. Records of the files are taken from runs.
+    With runs the files are already read, so executor, cache and prefetch can not be given (ValueError);
+    compact has to be the same as given to read_runs.
+    Records are always added in the sorted order of files.
+    '''
+    if runs is not None and file_list is None:
+        raise ValueError('file_list of files queued into runs is required')
+    if runs is not None and (executor is not None or cache is not None or prefetch is not None):
+        raise ValueError('executor, cache and prefetch are used by read_runs, they can not be given together with runs')
+    if profiler is None:
+        profiler=stage_profiler(enabled=False)
+    path=folder_path
+    if file_list is None:
+        file_list=folder_files(path)
+
     if general_date not in d_measurements.keys():
         d_measurements[general_date]={}
     if case_name not in d_measurements[general_date].keys():
         d_measurements[general_date][case_name]={}
     d_measurements[general_date][case_name]['data']={}
-    for i in file_list:
-        file_name=i
-        d_measurements=add_data_file(file_name,path,d_measurements,general_date,case_name,description,additional_info)
-    return d_measurements
\ No newline at end of file
+    if runs is None:
+        runs=read_runs([(file_name,path,additional_info) for file_name in file_list],executor,cache,profiler,prefetch,compact)
+    runs=iter(runs)
+    for file_name in file_list:
+        with profiler.stage('read_run_file',file=file_name,case=case_name,path=os.path.join(path,file_name)) as stage:
+            record=next(runs,None)
+            if record is None:
+                raise ValueError('runs ended before file %s of %s' % (file_name,path))
+            name,nb_of_columns,run=record
+            if name != file_name.split('.txt')[0]:
+                raise ValueError('record of %s found instead of file %s of %s' % (name,file_name,path))
+            stage.rows=run.nb_of_samples() if compact else len(run['data_frame']['data'])
+        d_measurements=insert_run(d_measurements,general_date,case_name,description,name,nb_of_columns,run)
+    return d_measurements
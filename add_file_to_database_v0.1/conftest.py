@@ -0,0 +1,14 @@
+import os
+import sys
+import pytest
+
+benchmarks_dir = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'benchmarks')
+if benchmarks_dir not in sys.path:
+    sys.path.insert(0,benchmarks_dir)
+from generate_campaign import generate_db_campaign
+
+
+@pytest.fixture
+def files_to_add(tmp_path):
+    '''Synthetic campaign: 4 cases x 3 files with 7, 10 and 14 columns, returns files_to_add dictionary of final_add_files'''
+    return generate_db_campaign(str(tmp_path/'campaign'),nb_of_cases=4,files_per_case=3,nb_of_samples=120,nb_of_columns=[7,10,14])
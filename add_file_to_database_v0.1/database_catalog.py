@@ -0,0 +1,175 @@
+'''
+Indexed catalog of the database (SQLite file).
+
+The catalog has one row per measurement file (run): date, case name, description, additional info, file name and path,
+date and hour of the measurement, data rate, number of samples and columns, and summary statistics of every column
+(the same as in 'data_avr', e.g. mean, std, min, max of 'Pressure-1,[kPa]'). Raw data is not saved in the catalog.
+Runs can be found by range of dates, case names, description and ranges of statistics, without reading the database:
+
+    catalog = database_catalog('database.catalog.sqlite')
+    runs = catalog.query(case_name=['run_d2_v1','run_d3_v1','run_d4_v1'],values={'Pressure-1,[kPa]':(400,600)})
+    get_run(database,runs[0]) # record of the file in the database (database can be lazy, see lazy_database)
+
+The catalog is created and updated by final_add_files (catalog_path argument) or from existing database by add_database.
+'''
+import os
+import sqlite3
+from collections.abc import Mapping
+
+run_fields = ['date','case_name','run_name','description','additional_info','file_name','file_path','run_date','run_hour',
+              'data_rate_Hz','nb_of_samples','nb_of_columns']
+
+schema = '''
+CREATE TABLE IF NOT EXISTS runs (
+    id INTEGER PRIMARY KEY,
+    date TEXT, case_name TEXT, run_name TEXT, description TEXT, additional_info TEXT,
+    file_name TEXT, file_path TEXT, run_date TEXT, run_hour TEXT,
+    data_rate_Hz REAL, nb_of_samples INTEGER, nb_of_columns INTEGER,
+    UNIQUE (date, case_name, run_name));
+CREATE INDEX IF NOT EXISTS runs_case ON runs (case_name, date);
+CREATE INDEX IF NOT EXISTS runs_description ON runs (description);
+CREATE TABLE IF NOT EXISTS run_values (
+    run_id INTEGER, column_name TEXT, statistic TEXT, value REAL,
+    PRIMARY KEY (run_id, column_name, statistic)) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS run_values_range ON run_values (column_name, statistic, value);
+'''
+
+def default_catalog_path(database_path):
+    '''Default path of the catalog of database, e.g. database.json -> database.catalog.sqlite'''
+    return os.path.splitext(database_path)[0]+'.catalog.sqlite'
+
+def get_run(database,handle):
+    '''Record of measurement file in the database for run handle returned by database_catalog.query'''
+    return database[handle['date']][handle['case_name']]['data'][handle['run_name']]
+
+def run_samples(run):
+    '''Number of samples of the run, from 'data_avr' (count) if available, so raw data is not read'''
+    if 'data_avr' in run and 'count' in run['data_avr']['header_rows']:
+        return int(run['data_avr']['data'][run['data_avr']['header_rows'].index('count')][0])
+    return len(run['data_frame']['data'])
+
+
+class database_catalog:
+    def __init__(self,path):
+        '''Open catalog (SQLite file), it is created if not exists'''
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(schema)
+
+    def add_database(self,database):
+        '''Add all cases of the database (dictionary or lazy_database) into catalog, cases already in the catalog are replaced'''
+        with self.connection:
+            for date,cases in database.items():
+                for case_name,case in cases.items():
+                    if isinstance(case,Mapping) and 'data' in case:
+                        self.remove_case(date,case_name)
+                        for run_name,run in case['data'].items():
+                            self.add_run(date,case_name,case.get('description'),run_name,run)
+
+    def add_run(self,date,case_name,description,run_name,run):
+        row = {'date':date,'case_name':case_name,'run_name':run_name,'description':description,
+               'additional_info':str(run.get('additional_info')),'file_name':run['file_info']['file_name'],
+               'file_path':run['file_info']['path'],'run_date':run['time_date']['date'],'run_hour':run['time_date']['hour'],
+               'data_rate_Hz':run['data_rate_Hz'],'nb_of_samples':run_samples(run),
+               'nb_of_columns':len(run['data_frame']['header_columns'])}
+        cursor = self.connection.execute('INSERT INTO runs (%s) VALUES (%s)' % (','.join(run_fields),','.join('?'*len(run_fields))),
+                                         [row[field] for field in run_fields])
+        if 'data_avr' in run:
+            avr = run['data_avr']
+            self.connection.executemany('INSERT INTO run_values VALUES (?,?,?,?)',
+                                        [(cursor.lastrowid,column,statistic,value)
+                                         for statistic,values in zip(avr['header_rows'],avr['data'])
+                                         for column,value in zip(avr['header_columns'],values)])
+
+    def clear(self):
+        '''Remove all runs from the catalog'''
+        with self.connection:
+            self.connection.execute('DELETE FROM run_values')
+            self.connection.execute('DELETE FROM runs')
+
+    def remove_case(self,date,case_name):
+        self.connection.execute('DELETE FROM run_values WHERE run_id IN (SELECT id FROM runs WHERE date=? AND case_name=?)',(date,case_name))
+        self.connection.execute('DELETE FROM runs WHERE date=? AND case_name=?',(date,case_name))
+
+    def query(self,date_from=None,date_to=None,case_name=None,description=None,values=None,statistic='mean',order_by=('date','case_name','id'),
+              limit=None):
+        '''Find runs, all conditions have to be met.
+        Input:
+        date_from, date_to - range of dates (date of the case in the database, e.g. '20220522'), inclusive
+        case_name, description - name (or list of names), or pattern with % wildcard, e.g. 'run_d%'
+        values - dictionary: column name (or tuple: column name, statistic) - (minimum, maximum), None means no limit,
+        e.g. {'Pressure-1,[kPa]':(400,600),('Temperature-1,[0C]','max'):(None,30)}
+        statistic - statistic used for values given only by column name, e.g. mean, std, min, max, 50%
+        order_by - fields of runs used to sort the result
+        limit - maximum number of runs
+        Returns list of run handles (dictionaries with fields of runs table), see get_run
+        '''
+        conditions = list()
+        parameters = list()
+        if date_from is not None:
+            conditions.append('date >= ?')
+            parameters.append(date_from)
+        if date_to is not None:
+            conditions.append('date <= ?')
+            parameters.append(date_to)
+        for field,value in (('case_name',case_name),('description',description)):
+            if value is None:
+                continue
+            if isinstance(value,str) and '%' in value:
+                conditions.append(field+' LIKE ?')
+                parameters.append(value)
+            elif isinstance(value,str):
+                conditions.append(field+' = ?')
+                parameters.append(value)
+            else:
+                conditions.append(field+' IN (%s)' % ','.join('?'*len(value)))
+                parameters.extend(value)
+        for column,(minimum,maximum) in (values or {}).items():
+            column,column_statistic = column if isinstance(column,tuple) else (column,statistic)
+            condition = 'id IN (SELECT run_id FROM run_values WHERE column_name = ? AND statistic = ?'
+            parameters.extend([column,column_statistic])
+            if minimum is not None:
+                condition += ' AND value >= ?'
+                parameters.append(minimum)
+            if maximum is not None:
+                condition += ' AND value <= ?'
+                parameters.append(maximum)
+            conditions.append(condition+')')
+        for field in order_by:
+            if field not in run_fields and field != 'id':
+                raise ValueError('Unknown field: '+str(field))
+        sql = 'SELECT * FROM runs'
+        if conditions:
+            sql += ' WHERE '+' AND '.join(conditions)
+        sql += ' ORDER BY '+','.join(order_by)
+        if limit is not None:
+            sql += ' LIMIT %d' % int(limit)
+        return [dict(row) for row in self.connection.execute(sql,parameters)]
+
+    def run_values(self,handle,statistic='mean'):
+        '''Summary statistic of all columns of the run: dictionary column name - value'''
+        rows = self.connection.execute('SELECT column_name,value FROM run_values WHERE run_id = ? AND statistic = ?',(handle['id'],statistic))
+        return {row['column_name']:row['value'] for row in rows}
+
+    def cases(self):
+        '''List of cases: date, case name, description and number of runs (see db_quickview)'''
+        rows = self.connection.execute('SELECT date,case_name,description,COUNT(*) AS nb_of_runs FROM runs '
+                                       'GROUP BY date,case_name ORDER BY date,case_name')
+        return [dict(row) for row in rows]
+
+    def nb_of_runs(self):
+        return self.connection.execute('SELECT COUNT(*) FROM runs').fetchone()[0]
+
+    def columns(self):
+        '''Names of columns with statistics'''
+        return [row[0] for row in self.connection.execute('SELECT DISTINCT column_name FROM run_values ORDER BY column_name')]
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
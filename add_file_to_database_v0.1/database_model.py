@@ -0,0 +1,167 @@
+'''
+Compact in-memory representation of the database.
+
+By default raw data of a measurement file is kept as list of rows of Python numbers (data_frame['data']), which takes
+about 10 times more memory than the numbers. In compact representation:
+- run_record - one measurement file, float columns are kept in one contiguous float64 block (column after column),
+  other columns (e.g. Sample Nb., Gas type) in typed arrays. frame() returns DataFrame which uses these arrays without copying,
+- case_record - measurement case (dictionary: data, nb_of_columns, description, statistics) with helpers,
+- campaign_record - whole database (dictionary: date - case name - case_record).
+They can be used in the same way as dictionaries, e.g. database[date][case_name]['data'][run_name]['data_frame']['data']
+(raw data is returned as column_data of columns without copy, see database_npz), so they can be saved by save_database,
+used by add_statistics_to_case, display_tk_window etc.
+
+    database = read_database_from_file('database.json',compact=True) # or compact_runs(database)
+    run = database['20220522']['test_20220522_conf_1']['data']['run_c1_v1_1']
+    df = run.frame() # without copy
+'''
+from collections.abc import Mapping
+import numpy as np
+import pandas as pd
+from database_npz import column_data
+
+run_keys = ('file_info','time_date','data_rate_Hz','data_frame','additional_info','data_avr') # order of keys in the database file
+
+
+def raw_frame(data_frame):
+    '''DataFrame of raw data of the file (data_frame dictionary of the database), columns of structured array
+    or column_data (*.npz database) are not copied'''
+    data = data_frame['data']
+    if isinstance(data,(np.ndarray,column_data)) and data.dtype.names:
+        df = pd.DataFrame({name:data[name] for name in data.dtype.names},copy=False)
+        df.columns = data_frame['header_columns']
+        return df
+    return pd.DataFrame(data,columns=data_frame['header_columns'])
+
+
+class run_record(Mapping):
+    __slots__ = ('file_info','time_date','data_rate_Hz','additional_info','data_avr','header_columns','float_columns','block','typed')
+
+    def __init__(self,file_info,time_date,data_rate_Hz,additional_info,data_avr,header_columns,float_columns,block,typed):
+        '''
+        Input:
+        header_columns - names of all columns, in order of the file
+        float_columns - names of columns kept in block
+        block - float64 array (samples x float columns), Fortran order (every column is contiguous)
+        typed - dictionary: name - array of other column (e.g. int64, unicode)
+        '''
+        self.file_info = file_info
+        self.time_date = time_date
+        self.data_rate_Hz = data_rate_Hz
+        self.additional_info = additional_info
+        self.data_avr = data_avr
+        self.header_columns = list(header_columns)
+        self.float_columns = {name:idx for idx,name in enumerate(float_columns)}
+        self.block = block
+        self.typed = typed
+
+    @classmethod
+    def from_frame(cls,df,file_info,time_date,data_rate_Hz,additional_info,data_avr=None):
+        '''Record from DataFrame of the file (see read_run_file)'''
+        float_columns = [name for name in df.columns if df[name].dtype == np.float64]
+        block = np.asfortranarray(df[float_columns].to_numpy(dtype=np.float64)) if float_columns else np.empty((len(df),0))
+        typed = {}
+        for name in df.columns:
+            if name not in float_columns:
+                column = df[name].to_numpy()
+                typed[name] = column.astype(str) if column.dtype == object or column.dtype.kind in 'OUT' else column
+        return cls(file_info,time_date,data_rate_Hz,additional_info,data_avr,df.columns,float_columns,block,typed)
+
+    @classmethod
+    def from_dict(cls,run):
+        '''Record from dictionary of the database (raw data as list of rows or structured array)'''
+        return cls.from_frame(raw_frame(run['data_frame']),run['file_info'],run['time_date'],run['data_rate_Hz'],
+                              run.get('additional_info'),run.get('data_avr'))
+
+    def column(self,name):
+        '''Array of one column, without copy'''
+        if name in self.float_columns:
+            return self.block[:,self.float_columns[name]]
+        return self.typed[name]
+
+    def frame(self,columns=None):
+        '''DataFrame of raw data (all or selected columns), float and integer columns are not copied'''
+        return pd.DataFrame({name:self.column(name) for name in (columns or self.header_columns)},copy=False)
+
+    def records(self):
+        '''Raw data as structured array (copy of all columns)'''
+        return np.rec.fromarrays([self.column(name) for name in self.header_columns],names=self.header_columns).view(np.ndarray)
+
+    def nb_of_samples(self):
+        return len(self.block)
+
+    def nbytes(self):
+        return self.block.nbytes+sum(column.nbytes for column in self.typed.values())
+
+    def __getitem__(self,key):
+        if key == 'data_frame': # columns are not copied
+            return {'data':column_data([self.column(name) for name in self.header_columns],self.header_columns),
+                    'header_columns':list(self.header_columns)}
+        if key in run_keys and (key != 'data_avr' or self.data_avr is not None):
+            return getattr(self,key)
+        raise KeyError(key)
+
+    def __iter__(self):
+        return (key for key in run_keys if key != 'data_avr' or self.data_avr is not None)
+
+    def __len__(self):
+        return len(run_keys) if self.data_avr is not None else len(run_keys)-1
+
+    def to_dict(self):
+        '''Run as dictionary of the database, raw data as list of rows'''
+        run = dict(self)
+        run['data_frame'] = {'data':self.frame().to_numpy().tolist(),'header_columns':list(self.header_columns)}
+        return run
+
+
+class case_record(dict):
+    '''Measurement case: data (run name - run_record), nb_of_columns, description and statistics (see add_statistics_to_case)'''
+    __slots__ = ()
+
+    def runs(self):
+        return list(self['data'].values())
+
+    def column_block(self,name):
+        '''One column of all runs as array (runs x samples), shorter runs are filled with NaN'''
+        columns = [np.asarray(run.column(name),dtype=float) for run in self.runs()]
+        block = np.full((len(columns),max((len(column) for column in columns),default=0)),np.nan)
+        for idx,column in enumerate(columns):
+            block[idx,:len(column)] = column
+        return block
+
+    def statistic_frame(self,function='mean'):
+        '''Statistic of all runs as DataFrame (see display_avr_data_frame)'''
+        return pd.DataFrame(self[function]['data'],columns=self[function]['header'])
+
+    def nbytes(self):
+        return sum(run.nbytes() for run in self.runs())
+
+
+class campaign_record(dict):
+    '''Whole database: date - case name - case_record'''
+    __slots__ = ()
+
+    def cases(self):
+        '''(date, case name, case_record) of all cases'''
+        return [(date,case_name,case) for date,cases in self.items() for case_name,case in cases.items()]
+
+    def runs(self):
+        '''(date, case name, run name, run_record) of all measurement files'''
+        return [(date,case_name,run_name,run) for date,case_name,case in self.cases() for run_name,run in case['data'].items()]
+
+    def nbytes(self):
+        '''Memory of raw data of all files'''
+        return sum(case.nbytes() for _,_,case in self.cases())
+
+
+def compact_runs(database):
+    '''Convert database (dictionary) into compact representation, returns campaign_record'''
+    campaign = campaign_record()
+    for date,cases in database.items():
+        campaign[date] = {}
+        for case_name,case in cases.items():
+            if isinstance(case,Mapping) and 'data' in case:
+                case = case_record(case)
+                case['data'] = {run_name:run if isinstance(run,run_record) else run_record.from_dict(run) for run_name,run in case['data'].items()}
+            campaign[date][case_name] = case
+    return campaign
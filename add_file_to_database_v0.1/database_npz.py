@@ -0,0 +1,260 @@
+'''
+Columnar binary storage of the database (*.npz file).
+
+The file consists of:
+- catalog - the whole database dictionary without raw data of the files, saved as JSON text,
+- one array per column of every measurement file, e.g. run_12_c3 (float, integer or text column).
+In the catalog, raw data of the file (data_frame['data']) is replaced by name of its arrays (e.g. run_12).
+Arrays are stored without compression, so they can be read directly from the file.
+
+When the database is read, data_frame['data'] is a numpy structured array with one field per column
+(column_data of memory-mapped columns for lazy_database). It can be used directly to build DataFrame:
+pd.DataFrame(data_frame['data'],columns=data_frame['header_columns']), or without copy by database_model.raw_frame
+
+New cases can be appended to existing database (JSON or *.npz) without rewriting it. They are saved into
+segment files next to the database, e.g. database.seg1.npz, database.seg2.npz, which are merged with the database
+when it is read. compact_database joins all segments into single file.
+database_keys returns dates and names of cases without reading raw data: from the catalog of *.npz file,
+or from the index saved next to JSON file (e.g. database.keys.json, see keys_path). The index keeps size and
+modification time of the JSON file; if the JSON file is edited or replaced, the index is not used and it is created again.
+The index can be deleted at any time.
+'''
+import os
+import re
+import glob
+import json
+from collections.abc import Mapping
+import numpy as np
+
+catalog_key='catalog'
+
+def iterate_runs(database):
+    '''Yield data_frame dictionary of every measurement file in the database'''
+    for date in database.values():
+        for case in date.values():
+            if isinstance(case,Mapping) and 'data' in case:
+                for run in case['data'].values():
+                    yield run['data_frame']
+
+class column_data:
+    '''Raw data of measurement file as column arrays, used in the same way as structured array: data[name] - column (without copy),
+    data[idx] - row, data.dtype.names, len(data). Rows of all columns are joined only when they are requested (records, tolist),
+    so e.g. memory-mapped columns (see lazy_database) are read only when they are used.'''
+    __slots__=('columns',)
+
+    def __init__(self,arrays,header_columns):
+        self.columns=dict(zip(header_columns,arrays))
+
+    @property
+    def dtype(self):
+        return np.dtype([(name,column.dtype) for name,column in self.columns.items()])
+
+    @property
+    def shape(self):
+        return (len(self),)
+
+    @property
+    def nbytes(self):
+        return sum(column.nbytes for column in self.columns.values())
+
+    def __len__(self):
+        return len(next(iter(self.columns.values()))) if self.columns else 0
+
+    def __getitem__(self,key):
+        if isinstance(key,str):
+            return self.columns[key]
+        return tuple(column[key] for column in self.columns.values())
+
+    def __iter__(self):
+        return zip(*self.columns.values())
+
+    def records(self):
+        '''Structured array (copy of all columns)'''
+        return arrays_to_columns(list(self.columns.values()),list(self.columns))
+
+    def tolist(self):
+        return self.records().tolist()
+
+def columns_to_arrays(data,nb_of_columns):
+    '''Split raw data (list of rows, 2D array, structured array or column_data) into list of column arrays'''
+    if isinstance(data,column_data):
+        return list(data.columns.values())
+    if isinstance(data,np.ndarray) and data.dtype.names is not None:
+        return [np.asarray(data[name]) for name in data.dtype.names]
+    if len(data) == 0:
+        return [np.empty(0) for _ in range(nb_of_columns)]
+    return [np.asarray(column) for column in zip(*data)]
+
+def arrays_to_columns(arrays,header_columns):
+    '''Join column arrays into structured array (one field per column)'''
+    return np.rec.fromarrays(arrays,names=header_columns).view(np.ndarray)
+
+def to_json_default(value):
+    '''Convert numpy objects into JSON types, intended for json.dump(default=...)'''
+    if isinstance(value,np.ndarray):
+        return value.tolist()
+    if isinstance(value,np.generic):
+        return value.item()
+    if isinstance(value,column_data):
+        return value.tolist()
+    if isinstance(value,Mapping): # e.g. lazy_database
+        return dict(value)
+    raise TypeError('Object of type '+type(value).__name__+' is not JSON serializable')
+
+def copy_dictionary(value):
+    '''Copy nested dictionaries, other values (e.g. lists) are not copied'''
+    if isinstance(value,Mapping):
+        return {k:copy_dictionary(v) for k,v in value.items()}
+    return value
+
+def write_database_npz(database,path,compress=False):
+    '''Save database into columnar *.npz file'''
+    arrays={}
+    catalog=copy_dictionary(database) # raw data is replaced below
+    for idx,(data_frame,catalog_frame) in enumerate(zip(iterate_runs(database),iterate_runs(catalog))):
+        key='run_'+str(idx)
+        for idy,column in enumerate(columns_to_arrays(data_frame['data'],len(data_frame['header_columns']))):
+            arrays[key+'_c'+str(idy)]=column
+        catalog_frame['data']=key
+    arrays[catalog_key]=np.frombuffer(json.dumps(catalog,default=to_json_default).encode(),dtype=np.uint8)
+    with open(path,'wb') as f:
+        if compress:
+            np.savez_compressed(f,**arrays)
+        else:
+            np.savez(f,**arrays)
+
+def read_database_npz(path):
+    '''Read database from columnar *.npz file'''
+    with np.load(path,allow_pickle=False) as npz:
+        database=json.loads(npz[catalog_key].tobytes().decode())
+        for data_frame in iterate_runs(database):
+            key=data_frame['data']
+            arrays=[npz[key+'_c'+str(idy)] for idy in range(len(data_frame['header_columns']))]
+            data_frame['data']=arrays_to_columns(arrays,data_frame['header_columns'])
+    return database
+
+def write_database_file(database,path):
+    '''Save database into single file, the format depends on file extension: *.npz - columnar binary file, otherwise JSON'''
+    temp_path=path+'.tmp'
+    if path.lower().endswith('.npz'):
+        write_database_npz(database,temp_path)
+    else:
+        with open(temp_path,'w') as outfile:
+            json.dump(database,outfile,default=to_json_default)
+    os.replace(temp_path,path) # old file is replaced only when the new one is complete
+    if not path.lower().endswith('.npz'):
+        write_keys(file_keys(database),keys_path(path),path)
+
+def keys_path(path):
+    '''Index of JSON database file (dates and names of cases), e.g. database.keys.json for database.json'''
+    return os.path.splitext(path)[0]+'.keys.json'
+
+def file_keys(database):
+    '''Dates and names of cases of the database: date - list of case names'''
+    return {date:list(cases) for date,cases in database.items()}
+
+def file_identity(path):
+    '''Size and modification time of the file, the index of JSON file is valid only for the same values'''
+    stat=os.stat(path)
+    return [stat.st_size,stat.st_mtime_ns]
+
+def write_keys(keys,index,path):
+    '''Save index of JSON database file (path): keys and identity of the file'''
+    temp_path=index+'.tmp'
+    with open(temp_path,'w') as f:
+        json.dump({'file':file_identity(path),'keys':keys},f)
+    os.replace(temp_path,index)
+
+def read_index(index,path):
+    '''Keys from the index of JSON database file, None if the index is missing, damaged or made for other content of the file'''
+    if not os.path.exists(index):
+        return None
+    try:
+        with open(index) as f:
+            content=json.load(f)
+    except ValueError:
+        return None
+    if not isinstance(content,dict) or content.get('file') != file_identity(path) or 'keys' not in content:
+        return None
+    return content['keys']
+
+def read_file_keys(path):
+    '''Dates and names of cases of single database file (without segments), raw data is not read:
+    catalog of *.npz file or index of JSON file. The index is created again if it is missing or the JSON file was changed
+    (size or modification time is different).'''
+    if path.lower().endswith('.npz'):
+        with np.load(path,allow_pickle=False) as npz: # only catalog array is read
+            return file_keys(json.loads(npz[catalog_key].tobytes().decode()))
+    index=keys_path(path)
+    keys=read_index(index,path)
+    if keys is not None:
+        return keys
+    with open(path) as f: # database saved without index or changed, it is read once
+        keys=file_keys(json.load(f))
+    write_keys(keys,index,path)
+    return keys
+
+def database_keys(path):
+    '''Dates and names of cases of the database and its segments: date - set of case names'''
+    keys={}
+    for file_path in [path]+segment_paths(path):
+        for date,cases in read_file_keys(file_path).items():
+            keys.setdefault(date,set()).update(cases)
+    return keys
+
+def save_database(database,path):
+    '''Save whole database into file (see write_database_file), old segments of the database are removed'''
+    write_database_file(database,path)
+    for segment in segment_paths(path):
+        os.remove(segment)
+        if os.path.exists(keys_path(segment)):
+            os.remove(keys_path(segment))
+
+def segment_paths(path):
+    '''Paths of segments appended to the database, in order of appending'''
+    root,ext=os.path.splitext(path)
+    pattern=re.compile(re.escape(os.path.basename(root))+r'\.seg(\d+)'+re.escape(ext)+'$')
+    segments=list()
+    for segment in glob.glob(glob.escape(root)+'.seg*'+ext):
+        match=pattern.match(os.path.basename(segment))
+        if match:
+            segments.append((int(match.group(1)),segment))
+    return [segment for _,segment in sorted(segments)]
+
+def merge_database(database,segment):
+    '''Add cases from segment into database, cases from segment replace the same cases of database'''
+    for date,cases in segment.items():
+        if date not in database:
+            database[date]={}
+        for case_name,case in cases.items():
+            database[date][case_name]=case
+    return dict(sorted(database.items(),key=lambda item: item[0]))
+
+def append_database(database,path,compact_every=None):
+    '''Save new cases as next segment of existing database.
+    compact_every - (optional) when number of segments reaches this value, all segments are joined with the database
+    Returns path of new segment.'''
+    segments=segment_paths(path)
+    root,ext=os.path.splitext(path)
+    number=1
+    if segments:
+        number=int(re.search(r'\.seg(\d+)'+re.escape(ext)+'$',segments[-1]).group(1))+1
+    segment=root+'.seg'+str(number)+ext
+    write_database_file(database,segment)
+    if compact_every is not None and len(segments)+1 >= compact_every:
+        compact_database(path)
+    return segment
+
+def compact_database(path):
+    '''Join database with all its segments into single file'''
+    from read_database_from_file import read_database_from_file
+    database=read_database_from_file(path)
+    save_database(database,path)
+    return database
+
+def convert_database(source_path,target_path):
+    '''Convert database between JSON and *.npz format, e.g. convert_database('db.json','db.npz')'''
+    from read_database_from_file import read_database_from_file
+    database=read_database_from_file(source_path)
+    save_database(database,target_path)
+    return database
@@ -1,25 +1,95 @@
+from collections.abc import Mapping
 
-import tkinter as tk
-import tkinter.ttk as ttk
+def value_summary(value):
+    '''Short description of list or array instead of its items: type, shape, dtype, min and max (numeric values only)'''
+    import numpy as np
+    kind=type(value).__name__
+    names=getattr(getattr(value,'dtype',None),'names',None)
+    if names: # structured array or column_data (raw data of *.npz database), columns are not copied
+        numeric=[name for name in names if value.dtype[name].kind in 'biuf']
+        text=kind+' '+'x'.join(str(n) for n in value.shape)+', '+str(len(names))+' columns'
+        if len(value) and numeric:
+            text+=', min=%g, max=%g' % (min(value[name].min() for name in numeric),max(value[name].max() for name in numeric))
+        return text
+    try:
+        array=np.asarray(value)
+    except ValueError: # ragged lists
+        return kind+' '+str(len(value))+' items'
+    text=kind+' '+'x'.join(str(n) for n in array.shape)+' '+str(array.dtype)
+    if array.size and array.dtype.kind in 'biuf':
+        text+=', min=%g, max=%g' % (array.min(),array.max())
+    return text
 
+def display_tk_window(measurements,window_size='500x800',page_size=100):
+    '''Display window with database tree view.
+    Only top level of the database is inserted when the window is opened, children are inserted when the node is expanded,
+    so the database (also lazy_database) is not read as a whole. Lists and arrays are summarised (shape, dtype, min, max)
+    and their items are shown in pages of page_size items.
+    '''
+    import tkinter as tk # imported only when the window is displayed, importing the module is fast
+    import tkinter.ttk as ttk
+    import numpy as np
+    from database_npz import column_data
 
-def display_tk_window(measurements,window_size='500x800'):
-    def dict_to_treeview(data, treeview=None, parent='', child=''):
-        if treeview is None:
-            treeview = ttk.Treeview()
-        for k, v in data.items():
-            item = treeview.insert(parent, 'end', text=k)
-            if isinstance(v, dict):
-                dict_to_treeview(v, treeview, item, '')
+    nodes={} # item - (container, key) or (sequence, start, stop) of not expanded node
+
+    def is_sequence(value):
+        return isinstance(value,column_data) or isinstance(value,(list,tuple,np.ndarray)) and np.ndim(value) > 0
+
+    def insert_node(parent,text,node):
+        item=treeview.insert(parent,'end',text=text)
+        treeview.insert(item,'end',text='...') # placeholder, node can be expanded
+        nodes[item]=node
+        return item
+
+    def insert_mapping(parent,data):
+        for k in data.keys():
+            insert_node(parent,k,(data,k))
+
+    def insert_value(parent,value):
+        if isinstance(value,Mapping):
+            insert_mapping(parent,value)
+        elif is_sequence(value):
+            treeview.insert(parent,'end',text=value_summary(value))
+            insert_items(parent,value,0,len(value))
+        else:
+            treeview.insert(parent,'end',text=value)
+
+    def insert_items(parent,sequence,start,stop):
+        '''Items of sequence from start to stop, long ranges are divided into pages (pages of pages etc.)'''
+        step=1
+        while (stop-start)/step > page_size:
+            step*=page_size
+        if step > 1:
+            for page in range(start,stop,step):
+                insert_node(parent,'[%d:%d]' % (page,min(page+step,stop)),(sequence,page,min(page+step,stop)))
+            return
+        for idx in range(start,stop):
+            item=sequence[idx]
+            if isinstance(item,Mapping) or is_sequence(item):
+                insert_node(parent,'[%d] %s' % (idx,value_summary(item) if is_sequence(item) else ''),(sequence,idx))
             else:
-                treeview.insert(item, 'end', text=v)
-        return treeview
+                treeview.insert(parent,'end',text='[%d] %s' % (idx,item))
+
+    def open_node(event):
+        item=treeview.focus()
+        node=nodes.pop(item,None)
+        if node is None:
+            return
+        treeview.delete(*treeview.get_children(item))
+        if len(node) == 3:
+            insert_items(item,*node)
+        else:
+            container,key=node
+            insert_value(item,container[key])
 
     def close_window():
         root.destroy()
 
     root = tk.Tk()
-    treeview = dict_to_treeview(measurements)
+    treeview = ttk.Treeview(root)
+    treeview.bind('<<TreeviewOpen>>',open_node)
+    insert_mapping('',measurements)
     treeview.pack(fill='both', expand=True)
     width = treeview.winfo_reqwidth()
     height = treeview.winfo_reqheight()
@@ -27,4 +97,4 @@ def display_tk_window(measurements,window_size='500x800'):
     root.geometry(window_size)
     exit_button = tk.Button(root, text="Exit", command=close_window)
     exit_button.pack()
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -1,27 +1,97 @@
 from add_to_data_dictionary2 import *
 from sort_dictionary import *
 from add_statistics_to_case import *
+import shared_modules
+from result_cache import *
+from database_npz import *
+from read_database_from_file import *
+from stage_profiler import *
+from database_catalog import *
+from concurrent.futures import ProcessPoolExecutor
+import os
 import json
 
 
-def final_add_files(files_to_add, database_path, data_exists=False):
-    if data_exists==True:
-        data=input('Write database name: ')
-        if data in locals():
-            pass
-        else:
-            data={}
-    else:
-        data={}
-    for k in files_to_add.keys():
-        folder_path,general_date,case_name,description,additional_info = \
-        files_to_add[k]['folder_path'],files_to_add[k]['general_date'],files_to_add[k]['case_name'],files_to_add[k]['description'],files_to_add[k]['additional_info']
-        add_to_data_dictionary2(folder_path,data,general_date,case_name,description,additional_info)
+def final_add_files(files_to_add, database_path, data_exists=False, workers=None, cache_dir=None, cache_size=1024**3, compact_every=8, profiler=None, catalog_path=None, prefetch=None, compact=False):
+    '''Create database from files and save it into *.json or columnar *.npz file (see database_npz).
+    data_exists - if True and the database file exists, only cases (general_date and case_name) which are not in the database
+    are read. They are saved as appended segment of the database, the existing file is not rewritten. The existing database
+    is not read, names of its cases are taken from the catalog of *.npz file or from the index of JSON file (see database_keys).
+    workers - (optional) number of worker processes used to read files in parallel, by default files are read one after another
+    cache_dir - (optional) directory of on-disk cache, unchanged files are not read again (see result_cache)
+    cache_size - maximum size of the cache in bytes
+    compact_every - number of segments after which all segments are joined with the database (see append_database)
+    profiler - (optional) stage_profiler which measures time and memory of every stage, file and case (see stage_profiler)
+    catalog_path - (optional) SQLite file of indexed catalog of runs (see database_catalog), e.g. default_catalog_path(database_path).
+    New database replaces content of the catalog, when the database is updated only new cases are added into the catalog.
+    If the catalog is missing or empty when the database is updated, cases of the existing database are added first
+    (*.npz database is read lazily, JSON database is read once).
+    prefetch - (optional) number of files read ahead by background threads while earlier files are processed,
+    or prefetch_options (depth, readers, read function), see prefetch_pipeline
+    compact - if True raw data of new files is kept in typed arrays instead of lists of rows (see database_model),
+    the returned database is campaign_record. Saved file is the same.
+    Returns the database. When existing database is updated, *.npz database is returned as lazy_database (whole database,
+    raw data is read on access); JSON database can not be read partially, so only new cases are returned.
+    '''
+    if profiler is None:
+        profiler=stage_profiler(enabled=False)
+    existing=None
+    if data_exists==True and os.path.exists(database_path):
+        with profiler.stage('database_keys',path=database_path):
+            existing=database_keys(database_path) # only names of cases are needed
+    data={}
+    cache=result_cache(cache_dir,cache_size) if cache_dir is not None else None
+    executor=ProcessPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+    try:
+        cases=list()
+        for k in files_to_add.keys():
+            folder_path,general_date,case_name,description,additional_info = \
+            files_to_add[k]['folder_path'],files_to_add[k]['general_date'],files_to_add[k]['case_name'],files_to_add[k]['description'],files_to_add[k]['additional_info']
+            if existing is not None and case_name in existing.get(general_date,()):
+                print(general_date,'-',case_name,'- already in database, skipped')
+                continue
+            cases.append((folder_path,general_date,case_name,description,additional_info,folder_files(folder_path)))
+        # files of all cases are read by one pipeline, prefetch and workers are not stopped between cases;
+        # folders are listed once, records are added to the same files as were queued
+        items=[(file_name,folder_path,additional_info) for folder_path,_,_,_,additional_info,file_list in cases for file_name in file_list]
+        runs=iter(read_runs(items,executor,cache,profiler,prefetch,compact))
+        for folder_path,general_date,case_name,description,additional_info,file_list in cases:
+            with profiler.stage('add_to_data_dictionary2',case=case_name):
+                add_to_data_dictionary2(folder_path,data,general_date,case_name,description,additional_info,profiler=profiler,
+                                        compact=compact,runs=runs,file_list=file_list)
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if cache is not None:
+        with profiler.stage('cache_evict'):
+            cache.evict()
 
     data = sort_dictionary(data)
+    if compact:
+        data = compact_runs(data) # records are already compact, cases get helpers of case_record
 
-    add_statistics_to_case(data,'mean') # calculate selected statisticts for case
+    with profiler.stage('add_statistics_to_case'):
+        add_statistics_to_case(data,'mean') # calculate selected statisticts for case, only new cases are calculated
 
-    with open(database_path, "w") as outfile:
-        json.dump(data, outfile)
-    return data
\ No newline at end of file
+    if catalog_path is not None:
+        with profiler.stage('database_catalog'), database_catalog(catalog_path) as catalog:
+            if existing is None:
+                catalog.clear()
+            elif catalog.nb_of_runs() == 0: # catalog of existing database is created now
+                existing_database=read_database_from_file(database_path,lazy=True) # statistics are taken from data_avr, raw data is not read
+                catalog.add_database(existing_database)
+                if isinstance(existing_database,lazy_database):
+                    existing_database.close()
+            catalog.add_database(data)
+
+    if existing is None:
+        with profiler.stage('save_database') as stage:
+            save_database(data, database_path) # JSON or columnar *.npz, depending on extension
+            stage.path=database_path
+        return data
+    if len(data) > 0:
+        with profiler.stage('append_database'):
+            append_database(data, database_path, compact_every)
+    if database_path.lower().endswith('.npz'):
+        return read_database_from_file(database_path,lazy=True) # only catalogs are read
+    return data
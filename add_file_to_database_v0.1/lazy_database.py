@@ -0,0 +1,123 @@
+'''
+Lazy access to the columnar database (*.npz file, see database_npz).
+
+Only the catalog is read when the database is opened. Raw data of a measurement file
+(data_frame['data']) is returned as column_data (see database_npz) when it is accessed: columns stored without compression
+are memory-mapped, so only pages of columns which are used are read from the disk; compressed columns are read from the file.
+Recently used files are kept in LRU cache.
+Segments appended to the database (see append_database) are opened in the same way.
+
+    database=lazy_database('database.npz')
+    db_quickview(database) # only catalog is used
+    database['2022-05-22']['run_c1_v1']['data']['run_c1_v1_1']['data_frame']['data'] # raw data is read here
+'''
+import json
+import struct
+import zipfile
+from collections import OrderedDict
+from collections.abc import Mapping
+import numpy as np
+from database_npz import catalog_key,column_data,segment_paths,merge_database
+
+def npz_member_array(path,zip_file,member):
+    '''Memory-map array stored in npz file. Compressed arrays are read into memory.'''
+    info=zip_file.getinfo(member+'.npy')
+    if info.compress_type != zipfile.ZIP_STORED:
+        with zip_file.open(info) as f:
+            return np.lib.format.read_array(f,allow_pickle=False)
+    with open(path,'rb') as f:
+        f.seek(info.header_offset)
+        local_header=f.read(30) # local file header, data starts after file name and extra field
+        name_length,extra_length=struct.unpack('<HH',local_header[26:30])
+        f.seek(info.header_offset+30+name_length+extra_length)
+        version=np.lib.format.read_magic(f)
+        if version == (1,0):
+            shape,fortran_order,dtype=np.lib.format.read_array_header_1_0(f)
+        else:
+            shape,fortran_order,dtype=np.lib.format.read_array_header_2_0(f)
+        offset=f.tell()
+    if dtype.hasobject:
+        raise ValueError('Object arrays are not supported: '+member)
+    if int(np.prod(shape)) == 0:
+        return np.empty(shape,dtype=dtype)
+    return np.memmap(path,dtype=dtype,mode='r',offset=offset,shape=shape,order='F' if fortran_order else 'C')
+
+
+class lazy_data_frame(Mapping):
+    '''data_frame dictionary of single measurement file, raw data is read on access'''
+    def __init__(self,database,source,catalog_frame):
+        self._database=database
+        self._source=source
+        self._frame=catalog_frame
+
+    def __getitem__(self,key):
+        if key == 'data':
+            return self._database.load_run(self._source,self._frame['data'],self._frame['header_columns'])
+        return self._frame[key]
+
+    def __iter__(self):
+        return iter(self._frame)
+
+    def __len__(self):
+        return len(self._frame)
+
+
+class lazy_database(Mapping):
+    def __init__(self,path,cache_size=16):
+        '''
+        Input:
+        path - path to *.npz database
+        cache_size - number of measurement files kept in memory
+        '''
+        self.path=path
+        self.cache_size=cache_size
+        self._cache=OrderedDict()
+        self._sources=[path]+segment_paths(path)
+        self._zips=list()
+        self._catalog={}
+        for source,source_path in enumerate(self._sources):
+            zip_file=zipfile.ZipFile(source_path)
+            self._zips.append(zip_file)
+            with zip_file.open(catalog_key+'.npy') as f:
+                catalog=json.loads(np.lib.format.read_array(f,allow_pickle=False).tobytes().decode())
+            for case in (case for date in catalog.values() for case in date.values()):
+                if isinstance(case,dict) and 'data' in case:
+                    for run in case['data'].values():
+                        run['data_frame']=lazy_data_frame(self,source,run['data_frame'])
+            self._catalog=merge_database(self._catalog,catalog)
+
+    def load_run(self,source,key,header_columns):
+        '''Raw data of measurement file as column_data (columns are not copied), see database_npz
+        Input:
+        source - index of database file (0 - main file, next - segments)
+        key - name of arrays in the file
+        '''
+        if (source,key) in self._cache:
+            self._cache.move_to_end((source,key))
+            return self._cache[(source,key)]
+        arrays=[npz_member_array(self._sources[source],self._zips[source],key+'_c'+str(idy)) for idy in range(len(header_columns))]
+        data=column_data(arrays,header_columns)
+        self._cache[(source,key)]=data
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return data
+
+    def __getitem__(self,key):
+        return self._catalog[key]
+
+    def __iter__(self):
+        return iter(self._catalog)
+
+    def __len__(self):
+        return len(self._catalog)
+
+    def close(self):
+        self._cache.clear()
+        for zip_file in self._zips:
+            zip_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        self.close()
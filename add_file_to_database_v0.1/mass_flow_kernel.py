@@ -0,0 +1,88 @@
+'''
+Conversion of flow columns into mass flow rate [g/s], all derived columns of a run at once.
+
+Two conversions are available (names used in schemas, see schema_registry):
+- SLPM_to_sgps - standard flow [l/min] with constant standard density of air (see SLPM_to_sgps),
+- LPM_to_gps - actual flow [l/min] with density of air from measured pressure [kPa] and temperature [0C] of the same flow meter.
+
+mass_flow_kernel is compiled once for a layout of columns. It takes block of values with columns in the last axis,
+single run (samples x columns) or many runs stacked together (runs x samples x columns), and writes all derived
+columns into one output block (preallocated or created), every conversion is one NumPy operation for all its columns:
+
+    kernel = mass_flow_kernel(derived,columns) # or plan.kernel of compiled schema
+    block = df.iloc[:,kernel.input_columns].to_numpy(dtype=float)
+    out = kernel(block) # samples x len(kernel.names)
+'''
+import numpy as np
+from SLPM_to_sgps import *
+
+def LPM_to_gps(LPM,pressure_kPa,temperature_C):
+    '''Actual flow [l/min] to mass flow rate [g/s], density of air from pressure [kPa] and temperature [0C]'''
+    rho=(mass_mol*pressure_kPa*1000)/(R*(temperature_C+273.15)) # density of air [kg/m3] = [g/l]
+    return (LPM*rho)/60
+
+def lpm_derived_columns(columns):
+    '''Derived columns of mass flow rate from actual flow (LPM) of every flow meter, pressure and temperature are taken
+    from the columns with the same suffix, e.g. LPM-1 - Pressure-1, Temperature-1. Can be added to 'derived' of a schema.'''
+    derived=list()
+    for name in columns:
+        if not name.startswith('LPM'):
+            continue
+        suffix=name.split(',')[0][len('LPM'):] # e.g. '-1' or ''
+        pressure=[column for column in columns if column.split(',')[0] == 'Pressure'+suffix]
+        temperature=[column for column in columns if column.split(',')[0] == 'Temperature'+suffix]
+        if pressure and temperature:
+            derived.append({'name':'Mass flow rate (LPM'+suffix+') [g/s]','source':name,'conversion':'LPM_to_gps',
+                            'pressure':pressure[0],'temperature':temperature[0]})
+    return derived
+
+
+class mass_flow_kernel:
+    def __init__(self,derived,columns):
+        '''
+        Input:
+        derived - list of derived columns (dictionaries: name, source, conversion and for LPM_to_gps pressure, temperature)
+        columns - names of all columns of the run
+        '''
+        self.names=[item['name'] for item in derived]
+        used=list()
+        for item in derived:
+            used+=[item[key] for key in ('source','pressure','temperature') if key in item]
+        # columns of the run used by the kernel, the kernel takes block with only these columns
+        self.input_columns=sorted(set(columns.index(name) for name in used))
+        position={columns[idx]:idy for idy,idx in enumerate(self.input_columns)}
+        self.slpm=self.group(derived,'SLPM_to_sgps',position,('source',))
+        self.lpm=self.group(derived,'LPM_to_gps',position,('source','pressure','temperature'))
+
+    def group(self,derived,conversion,position,keys):
+        '''Positions of output columns and input columns of one conversion'''
+        items=[(idx,item) for idx,item in enumerate(derived) if item['conversion'] == conversion]
+        if not items:
+            return None
+        out=[idx for idx,_ in items]
+        return (slice(out[0],out[-1]+1) if out == list(range(out[0],out[-1]+1)) else out,
+                *[[position[item[key]] for _,item in items] for key in keys])
+
+    def __call__(self,block,out=None):
+        '''Calculate derived columns.
+        Input:
+        block - array (..., len(input_columns)), e.g. samples x columns or runs x samples x columns
+        out - (optional) preallocated array (..., len(names))
+        Returns out
+        '''
+        block=np.asarray(block,dtype=np.float64)
+        if out is None:
+            out=np.empty(block.shape[:-1]+(len(self.names),))
+        if self.slpm is not None:
+            out_idx,source=self.slpm
+            out[...,out_idx]=SLPM_to_sgps(block[...,source]) # one operation for all SLPM columns
+        if self.lpm is not None:
+            out_idx,source,pressure,temperature=self.lpm
+            out[...,out_idx]=LPM_to_gps(block[...,source],block[...,pressure],block[...,temperature])
+        return out
+
+    def convert_frame(self,df):
+        '''Append derived columns to DataFrame of a run (one assignment of all columns)'''
+        if self.names:
+            df[self.names]=self(df.iloc[:,self.input_columns].to_numpy(dtype=np.float64))
+        return df
@@ -1,7 +1,7 @@
 import pandas as pd
-import matplotlib.pyplot as plt
 
 def plot_massflow_from_avr_data(database,date,case_name,function='mean',figsize=(8,8)):
+    import matplotlib.pyplot as plt # imported only when the plot is drawn, importing the module is fast
     df_temp=pd.DataFrame(database[date][case_name][function]['data'],columns=database[date][case_name][function]['header'])
     plt.figure(figsize=figsize)
     plt.scatter(df_temp.iloc[:,2],df_temp.iloc[:,-2])
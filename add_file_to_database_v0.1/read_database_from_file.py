@@ -1,6 +1,29 @@
 import json
-def read_database_from_file(path):
+from database_npz import *
+from lazy_database import *
+from database_model import *
+
+def read_database_from_file(path,lazy=False,cache_size=16,compact=False):
+    '''Read database from file, *.npz - columnar binary file (see database_npz), otherwise JSON.
+    Appended segments of the database are merged with it.
+    lazy - only for *.npz, read catalog only, raw data of files is read on access (see lazy_database)
+    cache_size - number of files kept in memory by lazy database
+    compact - raw data of files is kept in typed arrays (see database_model), not used for lazy database
+    '''
+    if path.lower().endswith('.npz') and lazy:
+        return lazy_database(path,cache_size)
+    measurements=read_database_file(path)
+    for segment in segment_paths(path):
+        measurements=merge_database(measurements,read_database_file(segment))
+    if compact:
+        measurements=compact_runs(measurements)
+    return(measurements)
+
+def read_database_file(path):
+    '''Read single database file, without segments'''
+    if path.lower().endswith('.npz'):
+        return read_database_npz(path)
     f=open(path)
     measurements=json.load(f)
     f.close()
-    return(measurements)
\ No newline at end of file
+    return(measurements)
@@ -0,0 +1,27 @@
+import io
+import pandas as pd
+from schema_registry import *
+
+def read_measurement_file_schema(full_path,registry=None,data=None):
+    '''Read measurement file in single pass.
+    The first line contains date, time and data rate, next two lines are the header (names and units).
+    The layout of the file is recognised by the header (see schema_registry), the rest of the file is loaded
+    directly into DataFrame with column names and data types of the compiled plan.
+    data - (optional) content of the file (bytes) already read, e.g. by prefetch (see prefetch_pipeline), then the file is not opened
+    Returns date, time, data rate [Hz], DataFrame and plan of the layout (schema_plan)
+    '''
+    if registry is None:
+        registry=default_registry
+    with open(full_path) if data is None else io.StringIO(data.decode()) as f:
+        parameters=f.readline().rstrip('\r\n').split('\t')
+        date,time,data_rate_Hz=parameters[0],parameters[1],int(parameters[3])
+        names=f.readline().rstrip('\r\n').split('\t')
+        units=f.readline().rstrip('\r\n').split('\t')
+        plan=registry.plan(names,units)
+        df=pd.read_csv(f,sep='\t',header=None,names=plan.columns,dtype=plan.dtypes)
+    return date,time,data_rate_Hz,df,plan
+
+def read_measurement_file(full_path,registry=None,data=None):
+    '''Read measurement file (see read_measurement_file_schema).
+    Returns date, time, data rate [Hz] and DataFrame with fitted header'''
+    return read_measurement_file_schema(full_path,registry,data)[:4]
@@ -0,0 +1,165 @@
+'''
+Batch rendering of mass flow rate plots of all measurement cases into image files.
+
+For every case one figure is saved (<output_dir>/<date>_<case_name>.png):
+- mass flow rate in function of pressure from averaged data (the same as plot_massflow_from_avr_data),
+- (optional) raw traces of mass flow rate in function of measurement time for all files of the case.
+Raw traces are decimated before drawing (min/max envelope or LTTB, see decimate), so time of rendering and size
+of the image don't depend on the number of samples. Figures are drawn without GUI (matplotlib Figure, Agg)
+and can be rendered in parallel processes (workers), only decimated data is sent to the processes.
+
+    paths = render_case_plots(database,'plots',workers=4)
+'''
+import os
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+from add_statistics_to_case import case_statistics,statistic_name
+from database_npz import column_data
+from database_model import run_record
+import shared_modules
+from stage_profiler import *
+
+
+def decimate_minmax(x,y,nb_of_points):
+    '''Min/max envelope: samples are divided into nb_of_points/2 bins, minimum and maximum of every bin are kept (in original order).
+    Peaks of the signal are always visible.'''
+    n=len(y)
+    nb_of_bins=nb_of_points//2
+    if n <= nb_of_points or nb_of_bins < 1:
+        return x,y
+    bin_size=-(-n//nb_of_bins)
+    m=n//bin_size*bin_size
+    blocks=y[:m].reshape(-1,bin_size)
+    offsets=np.arange(0,m,bin_size)
+    idx=[offsets+np.argmin(blocks,axis=1),offsets+np.argmax(blocks,axis=1)]
+    if m < n: # last, shorter bin
+        idx.append(np.array([m+np.argmin(y[m:]),m+np.argmax(y[m:])]))
+    idx=np.unique(np.concatenate(idx)) # sorted, min and max of constant bin are the same sample
+    return x[idx],y[idx]
+
+def decimate_lttb(x,y,nb_of_points):
+    '''Largest-Triangle-Three-Buckets: first and last samples and one sample of every bucket, which forms the largest triangle
+    with sample selected in previous bucket and average of next bucket. Shape of the signal is preserved.'''
+    n=len(y)
+    if n <= nb_of_points or nb_of_points < 3:
+        return x,y
+    edges=np.linspace(1,n-1,nb_of_points-1).astype(int) # nb_of_points-2 buckets without first and last sample
+    idx=np.empty(nb_of_points,dtype=int)
+    idx[0],idx[-1]=0,n-1
+    a=0
+    for bucket in range(nb_of_points-2):
+        start,stop=edges[bucket],edges[bucket+1]
+        next_stop=edges[bucket+2] if bucket+2 < len(edges) else n
+        avg_x,avg_y=x[stop:next_stop].mean(),y[stop:next_stop].mean()
+        area=np.abs((x[a]-avg_x)*(y[start:stop]-y[a])-(x[a]-x[start:stop])*(avg_y-y[a]))
+        a=start+int(np.argmax(area))
+        idx[bucket+1]=a
+    return x[idx],y[idx]
+
+decimation_methods={'minmax':decimate_minmax,'lttb':decimate_lttb}
+
+def decimate(x,y,nb_of_points=2000,method='minmax'):
+    '''Reduce trace to at most nb_of_points samples, method - 'minmax' or 'lttb' '''
+    return decimation_methods[method](np.asarray(x,dtype=float),np.asarray(y,dtype=float),nb_of_points)
+
+def run_columns(run,names):
+    '''Columns of raw data of the run as float arrays. The run can be run_record (see database_model) or dictionary with raw data
+    as list of rows (JSON database), structured array or column_data (*.npz database)'''
+    if isinstance(run,run_record):
+        return [np.asarray(run.column(name),dtype=float) for name in names]
+    data_frame=run['data_frame']
+    data=data_frame['data']
+    if isinstance(data,(np.ndarray,column_data)) and data.dtype.names:
+        return [np.asarray(data[name],dtype=float) for name in names]
+    idx=[data_frame['header_columns'].index(name) for name in names]
+    return [np.array([row[i] for row in data],dtype=float) for i in idx]
+
+def mass_flow_columns(header):
+    '''Names of mass flow rate columns, if there are no such columns - two last columns'''
+    return [name for name in header if name.startswith('Mass flow rate')] or list(header[-2:])
+
+def case_plot_job(database,date,case_name,output_dir,function='mean',traces=True,nb_of_points=2000,method='minmax',columns=None,
+                  figsize=(8,8),dpi=100,image_format='png'):
+    '''Data of one figure (dictionary), raw traces are already decimated'''
+    case=database[date][case_name]
+    name=statistic_name(function)
+    if name in case:
+        header,avr_data=case[name]['header'],np.array(case[name]['data'],dtype=float)
+    else:
+        header,result=case_statistics(case,[name])
+        avr_data=result[name]
+    y_names=columns or mass_flow_columns(header)
+    job={'path':os.path.join(output_dir,str(date)+'_'+str(case_name)+'.'+image_format),'title':str(date)+' - '+str(case_name),
+         'x_name':header[2],'x':avr_data[:,2],'y_names':y_names,'y':[avr_data[:,list(header).index(y)] for y in y_names],
+         'traces':[],'figsize':figsize,'dpi':dpi}
+    if traces:
+        for run_name,run in case['data'].items():
+            time_name=run['data_frame']['header_columns'][1] # Measurement time
+            values=run_columns(run,[time_name]+y_names)
+            for y_name,y in zip(y_names,values[1:]):
+                job['traces'].append((run_name+' - '+y_name,)+decimate(values[0],y,nb_of_points,method))
+        job['time_name']=time_name
+    return job
+
+def render_case_plot(job):
+    '''Draw figure of one case and save it into image file, matplotlib is used without GUI. Returns path of the image'''
+    from matplotlib.figure import Figure # imported only when plots are rendered, importing the module is fast
+    fig=Figure(figsize=job['figsize'])
+    axes=fig.subplots(2 if job['traces'] else 1,1,squeeze=False)[:,0]
+    for y_name,y in zip(job['y_names'],job['y']):
+        axes[0].plot(job['x'],y,marker='o',label=y_name)
+    axes[0].set_xlabel(job['x_name'])
+    axes[0].set_ylabel(job['y_names'][0])
+    axes[0].set_title(job['title'])
+    axes[0].legend()
+    axes[0].grid()
+    if job['traces']:
+        for label,x,y in job['traces']:
+            axes[1].plot(x,y,linewidth=0.5,label=label)
+        axes[1].set_xlabel(job['time_name'])
+        axes[1].set_ylabel(job['y_names'][0])
+        axes[1].grid()
+        if len(job['traces']) <= 10:
+            axes[1].legend(fontsize='small')
+    fig.tight_layout()
+    fig.savefig(job['path'],dpi=job['dpi'])
+    return job['path']
+
+def render_case_plots(database,output_dir,function='mean',traces=True,nb_of_points=2000,method='minmax',columns=None,workers=None,
+                      figsize=(8,8),dpi=100,image_format='png',profiler=None):
+    '''Render plots of all cases of the database into image files.
+    Input:
+    database - database (dictionary or lazy_database)
+    output_dir - directory of images, it is created if not exists
+    function - statistic of files used in mass flow rate - pressure plot (see add_statistics_to_case)
+    traces - draw raw traces of all files
+    nb_of_points - maximum number of points of one trace after decimation
+    method - decimation method, 'minmax' (envelope) or 'lttb'
+    columns - (optional) names of plotted columns, by default mass flow rate columns
+    workers - (optional) number of worker processes, by default figures are rendered one after another
+    figsize, dpi, image_format - size, resolution and format (e.g. png, svg, pdf) of images
+    profiler - (optional) stage_profiler
+    Returns list of paths of images.
+    '''
+    if profiler is None:
+        profiler=stage_profiler(enabled=False)
+    os.makedirs(output_dir,exist_ok=True)
+    executor=ProcessPoolExecutor(max_workers=workers) if workers is not None and workers > 1 else None
+    try:
+        futures=list()
+        for date in database.keys():
+            for case_name in database[date].keys():
+                with profiler.stage('case_plot_job',case=case_name):
+                    job=case_plot_job(database,date,case_name,output_dir,function,traces,nb_of_points,method,columns,figsize,dpi,image_format)
+                if executor is None:
+                    with profiler.stage('render_case_plot',case=case_name,path=job['path']):
+                        futures.append(render_case_plot(job))
+                else:
+                    futures.append(executor.submit(render_case_plot,job))
+        if executor is None:
+            return futures
+        with profiler.stage('render_case_plot'):
+            return [future.result() for future in futures]
+    finally:
+        if executor is not None:
+            executor.shutdown()
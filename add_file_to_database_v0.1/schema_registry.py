@@ -0,0 +1,165 @@
+'''
+Registry of layouts (schemas) of measurement files.
+
+Layout is recognised by names and units of columns (second and third line of the file). For every layout
+a plan is compiled once and cached: names of columns in the database, data types used by the reader,
+flow (SLPM) columns and derived columns (mass flow rate) with their conversions. Next files of the same layout
+are read with the plan, without inspection of the header.
+
+Schema is a dictionary (JSON), only names, units and columns are required:
+{"name": "one flow meter",
+ "names": ["Sample Nb.", "Measurement time", "Pressure", ...],          - names of columns in the file
+ "units": ["[-]", "[s]", "[kPa]", ...],                               - units of columns in the file
+ "columns": ["Sample Nb.,[-]", "Measurement time,[s]", ...],            - names of columns in the database
+ "dtypes": {"Sample Nb.,[-]": "int64", "Gas type,[-]": "str"},          - by default float64, see column_dtypes
+ "derived": [{"name": "Mass flow rate [g/s]", "source": "SLPM,[l/min]", "conversion": "SLPM_to_sgps"},
+             {"name": "Mass flow rate (LPM) [g/s]", "source": "LPM,[l/min]", "conversion": "LPM_to_gps",
+              "pressure": "Pressure,[kPa]", "temperature": "Temperature,[0C]"}]}
+Without "derived", mass flow rate is calculated from all SLPM columns (see also lpm_derived_columns).
+
+New layouts can be registered without changes of the code: schemas.json file next to this module is read
+when the module is imported, other files can be read by load_schemas. Files of not registered layout
+are fitted by number of columns (see header_fit) and the plan is cached as well.
+fingerprint of the registry (hash of registered schemas and plan_version) is a part of the key of cached records
+of files (see add_data_file.run_cache_parameters), so records read with other schemas are not used.
+'''
+import os
+import json
+import hashlib
+import numpy as np
+from header_fit import *
+from mass_flow_kernel import *
+
+# Data types of columns which are not float (names of columns in the file)
+column_dtypes={'Sample Nb.':np.int64,'Gas Type':str}
+
+# Functions which can be used to calculate derived columns
+conversions={'SLPM_to_sgps':SLPM_to_sgps,'LPM_to_gps':LPM_to_gps}
+
+# Version of compiled plans, it has to be increased when plans of the same schema change (e.g. dtypes, conversions)
+plan_version=1
+
+default_schema_path=os.path.join(os.path.dirname(os.path.abspath(__file__)),'schemas.json')
+
+def derived_columns(columns):
+    '''Default derived columns: mass flow rate from every SLPM column (names as in former add_data_file)'''
+    flow=[name for name in columns if name.find('SLPM')>=0]
+    if len(flow) == 1:
+        return [{'name':'Mass flow rate [g/s]','source':flow[0],'conversion':'SLPM_to_sgps'}]
+    if len(flow) == 2:
+        return [{'name':'Mass flow rate - A'+str(i+1)+' [g/s]','source':name,'conversion':'SLPM_to_sgps'} for i,name in enumerate(flow)]
+    return []
+
+def layout_schema(names,units,name=None):
+    '''Schema of file with columns fitted by number of columns (see header_fit), None if the number is not known'''
+    columns=header_fit(len(names))
+    if columns is None:
+        return None
+    return {'name':name or str(len(names))+' columns','names':list(names),'units':list(units),'columns':columns}
+
+
+class schema_plan:
+    '''Compiled schema, used directly by read_measurement_file'''
+    __slots__=('name','columns','dtypes','flow_columns','derived','kernel')
+
+    def __init__(self,schema):
+        if len(schema['columns']) != len(schema['names']):
+            raise ValueError('Schema '+str(schema.get('name'))+': number of columns differs from number of names')
+        self.name=schema.get('name')
+        self.columns=list(schema['columns'])
+        types=schema.get('dtypes',{})
+        self.dtypes={}
+        for raw_name,column in zip(schema['names'],self.columns):
+            dtype=types.get(column,column_dtypes.get(raw_name,np.float64))
+            self.dtypes[column]=str if dtype in ('str',str) else np.dtype(dtype).type
+        derived=schema.get('derived',derived_columns(self.columns))
+        for item in derived:
+            if item['conversion'] not in conversions:
+                raise ValueError('Schema '+str(self.name)+': unknown conversion '+str(item['conversion']))
+            if item['conversion'] == 'LPM_to_gps' and not ('pressure' in item and 'temperature' in item):
+                raise ValueError('Schema '+str(self.name)+': LPM_to_gps needs pressure and temperature columns')
+        # (name of new column, index of source column, conversion)
+        self.derived=[(item['name'],self.columns.index(item['source']),item['conversion']) for item in derived]
+        self.flow_columns=[idx for _,idx,_ in self.derived]
+        self.kernel=mass_flow_kernel(derived,self.columns) # all derived columns in one call
+
+
+class schema_registry:
+    def __init__(self,schemas=()):
+        self._schemas={} # (names, units) - schema
+        self._plans={} # (names, units) - schema_plan
+        self._fingerprint=None
+        for schema in schemas:
+            self.register(schema)
+
+    def register(self,schema):
+        '''Register layout (schema dictionary, see module documentation), the same names and units replace previous schema'''
+        key=(tuple(schema['names']),tuple(schema['units']))
+        if len(key[0]) != len(key[1]):
+            raise ValueError('Schema '+str(schema.get('name'))+': number of units differs from number of names')
+        plan=schema_plan(schema) # schema is checked before it is registered
+        self._schemas[key]=schema
+        self._plans[key]=plan
+        self._fingerprint=None
+        return plan
+
+    def load(self,path):
+        '''Register all schemas from JSON file (list of schemas)'''
+        with open(path) as f:
+            for schema in json.load(f):
+                self.register(schema)
+
+    def save(self,path):
+        with open(path,'w') as f:
+            json.dump(list(self._schemas.values()),f,indent=4)
+
+    def plan(self,names,units):
+        '''Compiled plan of file layout given by names and units of columns'''
+        key=(tuple(names),tuple(units))
+        plan=self._plans.get(key)
+        if plan is None:
+            schema=layout_schema(names,units)
+            if schema is None:
+                raise ValueError('Unknown layout of file: '+str(len(names))+' columns '+str(list(names)))
+            plan=self._plans[key]=schema_plan(schema) # not registered, it is not saved
+        return plan
+
+    def schemas(self):
+        return list(self._schemas.values())
+
+    def fingerprint(self):
+        '''Hash of registered schemas and plan_version, it changes when any schema is registered, replaced or edited'''
+        if self._fingerprint is None:
+            schemas=sorted(json.dumps(schema,sort_keys=True,default=str) for schema in self._schemas.values())
+            self._fingerprint=hashlib.sha1(json.dumps([plan_version,schemas]).encode()).hexdigest()
+        return self._fingerprint
+
+
+# Layouts of files of the measurement equipment (see header_fit)
+builtin_schemas=[
+    layout_schema(['Sample Nb.','Measurement time','Pressure-1','Temperature-1','LPM-1','SLPM-1','Pressure-2','Temperature-2','LPM-2','SLPM-2',
+                   'Gas Type','Pt-1','Pt-2','Pt-3'],
+                  ['[-]','[s]','[kPa]','[C deg]','[l/min]','[l/min]','[kPa]','[C deg]','[l/min]','[l/min]','[-]','[kPa]','[kPa]','[kPa]'],
+                  'two flow meters, three pressure points'),
+    layout_schema(['Sample Nb.','Measurement time','Pressure','Temperature','LPM','SLPM','Gas Type','Pt-1','Pt-2','Pt-3'],
+                  ['[-]','[s]','[kPa]','[C deg]','[l/min]','[l/min]','[-]','[kPa]','[kPa]','[kPa]'],
+                  'one flow meter, three pressure points'),
+    layout_schema(['Sample Nb.','Measurement time','Pressure','Temperature','LPM','SLPM','Gas Type'],
+                  ['[-]','[s]','[kPa]','[C deg]','[l/min]','[l/min]','[-]'],
+                  'one flow meter')]
+
+default_registry=schema_registry(builtin_schemas)
+if os.path.exists(default_schema_path):
+    default_registry.load(default_schema_path)
+
+def register_schema(schema):
+    '''Register layout in default registry'''
+    return default_registry.register(schema)
+
+def load_schemas(path):
+    '''Register all layouts from JSON file in default registry'''
+    default_registry.load(path)
+
+def schemas_fingerprint():
+    '''Fingerprint of default registry'''
+    return default_registry.fingerprint()
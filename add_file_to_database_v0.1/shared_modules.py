@@ -0,0 +1,13 @@
+'''
+Modules shared by both applications (result_cache, stage_profiler, prefetch_pipeline) are kept in one copy,
+in common folder of the repository. Importing this module makes them importable:
+
+    import shared_modules
+    from stage_profiler import *
+'''
+import os
+import sys
+
+common_dir=os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'common')
+if common_dir not in sys.path:
+    sys.path.append(common_dir)
@@ -0,0 +1,36 @@
+import numpy as np
+import pandas as pd
+import pytest
+from add_statistics_to_case import case_statistics,statistic_name
+
+
+def run(columns,nb_of_samples,seed,data_avr=False):
+    data = np.random.default_rng(seed).random((nb_of_samples,len(columns)))
+    record = {'data_frame':{'header_columns':columns,'data':data.tolist()}}
+    if data_avr:
+        describe = pd.DataFrame(data,columns=columns).describe()
+        record['data_avr'] = {'header_rows':describe.index.tolist(),'header_columns':columns,'data':describe.values.tolist()}
+    return record
+
+
+@pytest.mark.parametrize('data_avr',[False,True])
+def test_mixed_layouts_use_union_of_columns(data_avr):
+    layouts = [['a','b','c'],['a','b','c','d','e'],['b','a']]
+    case = {'data':{'run_%d' % idx:run(columns,5+3*idx,idx,data_avr) for idx,columns in enumerate(layouts)}}
+    header,result = case_statistics(case,['mean','count','75%'])
+    assert header == ['a','b','c','d','e']
+    for idx,record in enumerate(case['data'].values()):
+        df = pd.DataFrame(record['data_frame']['data'],columns=record['data_frame']['header_columns'])
+        np.testing.assert_allclose(result['mean'][idx],[df[column].mean() if column in df else np.nan for column in header])
+        np.testing.assert_allclose(result['75%'][idx],[df[column].quantile(0.75) if column in df else np.nan for column in header])
+        expected_count = [len(df) if column in df else (np.nan if data_avr else 0) for column in header]
+        np.testing.assert_allclose(result['count'][idx],expected_count)
+
+
+def test_statistic_name():
+    assert statistic_name('median') == '50%'
+    assert statistic_name('90%') == '90%'
+    assert statistic_name('unknown') == 'mean'
+    for name in ('101%','-1%'):
+        with pytest.raises(ValueError):
+            statistic_name(name)
@@ -0,0 +1,49 @@
+import pytest
+from database_catalog import database_catalog,default_catalog_path,get_run
+from final_add_files import final_add_files
+from read_database_from_file import read_database_from_file
+
+
+def run_mean(run,column):
+    avr = run['data_avr']
+    if column not in avr['header_columns']:
+        return None
+    return avr['data'][avr['header_rows'].index('mean')][avr['header_columns'].index(column)]
+
+
+@pytest.fixture
+def catalog_database(files_to_add,tmp_path):
+    path = str(tmp_path/'database.npz')
+    final_add_files(files_to_add,path,catalog_path=default_catalog_path(path))
+    database = read_database_from_file(path)
+    with database_catalog(default_catalog_path(path)) as catalog:
+        yield catalog,database
+
+
+def test_query_matches_database(catalog_database):
+    catalog,database = catalog_database
+    runs = [(date,case_name,run_name,case.get('description'),run) for date,cases in database.items()
+            for case_name,case in cases.items() for run_name,run in case['data'].items()]
+    assert catalog.nb_of_runs() == len(runs)
+    assert [(case['date'],case['case_name'],case['nb_of_runs']) for case in catalog.cases()] == \
+           sorted({(date,case_name,len(database[date][case_name]['data'])) for date,case_name,_,_,_ in runs})
+
+    found = catalog.query(date_from='20220502',date_to='20220503')
+    assert sorted(handle['run_name'] for handle in found) == sorted(name for date,_,name,_,_ in runs if '20220502' <= date <= '20220503')
+
+    found = catalog.query(case_name='test_%_conf_4')
+    assert {handle['case_name'] for handle in found} == {'test_20220504_conf_4'}
+
+    found = catalog.query(description='synthetic, 10 columns')
+    assert sorted(handle['run_name'] for handle in found) == sorted(name for _,_,name,description,_ in runs if description == 'synthetic, 10 columns')
+
+    column = 'Pressure,[kPa]'
+    expected = [name for _,_,name,_,run in runs if run_mean(run,column) is not None and 240 <= run_mean(run,column) <= 300]
+    found = catalog.query(values={column:(240,300)})
+    assert expected and sorted(handle['run_name'] for handle in found) == sorted(expected)
+    for handle in found:
+        assert catalog.run_values(handle)[column] == pytest.approx(run_mean(get_run(database,handle),column))
+
+    assert len(catalog.query(order_by=('nb_of_samples','id'),limit=2)) == 2
+    with pytest.raises(ValueError):
+        catalog.query(order_by=('value; DROP TABLE runs',))
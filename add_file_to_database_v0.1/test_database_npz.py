@@ -0,0 +1,48 @@
+import json
+import os
+import pytest
+from database_npz import *
+from final_add_files import final_add_files
+from read_database_from_file import read_database_from_file
+
+
+def content(database):
+    return json.dumps(database,default=to_json_default,sort_keys=True)
+
+
+def test_npz_round_trip(files_to_add,tmp_path):
+    database = final_add_files(files_to_add,str(tmp_path/'database.json'))
+    save_database(database,str(tmp_path/'database.npz'))
+    assert content(read_database_from_file(str(tmp_path/'database.npz'))) == content(read_database_from_file(str(tmp_path/'database.json')))
+    lazy = read_database_from_file(str(tmp_path/'database.npz'),lazy=True)
+    assert content(lazy) == content(database)
+    lazy.close()
+
+
+@pytest.mark.parametrize('extension',['json','npz'])
+def test_append_and_compact_equal_full_build(files_to_add,tmp_path,extension):
+    full_path = str(tmp_path/('full.'+extension))
+    path = str(tmp_path/('database.'+extension))
+    final_add_files(files_to_add,full_path)
+    final_add_files({k:v for k,v in files_to_add.items() if k == 0},path)
+    for last in (1,2,3): # every update adds one case, it is saved as new segment
+        final_add_files({k:v for k,v in files_to_add.items() if k <= last},path,data_exists=True,compact_every=None)
+    assert len(segment_paths(path)) == 3
+    assert content(read_database_from_file(path)) == content(read_database_from_file(full_path))
+    assert database_keys(path) == database_keys(full_path)
+    compact_database(path)
+    assert segment_paths(path) == []
+    assert content(read_database_from_file(path)) == content(read_database_from_file(full_path))
+
+
+def test_keys_index_follows_json_file(tmp_path):
+    path = str(tmp_path/'database.json')
+    save_database({'20220501':{'case_1':{},'case_2':{}}},path)
+    assert os.path.exists(keys_path(path))
+    assert read_file_keys(path) == {'20220501':['case_1','case_2']}
+    with open(path,'w') as f: # JSON replaced without index
+        json.dump({'20220601':{'case_3':{}}},f)
+    assert read_file_keys(path) == {'20220601':['case_3']}
+    with open(keys_path(path),'w') as f:
+        f.write('{damaged')
+    assert read_file_keys(path) == {'20220601':['case_3']}
@@ -0,0 +1,28 @@
+import json
+import pytest
+from add_to_data_dictionary2 import add_to_data_dictionary2,folder_files,read_runs
+from final_add_files import final_add_files
+
+
+@pytest.mark.parametrize('options',[{'prefetch':2},{'prefetch':3,'compact':True},{'cache_dir':'cache'}])
+def test_pipeline_options_give_the_same_database(files_to_add,tmp_path,options):
+    if 'cache_dir' in options:
+        options = {'cache_dir':str(tmp_path/options['cache_dir'])}
+        final_add_files(files_to_add,str(tmp_path/'cached.json'),**options) # the second build is taken from the cache
+    final_add_files(files_to_add,str(tmp_path/'expected.json'))
+    final_add_files(files_to_add,str(tmp_path/'database.json'),**options)
+    with open(tmp_path/'expected.json') as expected,open(tmp_path/'database.json') as database:
+        assert json.load(database) == json.load(expected)
+
+
+def test_runs_have_to_match_queued_files(files_to_add):
+    folder = files_to_add[0]['folder_path']
+    file_list = folder_files(folder)
+    runs = read_runs([(file_name,folder,'info') for file_name in file_list[:-1]])
+    with pytest.raises(ValueError):
+        add_to_data_dictionary2(folder,{},runs=runs,file_list=file_list) # runs end before the last file
+    runs = read_runs([(file_name,folder,'info') for file_name in file_list[::-1]])
+    with pytest.raises(ValueError):
+        add_to_data_dictionary2(folder,{},runs=runs,file_list=file_list) # other order
+    with pytest.raises(ValueError):
+        add_to_data_dictionary2(folder,{},runs=iter([]))
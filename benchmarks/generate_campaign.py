@@ -0,0 +1,130 @@
+'''
+Generator of synthetic measurement campaigns for benchmarks.
+
+Two formats of measurement files are written:
+- Mass_flow_rate_analysis format - 5 columns (Sample Nb., Measurement time, Voltage, Pressure, Weight),
+  one directory per case and direcory_list.json with all cases,
+- add_file_to_database format - 7, 10 or 14 columns (see header_fit), one directory per case, files run_c<case>_v1_<nb>.txt,
+  together with files_to_add dictionary for final_add_files.
+Values are random, but plausible (weight grows linearly, pressure and flow are constant with noise), so all tools can process them.
+
+Command line usage:
+python generate_campaign.py mfr <output_dir> [cases] [files_per_case] [samples] [data_rate]
+python generate_campaign.py db <output_dir> [cases] [files_per_case] [samples] [data_rate] [columns]
+'''
+import os
+import sys
+import json
+import numpy as np
+
+mfr_names = ['Sample Nb.','Measurement time','Voltage','Pressure','Weight']
+mfr_units = ['[-]','[s]','[V]','[Pa]','[g]']
+
+# names and units of columns of add_file_to_database files, key - number of columns (see header_fit)
+db_names = {14:['Sample Nb.','Measurement time','Pressure-1','Temperature-1','LPM-1','SLPM-1','Pressure-2','Temperature-2','LPM-2','SLPM-2',
+                'Gas Type','Pt-1','Pt-2','Pt-3'],
+            10:['Sample Nb.','Measurement time','Pressure','Temperature','LPM','SLPM','Gas Type','Pt-1','Pt-2','Pt-3'],
+            7:['Sample Nb.','Measurement time','Pressure','Temperature','LPM','SLPM','Gas Type']}
+db_units = {'Sample Nb.':'[-]','Measurement time':'[s]','Pressure':'[kPa]','Temperature':'[C deg]','LPM':'[l/min]','SLPM':'[l/min]',
+            'Gas Type':'[-]','Pt':'[kPa]'}
+
+
+def write_mfr_file(path,nb_of_samples,data_rate,pressure_bar,mass_flow,date='2023-01-05',hour='10:00:00',seed=0):
+    '''Write single file in Mass_flow_rate_analysis format
+    Input:
+    pressure_bar - mean pressure of the measurement
+    mass_flow - mass flow rate [g/s], weight grows with this rate
+    '''
+    rng = np.random.default_rng(seed)
+    nb = np.arange(1,nb_of_samples+1)
+    time = nb/data_rate+rng.normal(0,1e-5,nb_of_samples)
+    pressure = pressure_bar*100000+rng.normal(0,500,nb_of_samples)
+    voltage = pressure/105600
+    weight = 100+mass_flow*nb/data_rate+rng.normal(0,0.01,nb_of_samples)
+    with open(path,'w') as f:
+        f.write(date+'\t'+hour+'\tData rate [Hz]\t'+str(data_rate)+'\t\n')
+        f.write('\t'.join(mfr_names)+'\n')
+        f.write('\t'.join(mfr_units)+'\n')
+        np.savetxt(f,np.column_stack((nb,time,voltage,pressure,weight)),fmt='%.6f',delimiter='\t')
+
+def write_db_file(path,nb_of_samples,data_rate,nb_of_columns=14,pressure_kpa=350,date='2022-05-22',hour='08:00:00',seed=0):
+    '''Write single file in add_file_to_database format with 7, 10 or 14 columns'''
+    rng = np.random.default_rng(seed)
+    names = db_names[nb_of_columns]
+    columns = list()
+    formats = list()
+    for name in names:
+        if name == 'Sample Nb.':
+            columns.append(np.arange(1,nb_of_samples+1))
+            formats.append('%d')
+            continue
+        if name == 'Gas Type':
+            formats.append('A') # text column, the same gas in all samples
+            continue
+        if name == 'Measurement time':
+            value = np.arange(1,nb_of_samples+1)/data_rate
+        elif name.startswith('Temperature'):
+            value = rng.normal(22,0.2,nb_of_samples)
+        elif name.startswith('LPM') or name.startswith('SLPM'):
+            value = rng.normal(pressure_kpa/2,5,nb_of_samples)
+        else:
+            value = rng.normal(pressure_kpa,10,nb_of_samples)
+        columns.append(value)
+        formats.append('%.15g')
+    units = [db_units[name.split('-')[0]] for name in names]
+    with open(path,'w') as f:
+        f.write('\t'.join([date,hour,'Data rate [Hz]',str(data_rate)]+['']*(len(names)-4))+'\n')
+        f.write('\t'.join(names)+'\n')
+        f.write('\t'.join(units)+'\n')
+        np.savetxt(f,np.column_stack(columns),fmt='\t'.join(formats))
+
+def generate_mfr_campaign(output_dir,nb_of_cases=2,files_per_case=3,nb_of_samples=1800,data_rate=10,seed=0):
+    '''Write campaign in Mass_flow_rate_analysis format. Returns path of direcory_list.json'''
+    dir_list = {}
+    for case in range(nb_of_cases):
+        case_name = 'case_'+str(case+1)
+        case_dir = os.path.join(output_dir,case_name)
+        os.makedirs(case_dir,exist_ok=True)
+        for idx in range(files_per_case):
+            pressure_bar = 2*(idx+1)
+            write_mfr_file(os.path.join(case_dir,'test%d_%dbar.txt' % (case+1,pressure_bar)),nb_of_samples,data_rate,pressure_bar,
+                           mass_flow=0.2*pressure_bar/(case+1),seed=seed+case*files_per_case+idx)
+        dir_list[case_name] = case_dir
+    path = os.path.join(output_dir,'direcory_list.json')
+    with open(path,'w') as f:
+        json.dump(dir_list,f,indent=4)
+    return path
+
+def generate_db_campaign(output_dir,nb_of_cases=4,files_per_case=15,nb_of_samples=200,data_rate=100,nb_of_columns=14,seed=0):
+    '''Write campaign in add_file_to_database format. Returns files_to_add dictionary for final_add_files.
+    nb_of_columns - 7, 10 or 14, or list with layout of every case (e.g. [7,10,14])
+    '''
+    if isinstance(nb_of_columns,int):
+        nb_of_columns = [nb_of_columns]
+    files_to_add = {}
+    for case in range(nb_of_cases):
+        general_date = '202205%02d' % (case%28+1)
+        case_name = 'test_'+general_date+'_conf_'+str(case+1)
+        case_dir = os.path.join(output_dir,case_name)
+        os.makedirs(case_dir,exist_ok=True)
+        columns = nb_of_columns[case%len(nb_of_columns)]
+        for idx in range(files_per_case):
+            write_db_file(os.path.join(case_dir,'run_c%d_v1_%d.txt' % (case+1,idx+1)),nb_of_samples,data_rate,columns,
+                          pressure_kpa=200+50*idx,date='2022-05-%02d' % (case%28+1),seed=seed+case*files_per_case+idx)
+        files_to_add[case] = {'folder_path':case_dir,'general_date':general_date,'case_name':case_name,
+                              'description':'synthetic, %d columns' % columns,'additional_info':'synthetic'}
+    with open(os.path.join(output_dir,'files_to_add.json'),'w') as f:
+        json.dump(files_to_add,f,indent=4)
+    return files_to_add
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[1] not in ('mfr','db'):
+        print(__doc__)
+        sys.exit(1)
+    arguments = [int(x) for x in sys.argv[3:]]
+    if sys.argv[1] == 'mfr':
+        print(generate_mfr_campaign(sys.argv[2],*arguments))
+    else:
+        generate_db_campaign(sys.argv[2],*arguments)
+        print(os.path.join(sys.argv[2],'files_to_add.json'))
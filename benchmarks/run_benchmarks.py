@@ -0,0 +1,236 @@
+'''
+Benchmarks of both applications on synthetic campaigns (see generate_campaign).
+
+For every scale point a campaign is generated into temporary directory, then the stages are timed:
+Mass_flow_rate_analysis - clc_avr_window (one file), data_arr, data_container with throttled reading (with and without prefetch),
+data_pyramids + pyramid_container, fit_curves (all models), save_excel + add_chart, save_report, save_report_sharded (one case per shard, sequential and parallel),
+add_file_to_database - final_add_files (JSON and *.npz, throttled reading with and without prefetch), add_statistics_to_case, render_case_plots,
+read_database_from_file (JSON, *.npz, lazy *.npz).
+Cold start (time of new python process) of tools_cli.py and of modules of the applications is measured once, as scale 'startup'.
+Every stage is repeated and all times are saved into JSON file together with the scale point and versions of packages,
+so results of two versions of the tools can be compared (--compare).
+
+Command line usage:
+python run_benchmarks.py [--scale small medium large] [--repeat 3] [--output results.json] [--compare old_results.json]
+python run_benchmarks.py --cases 4 --files 10 --samples 100000 --rate 1000 --columns 14
+'''
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+import statistics
+
+root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0,os.path.join(root_dir,'Mass_flow_rate_analysis_v0.1'))
+sys.path.insert(0,os.path.join(root_dir,'add_file_to_database_v0.1'))
+sys.path.insert(0,os.path.join(root_dir,'common'))
+
+from generate_campaign import generate_mfr_campaign,generate_db_campaign
+
+# Scale points: number of cases, files per case, samples per file, data rate [Hz] and number of columns (add_file_to_database files)
+scales = {'small':dict(cases=2,files=3,samples=1800,rate=10,columns=[7,10,14]),
+          'medium':dict(cases=4,files=10,samples=20000,rate=100,columns=[7,10,14]),
+          'large':dict(cases=8,files=20,samples=200000,rate=1000,columns=[14])}
+
+
+def time_stage(fun,repeat=3):
+    '''Run fun repeat times, returns list of times [s] and result of the last run'''
+    times = list()
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fun()
+        times.append(time.perf_counter()-start)
+    return times,result
+
+def stage_record(name,scale_name,scale,times,error=None,**info):
+    record = {'stage':name,'scale':scale_name,'parameters':scale,'times':times,**info}
+    if times:
+        record['min'] = min(times)
+        record['median'] = statistics.median(times)
+    if error is not None:
+        record['error'] = error
+    return record
+
+def run_stage(records,name,scale_name,scale,fun,repeat):
+    '''Time single stage, errors are saved into results instead of stopping the benchmark'''
+    try:
+        times,result = time_stage(fun,repeat)
+    except Exception as e:
+        records.append(stage_record(name,scale_name,scale,[],repr(e)))
+        print('%-40s %-8s ERROR %r' % (name,scale_name,e))
+        return None
+    records.append(stage_record(name,scale_name,scale,times))
+    print('%-40s %-8s %10.4f s' % (name,scale_name,min(times)))
+    return result
+
+def mfr_benchmarks(records,scale_name,scale,work_dir,repeat):
+    from MassFlowRateAnalysis import mass_flow_rate_analysis
+    from prefetch_pipeline import prefetch_options,throttled_read
+    dir_list = generate_mfr_campaign(os.path.join(work_dir,'mfr'),scale['cases'],scale['files'],scale['samples'],scale['rate'])
+    mfra = mass_flow_rate_analysis()
+    window_size = max(1,scale['rate']*5) # 5 s windows
+    first_case = mfra.open_dir_list(dir_list)['case_1']
+    first_file = os.path.join(first_case,sorted(os.listdir(first_case))[0])
+    date,hour,data_rate,df,oh = mfra.read_file(first_file)
+    run_stage(records,'mfr.read_file',scale_name,scale,lambda: mfra.read_file(first_file),repeat)
+    run_stage(records,'mfr.clc_avr_window',scale_name,scale,lambda: mfra.clc_avr_window(df,4,3,window_size,data_rate),repeat)
+    result = run_stage(records,'mfr.data_arr',scale_name,scale,lambda: mfra.data_arr(dir_list,4,3,window_size),repeat)
+    slow = throttled_read(latency=0.02) # local stand-in of network storage
+    run_stage(records,'mfr.data_container[throttled]',scale_name,scale,
+              lambda: mass_flow_rate_analysis(prefetch=prefetch_options(1,1,slow)).data_container(dir_list,4,3,window_size),repeat)
+    run_stage(records,'mfr.data_container[throttled, prefetch 4]',scale_name,scale,
+              lambda: mass_flow_rate_analysis(prefetch=prefetch_options(4,4,slow)).data_container(dir_list,4,3,window_size),repeat)
+    pyramids = run_stage(records,'mfr.data_pyramids',scale_name,scale,lambda: mfra.data_pyramids(dir_list,4,3),repeat)
+    if pyramids is not None:
+        run_stage(records,'mfr.pyramid_container',scale_name,scale,lambda: mfra.pyramid_container(*pyramids,window_size),repeat)
+    if result is None:
+        return
+    run_stage(records,'mfr.fit_curves',scale_name,scale,
+              lambda: [mfra.fit_curves(result,model) for model in ('polynomial','sqrt','power')],repeat)
+    excel_file = os.path.join(work_dir,'report.xlsx')
+    def excel():
+        df_main,temp_df_1,temp_df_3,temp_df_4,dict_info = mfra.save_excel(excel_file,*result[:5],result[7],result[8])
+        mfra.add_chart(excel_file,temp_df_1,temp_df_3,temp_df_4,dict_info)
+    run_stage(records,'mfr.save_excel+add_chart',scale_name,scale,excel,repeat)
+    run_stage(records,'mfr.save_report',scale_name,scale,lambda: mfra.save_report(excel_file,*result[:5],result[7],result[8]),repeat)
+    run_stage(records,'mfr.save_report_sharded',scale_name,scale,
+              lambda: mfra.save_report_sharded(excel_file,*result[:5],result[7],result[8]),repeat)
+    run_stage(records,'mfr.save_report_sharded[workers 4]',scale_name,scale,
+              lambda: mfra.save_report_sharded(excel_file,*result[:5],result[7],result[8],workers=4),repeat)
+
+def db_benchmarks(records,scale_name,scale,work_dir,repeat):
+    from final_add_files import final_add_files
+    from add_statistics_to_case import add_statistics_to_case
+    from read_database_from_file import read_database_from_file
+    from render_case_plots import render_case_plots
+    from prefetch_pipeline import prefetch_options,throttled_read
+    files_to_add = generate_db_campaign(os.path.join(work_dir,'db'),scale['cases'],scale['files'],scale['samples'],scale['rate'],scale['columns'])
+    json_path = os.path.join(work_dir,'database.json')
+    npz_path = os.path.join(work_dir,'database.npz')
+    database = run_stage(records,'db.final_add_files[json]',scale_name,scale,lambda: final_add_files(files_to_add,json_path),repeat)
+    run_stage(records,'db.final_add_files[npz]',scale_name,scale,lambda: final_add_files(files_to_add,npz_path),repeat)
+    slow = throttled_read(latency=0.02)
+    run_stage(records,'db.final_add_files[json, throttled]',scale_name,scale,
+              lambda: final_add_files(files_to_add,json_path,prefetch=prefetch_options(1,1,slow)),repeat)
+    run_stage(records,'db.final_add_files[json, throttled, prefetch 4]',scale_name,scale,
+              lambda: final_add_files(files_to_add,json_path,prefetch=prefetch_options(4,4,slow)),repeat)
+    if database is not None:
+        run_stage(records,'db.add_statistics_to_case[mean]',scale_name,scale,lambda: add_statistics_to_case(database,'mean'),repeat)
+        run_stage(records,'db.add_statistics_to_case[5 stats]',scale_name,scale,
+                  lambda: add_statistics_to_case(database,['mean','std','min','max','90%']),repeat)
+        plot_dir = os.path.join(work_dir,'plots')
+        run_stage(records,'db.render_case_plots',scale_name,scale,lambda: render_case_plots(database,plot_dir),repeat)
+    if os.path.exists(json_path):
+        run_stage(records,'db.read_database_from_file[json]',scale_name,scale,lambda: read_database_from_file(json_path),repeat)
+    if os.path.exists(npz_path):
+        run_stage(records,'db.read_database_from_file[npz]',scale_name,scale,lambda: read_database_from_file(npz_path),repeat)
+        def lazy():
+            with read_database_from_file(npz_path,lazy=True) as database:
+                return len(database)
+        run_stage(records,'db.read_database_from_file[lazy npz]',scale_name,scale,lazy,repeat)
+
+# heavy packages which should be imported only when they are needed
+heavy_modules = ('pandas','openpyxl','matplotlib','tkinter')
+
+# cold start of command line interface and modules of the applications, each one is run in new python process
+cold_starts = {'tools_cli --help':[os.path.join(root_dir,'tools_cli.py'),'--help'],
+               'import MassFlowRateAnalysis':['-c','import MassFlowRateAnalysis'],
+               'import final_add_files':['-c','import final_add_files'],
+               'import read_database_from_file':['-c','import read_database_from_file'],
+               'import display_tk_window, plot_massflow_from_avr_data':['-c','import display_tk_window, plot_massflow_from_avr_data']}
+
+def startup_benchmarks(records,repeat):
+    '''Wall time of new python process for every entry of cold_starts, together with list of heavy packages which were imported'''
+    env = dict(os.environ,PYTHONPATH=os.pathsep.join([os.path.join(root_dir,'Mass_flow_rate_analysis_v0.1'),
+                                                      os.path.join(root_dir,'add_file_to_database_v0.1')]))
+    check = 'import sys; print(" ".join(m for m in %r if m in sys.modules))' % (heavy_modules,)
+    for name,arguments in cold_starts.items():
+        times = list()
+        try:
+            for _ in range(repeat):
+                start = time.perf_counter()
+                subprocess.run([sys.executable]+arguments,env=env,check=True,stdout=subprocess.DEVNULL)
+                times.append(time.perf_counter()-start)
+            imported = list()
+            if arguments[0] == '-c':
+                imported = subprocess.run([sys.executable,'-c',arguments[1]+'; '+check],env=env,check=True,
+                                          capture_output=True,text=True).stdout.split()
+        except (OSError,subprocess.CalledProcessError) as e:
+            records.append(stage_record('cold_start['+name+']','startup',{},[],repr(e)))
+            print('%-40s %-8s ERROR %r' % (name,'startup',e))
+            continue
+        records.append(stage_record('cold_start['+name+']','startup',{},times,heavy_modules=imported))
+        print('%-40s %-8s %10.4f s %s' % ('cold_start['+name+']','startup',min(times),' '.join(imported)))
+
+def environment():
+    '''Versions of python, packages and the tools (git commit)'''
+    info = {'python':platform.python_version(),'platform':platform.platform(),'cpu_count':os.cpu_count()}
+    for package in ('numpy','pandas','openpyxl'):
+        try:
+            info[package] = __import__(package).__version__
+        except ImportError:
+            info[package] = None
+    try:
+        info['commit'] = subprocess.run(['git','rev-parse','HEAD'],cwd=root_dir,capture_output=True,text=True).stdout.strip()
+    except OSError:
+        info['commit'] = None
+    return info
+
+def compare_results(old,new):
+    '''Print ratio of min time of new and old results for all stages found in both'''
+    old_times = {(r['stage'],r['scale']):r['min'] for r in old['results'] if 'min' in r}
+    print('\n%-40s %-8s %10s %10s %8s' % ('stage','scale','old [s]','new [s]','new/old'))
+    for r in new['results']:
+        key = (r['stage'],r['scale'])
+        if key in old_times and 'min' in r:
+            print('%-40s %-8s %10.4f %10.4f %8.2f' % (r['stage'],r['scale'],old_times[key],r['min'],r['min']/old_times[key]))
+
+def run_benchmarks(scale_points,repeat=3,apps=('startup','mfr','db'),work_dir=None):
+    '''Run benchmarks for dictionary of scale points (name - parameters, see scales). Returns results dictionary'''
+    records = list()
+    if 'startup' in apps:
+        startup_benchmarks(records,repeat)
+    for scale_name,scale in scale_points.items():
+        scale_dir = tempfile.mkdtemp(prefix='benchmark_'+scale_name+'_',dir=work_dir)
+        try:
+            if 'mfr' in apps:
+                mfr_benchmarks(records,scale_name,scale,scale_dir,repeat)
+            if 'db' in apps:
+                db_benchmarks(records,scale_name,scale,scale_dir,repeat)
+        finally:
+            shutil.rmtree(scale_dir,ignore_errors=True)
+    return {'environment':environment(),'date':time.strftime('%Y-%m-%d %H:%M:%S'),'repeat':repeat,'results':records}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmarks of Mass_flow_rate_analysis and add_file_to_database on synthetic campaigns')
+    parser.add_argument('--scale',nargs='+',default=['small'],choices=sorted(scales),help='predefined scale points')
+    parser.add_argument('--cases',type=int,help='custom scale point: number of cases')
+    parser.add_argument('--files',type=int,default=3,help='custom scale point: files per case')
+    parser.add_argument('--samples',type=int,default=1800,help='custom scale point: samples per file')
+    parser.add_argument('--rate',type=int,default=10,help='custom scale point: data rate [Hz]')
+    parser.add_argument('--columns',type=int,nargs='+',default=[7,10,14],help='custom scale point: columns of add_file_to_database files')
+    parser.add_argument('--apps',nargs='+',default=['startup','mfr','db'],choices=['startup','mfr','db'],
+                        help='startup - cold start of command line interface and modules')
+    parser.add_argument('--repeat',type=int,default=3)
+    parser.add_argument('--work-dir',help='directory for generated campaigns, by default system temporary directory')
+    parser.add_argument('--output',default='benchmark_results.json')
+    parser.add_argument('--compare',help='results of previous run to compare with')
+    args = parser.parse_args()
+
+    if args.cases is not None:
+        scale_points = {'custom':dict(cases=args.cases,files=args.files,samples=args.samples,rate=args.rate,columns=args.columns)}
+    else:
+        scale_points = {name:scales[name] for name in args.scale}
+    results = run_benchmarks(scale_points,args.repeat,args.apps,args.work_dir)
+    with open(args.output,'w') as f:
+        json.dump(results,f,indent=2)
+    print('Results saved into',args.output)
+    if args.compare:
+        with open(args.compare) as f:
+            compare_results(json.load(f),results)
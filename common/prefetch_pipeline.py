@@ -0,0 +1,104 @@
+'''
+Pipelined reading of measurement files: raw bytes of next files are read by threads while earlier files are processed.
+
+    for path,data in prefetch(paths,prefetch_options(depth=4,readers=2)):
+        result = parse_and_process(data) # next files are read in the meantime
+
+depth - maximum number of files read ahead (bounded queue). Data of depth files read ahead and of the file
+being processed are kept in memory (depth+1 files). With executor (see pipeline) up to depth files are also being processed
+by workers at the same time, so data of about 2*depth files are kept in memory,
+readers - number of threads reading files at the same time.
+Files are returned in the same order as given. Reading of files releases GIL, so it overlaps with the processing
+in the main thread or in worker processes (see pipeline). It is intended for slow (e.g. network) storage.
+throttled_read simulates such storage on local disk (latency and bandwidth), e.g. for benchmarks.
+'''
+import os
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+
+def read_bytes(path):
+    with open(path,'rb') as f:
+        return f.read()
+
+
+class throttled_read:
+    '''Read file as slow storage would do: latency [s] before every file and limited bandwidth [bytes/s]'''
+    def __init__(self,latency=0.05,bandwidth=None):
+        self.latency = latency
+        self.bandwidth = bandwidth
+
+    def __call__(self,path):
+        delay = self.latency
+        if self.bandwidth:
+            delay += os.path.getsize(path)/self.bandwidth
+        time.sleep(delay)
+        return read_bytes(path)
+
+
+class prefetch_options:
+    def __init__(self,depth=4,readers=2,read=read_bytes):
+        '''
+        Input:
+        depth - maximum number of files read ahead (data of depth+1 files in memory, about 2*depth with executor, see pipeline)
+        readers - number of reading threads
+        read - function reading one item (e.g. path), by default raw bytes of the file
+        '''
+        if depth < 1 or readers < 1:
+            raise ValueError('depth and readers have to be positive integers')
+        self.depth = depth
+        self.readers = readers
+        self.read = read
+
+def prefetch_config(prefetch):
+    '''prefetch_options from options or depth (integer), None if prefetching is disabled'''
+    if prefetch is None or isinstance(prefetch,prefetch_options):
+        return prefetch
+    return prefetch_options(depth=prefetch)
+
+end_of_items = object()
+
+def prefetch(items,options,read=None,profiler=None):
+    '''Generator of (item, data) in order of items, data of next items is read in background threads.
+    Input:
+    read - (optional) function used instead of options.read, e.g. one which skips cached files
+    profiler - (optional) stage_profiler, time of waiting for data is measured as 'prefetch_wait' stage
+    '''
+    read = read or options.read
+    items = iter(items)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=options.readers) as readers:
+        for item in items:
+            pending.append((item,readers.submit(read,item)))
+            if len(pending) >= options.depth:
+                break
+        while pending:
+            item,future = pending.popleft()
+            if profiler is not None:
+                with profiler.stage('prefetch_wait'):
+                    data = future.result()
+            else:
+                data = future.result()
+            next_item = next(items,end_of_items)
+            if next_item is not end_of_items: # next file is read while this one is processed
+                pending.append((next_item,readers.submit(read,next_item)))
+            yield item,data
+
+def pipeline(items,process,options,read=None,executor=None,profiler=None):
+    '''Generator of process(item,data) in order of items, data are prefetched (see prefetch).
+    executor - (optional) concurrent.futures executor, e.g. ProcessPoolExecutor, processing several items at once,
+    at most options.depth items are processed at the same time, while next options.depth items are read ahead
+    (data of about 2*options.depth items in memory).
+    '''
+    if executor is None:
+        for item,data in prefetch(items,options,read,profiler):
+            yield process(item,data)
+        return
+    futures = deque()
+    for item,data in prefetch(items,options,read,profiler):
+        futures.append(executor.submit(process,item,data))
+        if len(futures) >= options.depth:
+            yield futures.popleft().result()
+    while futures:
+        yield futures.popleft().result()
@@ -0,0 +1,117 @@
+'''
+On-disk cache of results calculated from measurement files.
+
+Every entry is a pickle file. The name of the file is built from the measurement file path
+and from a key of the file identity (size, modification time) and analysis parameters,
+so changed file or different parameters never use old results.
+Total size of the cache is limited, the least recently used entries are removed first.
+
+Command line usage:
+python common/result_cache.py <cache_dir> info
+python common/result_cache.py <cache_dir> clear [measurement_file ...]
+
+The module is shared by both applications (see add_file_to_database_v0.1/shared_modules.py).
+'''
+import os
+import sys
+import hashlib
+import pickle
+
+
+class result_cache:
+    def __init__(self,cache_dir,max_size=1024**3):
+        '''
+        Input:
+        cache_dir - directory of the cache, created if not exists
+        max_size - maximum size of the cache in bytes, default 1 GB
+        '''
+        self.cache_dir = cache_dir
+        self.max_size = max_size
+        os.makedirs(cache_dir,exist_ok=True)
+
+    def path_prefix(self,file_path):
+        '''First part of entry name, the same for all entries of one measurement file'''
+        return hashlib.sha1(os.path.abspath(file_path).encode()).hexdigest()[:16]
+
+    def entry_path(self,file_path,parameters):
+        '''Path of cache entry for measurement file and parameters (any object with stable repr)'''
+        stat = os.stat(file_path)
+        key = repr((stat.st_size,stat.st_mtime_ns,parameters))
+        name = self.path_prefix(file_path)+'_'+hashlib.sha1(key.encode()).hexdigest()+'.pkl'
+        return os.path.join(self.cache_dir,name)
+
+    def get(self,file_path,parameters):
+        '''Return cached value or None if there is no valid entry'''
+        entry = self.entry_path(file_path,parameters)
+        try:
+            with open(entry,'rb') as f:
+                value = pickle.load(f)
+        except (OSError,pickle.UnpicklingError,EOFError):
+            return None
+        try:
+            os.utime(entry) # mark as recently used
+        except OSError:
+            pass
+        return value
+
+    def put(self,file_path,parameters,value):
+        '''Save value into the cache. Size of the cache is not checked here, call evict after a batch of entries'''
+        entry = self.entry_path(file_path,parameters)
+        temp = entry+'.'+str(os.getpid())+'.tmp'
+        with open(temp,'wb') as f:
+            pickle.dump(value,f,protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp,entry) # atomic, entries can be written from parallel processes
+
+    def entries(self):
+        '''List of (last use time, size, path) of all entries'''
+        entries = list()
+        for name in os.listdir(self.cache_dir):
+            if name.endswith('.pkl'):
+                path = os.path.join(self.cache_dir,name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((stat.st_mtime,stat.st_size,path))
+        return entries
+
+    def evict(self):
+        '''Remove least recently used entries until size of the cache is below max_size'''
+        entries = sorted(self.entries())
+        total = sum(size for _,size,_ in entries)
+        for _,size,path in entries:
+            if total <= self.max_size:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def invalidate(self,file_path=None):
+        '''Remove entries of given measurement file, or all entries if file_path is None.
+        Returns number of removed entries.'''
+        prefix = None if file_path is None else self.path_prefix(file_path)+'_'
+        removed = 0
+        for _,_,path in self.entries():
+            if prefix is None or os.path.basename(path).startswith(prefix):
+                try:
+                    os.remove(path)
+                    removed += 1
+                except OSError:
+                    pass
+        return removed
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3 or sys.argv[2] not in ('info','clear'):
+        print(__doc__)
+        sys.exit(1)
+    cache = result_cache(sys.argv[1])
+    if sys.argv[2] == 'info':
+        entries = cache.entries()
+        print('Entries:',len(entries),'Size [MB]:',round(sum(e[1] for e in entries)/1024**2,2))
+    elif len(sys.argv) > 3:
+        print('Removed entries:',sum(cache.invalidate(f) for f in sys.argv[3:]))
+    else:
+        print('Removed entries:',cache.invalidate())
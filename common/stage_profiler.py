@@ -0,0 +1,174 @@
+'''
+Timing and memory instrumentation of processing stages.
+
+Every stage (e.g. reading of a file, window function, calculation of statistics, saving of the workbook or the database) is measured by context manager:
+
+    profiler = stage_profiler()
+    with profiler.stage('read_file',file=path,path=path) as s:
+        df = ...
+        s.rows = len(df)
+
+For every stage wall time, number of rows, bytes read (size of file given by path) and optionally peak memory
+(tracemalloc, trace_memory=True) are recorded together with file and case names.
+Records can be saved as JSON profile (save), written on-line as JSON lines (log_path) and summarised by stage, file or case (summary).
+When the profiler is disabled, stage returns shared empty object and nothing is measured.
+'''
+import os
+import json
+import time
+import tracemalloc
+
+
+class disabled_stage:
+    '''Stage of disabled profiler, all values are ignored'''
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*args):
+        return False
+
+    def __setattr__(self,name,value):
+        pass
+
+null_stage = disabled_stage()
+
+
+class profiled_stage:
+    __slots__ = ('profiler','name','file','case','path','rows','start','peak')
+
+    def __init__(self,profiler,name,file,case,path,rows):
+        self.profiler = profiler
+        self.name = name
+        self.file = file
+        self.case = case
+        self.path = path
+        self.rows = rows
+        self.peak = 0
+
+    def __enter__(self):
+        self.profiler.enter(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self,*args):
+        duration = time.perf_counter()-self.start
+        self.profiler.exit(self,duration)
+        return False
+
+
+class stage_profiler:
+    def __init__(self,enabled=True,trace_memory=False,log_path=None):
+        '''
+        Input:
+        enabled - if False, nothing is measured (negligible overhead)
+        trace_memory - measure peak memory of every stage by means of tracemalloc (it slows down the processing)
+        log_path - (optional) file where every record is appended as one line of JSON
+        '''
+        self.enabled = enabled
+        self.trace_memory = trace_memory
+        self.log_path = log_path
+        self.records = list()
+        self._stack = list()
+        self._tracing = False # tracemalloc started by the profiler
+
+    def stage(self,name,file=None,case=None,path=None,rows=None):
+        '''Context manager measuring one stage.
+        Input:
+        name - name of the stage
+        file, case - (optional) names of measurement file and case
+        path - (optional) path of read file, its size is recorded as bytes
+        rows - (optional) number of processed rows, it can be also set inside the context (stage.rows = ...)
+        '''
+        if not self.enabled:
+            return null_stage
+        return profiled_stage(self,name,file,case,path,rows)
+
+    def enter(self,stage):
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._tracing = True
+            if self._stack: # peak of outer stage until now, reset_peak clears it
+                self._stack[-1].peak = max(self._stack[-1].peak,tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        self._stack.append(stage)
+
+    def exit(self,stage,duration):
+        self._stack.pop()
+        # outer - the stage is not nested in other stage of the same file (case), see summary
+        outer = [key for key in ('file','case') if getattr(stage,key) is not None and
+                 all(getattr(parent,key) != getattr(stage,key) for parent in self._stack)]
+        record = {'stage':stage.name,'file':stage.file,'case':stage.case,'depth':len(self._stack),'outer':outer,'time':duration,'rows':stage.rows,
+                  'bytes':None,'peak_memory':None}
+        if stage.path is not None:
+            try:
+                record['bytes'] = os.path.getsize(stage.path)
+            except OSError:
+                pass
+        if self.trace_memory and tracemalloc.is_tracing():
+            stage.peak = max(stage.peak,tracemalloc.get_traced_memory()[1])
+            record['peak_memory'] = stage.peak
+            if self._stack:
+                self._stack[-1].peak = max(self._stack[-1].peak,stage.peak)
+            elif self._tracing:
+                tracemalloc.stop()
+                self._tracing = False
+        self.add(record)
+
+    def add(self,record):
+        self.records.append(record)
+        if self.log_path is not None:
+            with open(self.log_path,'a') as f:
+                f.write(json.dumps(record)+'\n')
+
+    def add_records(self,records):
+        '''Add records measured by other profiler (e.g. in worker process), they are nested in current stage'''
+        for record in records:
+            record['depth'] += len(self._stack)
+            self.add(record)
+
+    def __getstate__(self):
+        '''Copy of the profiler sent to worker process is empty and doesn't write the log (records are sent back, see add_records)'''
+        state = self.__dict__.copy()
+        state.update(records=list(),_stack=list(),log_path=None)
+        return state
+
+    def summary(self,by='stage',top=None):
+        '''Records grouped by 'stage', 'file' or 'case', sorted by total time (hot spots first).
+        When grouped by file or case, only the outermost stages of the file (case) are counted, so nested stages are not counted twice.
+        Returns list of dictionaries: name, count, total time, mean time, rows, bytes, peak memory'''
+        records = [record for record in self.records if record[by] is not None and (by == 'stage' or by in record['outer'])]
+        groups = {}
+        for record in records:
+            group = groups.setdefault(record[by],{by:record[by],'count':0,'time':0.0,'rows':0,'bytes':0,'peak_memory':None})
+            group['count'] += 1
+            group['time'] += record['time']
+            group['rows'] += record['rows'] or 0
+            group['bytes'] += record['bytes'] or 0
+            if record['peak_memory'] is not None:
+                group['peak_memory'] = max(group['peak_memory'] or 0,record['peak_memory'])
+        result = sorted(groups.values(),key=lambda group: group['time'],reverse=True)
+        for group in result:
+            group['mean_time'] = group['time']/group['count']
+        return result[:top] if top is not None else result
+
+    def format_summary(self,by='stage',top=10):
+        '''Summary (see summary) as text table, share is part of time of all outermost stages'''
+        total = sum(record['time'] for record in self.records if record['depth'] == 0)
+        lines = ['%-32s %6s %10s %7s %12s %10s %12s' % (by,'count','time [s]','share','rows','MB read','peak MB')]
+        for group in self.summary(by,top):
+            lines.append('%-32s %6d %10.4f %6.1f%% %12d %10.2f %12s' % (
+                str(group[by])[-32:],group['count'],group['time'],100*group['time']/total if total else 0,group['rows'],group['bytes']/1024**2,
+                '-' if group['peak_memory'] is None else '%.2f' % (group['peak_memory']/1024**2)))
+        return '\n'.join(lines)
+
+    def save(self,path):
+        '''Save JSON profile with all records and summaries'''
+        profile = {'records':self.records,'summary':{by:self.summary(by) for by in ('stage','case','file')}}
+        with open(path,'w') as f:
+            json.dump(profile,f,indent=2)
+
+    def clear(self):
+        self.records = list()
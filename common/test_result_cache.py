@@ -0,0 +1,35 @@
+import os
+from result_cache import result_cache
+
+
+def write(path,text):
+    with open(path,'w') as f:
+        f.write(text)
+
+
+def test_entry_is_invalidated_by_modification_and_parameters(tmp_path):
+    cache = result_cache(str(tmp_path/'cache'))
+    measurement = str(tmp_path/'run_1.txt')
+    write(measurement,'1\t2\n')
+    cache.put(measurement,('window',100),{'result':1})
+    assert cache.get(measurement,('window',100)) == {'result':1}
+    assert cache.get(measurement,('window',50)) is None # other parameters
+
+    stat = os.stat(measurement)
+    os.utime(measurement,ns=(stat.st_atime_ns,stat.st_mtime_ns+10**9)) # the same size, newer file
+    assert cache.get(measurement,('window',100)) is None
+    cache.put(measurement,('window',100),{'result':2})
+    write(measurement,'1\t2\n3\t4\n') # other size
+    assert cache.get(measurement,('window',100)) is None
+
+
+def test_invalidate_and_evict(tmp_path):
+    cache = result_cache(str(tmp_path/'cache'),max_size=0)
+    files = [str(tmp_path/('run_%d.txt' % idx)) for idx in range(3)]
+    for path in files:
+        write(path,path)
+        cache.put(path,'p',list(range(100)))
+    assert cache.invalidate(files[0]) == 1
+    assert cache.get(files[0],'p') is None and cache.get(files[1],'p') is not None
+    cache.evict()
+    assert cache.entries() == []
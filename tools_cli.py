@@ -0,0 +1,325 @@
+'''
+Command line interface of both applications, intended for batch (headless) processing.
+
+Modules of the applications, pandas, openpyxl etc. are imported only by the subcommand which needs them,
+so starting of the script is fast (see cold start benchmark in benchmarks/run_benchmarks.py).
+
+Subcommands:
+python tools_cli.py ingest <direcory_list.json> [--output summary.json]      - read measurement cases, print mass flow rate and pressure
+python tools_cli.py report <direcory_list.json> <report.xlsx> [--write-only] - Excel report (Mass_flow_rate_analysis)
+python tools_cli.py report <direcory_list.json> <report.xlsx> --shard-cases 4 --workers 4 - index workbook and shards with 4 cases each
+python tools_cli.py fit <direcory_list.json> [--model sqrt] [--predict 3 4.5]   - characteristic curves of all cases, flow at given pressure [bar]
+python tools_cli.py sweep <direcory_list.json> [--window-sizes 10 50 100 1000] - compare window sizes, files are read once
+python tools_cli.py build-db <files_to_add.json> <database> [--update] [--catalog] - create or update database (add_file_to_database)
+python tools_cli.py query <catalog> [--case run_d%] [--range Pressure-1,[kPa] 400 600] - find runs in catalog of database
+python tools_cli.py stats <database> [--function mean std 90%] [--output database] - statistics of measurement cases
+python tools_cli.py plot <database> <output_dir> [--method minmax|lttb] [--workers 4] - images of mass flow rate plots of all cases
+python tools_cli.py convert <source database> <target database>              - convert between JSON and *.npz
+python tools_cli.py watch <direcory_list.json> [--interval 0.5]              - live analysis of growing files
+Use python tools_cli.py <subcommand> --help for all options.
+'''
+import os
+import sys
+import json
+import argparse
+
+root_dir = os.path.dirname(os.path.abspath(__file__))
+mfr_dir = os.path.join(root_dir,'Mass_flow_rate_analysis_v0.1')
+db_dir = os.path.join(root_dir,'add_file_to_database_v0.1')
+common_dir = os.path.join(root_dir,'common') # modules shared by both applications
+
+
+def use_application(app_dir):
+    '''Make modules of the application importable'''
+    if app_dir not in sys.path:
+        sys.path.insert(0,app_dir)
+
+def create_profiler(args):
+    '''stage_profiler (shared by both applications) if --profile is given, otherwise None'''
+    if not args.profile:
+        return None
+    use_application(common_dir)
+    from stage_profiler import stage_profiler
+    return stage_profiler(trace_memory=args.trace_memory)
+
+def save_profile(profiler,args):
+    if profiler is not None:
+        profiler.save(args.profile)
+        print(profiler.format_summary('stage'))
+        print('Profile saved into',args.profile)
+
+def create_analysis(args):
+    use_application(mfr_dir)
+    from MassFlowRateAnalysis import mass_flow_rate_analysis
+    profiler = create_profiler(args)
+    mfra = mass_flow_rate_analysis(args.weight_column,args.pressure_column,args.window_size,cache_dir=args.cache_dir,
+                                   chunk_rows=args.chunk_rows,profiler=profiler,prefetch=args.prefetch)
+    return mfra,profiler
+
+def analysis(args):
+    mfra,profiler = create_analysis(args)
+    results = mfra.data_container(args.dir_list,args.weight_column,args.pressure_column,args.window_size,args.workers)
+    return mfra,results,profiler
+
+def ingest(args):
+    mfra,results,profiler = analysis(args)
+    summary = {}
+    for idx,case in enumerate(results.cases_list):
+        summary[case] = {'Pressure, [bar]':(results.case_pressure(idx)/100000).tolist(),
+                         'Mass flow rate, [g/s]':results.case_mass_flow(idx).tolist(),
+                         'Windows':results.run_lengths(idx).tolist()}
+        print(case)
+        for pressure,mass_flow in zip(summary[case]['Pressure, [bar]'],summary[case]['Mass flow rate, [g/s]']):
+            print('    %10.4f bar %12.6f g/s' % (pressure,mass_flow))
+    if args.output:
+        with open(args.output,'w') as f:
+            json.dump(summary,f,indent=4)
+    save_profile(profiler,args)
+
+def report(args):
+    mfra,results,profiler = analysis(args)
+    if args.shard_cases is not None:
+        _,_,paths = mfra.save_report_sharded(args.report,results,cases_per_shard=args.shard_cases,workers=args.workers,
+                                             write_only=args.write_only)
+        print('Report saved into',args.report,'and',len(paths),'shards')
+    else:
+        mfra.save_report(args.report,results,write_only=args.write_only)
+        print('Report saved into',args.report)
+    save_profile(profiler,args)
+
+def fit(args):
+    mfra,profiler = create_analysis(args)
+    from CharacteristicCurves import curves_path
+    reference_pressure = args.reference_pressure*100000
+    if args.no_cache:
+        results = mfra.data_container(args.dir_list,args.weight_column,args.pressure_column,args.window_size,args.workers)
+        curves,cached = mfra.fit_curves(results,args.model,args.degree,reference_pressure),False
+    else: # valid curves file is used without reading of measurement files
+        cache_path = args.curves or curves_path(args.dir_list)
+        curves,cached = mfra.curves_from_dir(args.dir_list,args.weight_column,args.pressure_column,args.window_size,cache_path,
+                                             args.model,args.degree,reference_pressure,args.workers)
+    header,rows = curves.table()
+    print(('%-24s'+' %12s'*(len(header)-1)) % tuple(header))
+    for row in rows:
+        print(('%-24s'+' %12.6g'*(len(row)-1)) % tuple(row))
+    for pressure in args.predict or []:
+        print('Mass flow rate at %g bar [g/s]:' % pressure)
+        flow = curves.predict_all(pressure*100000)[:,0]
+        for case,value in zip(curves.cases_list,flow):
+            print('    %-20s %12.6f' % (case,value))
+    if not args.no_cache:
+        print('Curves loaded from' if cached else 'Curves saved into',cache_path)
+    save_profile(profiler,args)
+
+def sweep(args):
+    use_application(mfr_dir)
+    from MassFlowRateAnalysis import mass_flow_rate_analysis
+    profiler = create_profiler(args)
+    mfra = mass_flow_rate_analysis(args.weight_column,args.pressure_column,cache_dir=args.cache_dir,chunk_rows=args.chunk_rows,profiler=profiler)
+    case_files,pyramids = mfra.data_pyramids(args.dir_list,args.weight_column,args.pressure_column,args.workers)
+    summary = {}
+    print('%-32s %8s %8s %16s %16s' % ('case','window','stride','MFR avr [g/s]','range MFR [g/s]'))
+    for window_size in args.window_sizes:
+        results = mfra.pyramid_container(case_files,pyramids,window_size,args.stride)
+        for idx,case in enumerate(results.cases_list):
+            stats = results.case_stats(idx)
+            summary.setdefault(case,{})[window_size] = {'Mass flow rate - avr [g/s]':stats[:,3].tolist(),'Range of MFR [g/s]':stats[:,4].tolist()}
+            print('%-32s %8d %8s %16.6f %16.6f' % (case[-32:],window_size,args.stride or window_size,stats[:,3].mean(),stats[:,4].mean()))
+    if args.output:
+        with open(args.output,'w') as f:
+            json.dump(summary,f,indent=4)
+    save_profile(profiler,args)
+
+def build_db(args):
+    use_application(db_dir)
+    from final_add_files import final_add_files
+    with open(args.files_to_add) as f:
+        files_to_add = json.load(f)
+    from database_catalog import default_catalog_path
+    profiler = create_profiler(args)
+    catalog_path = default_catalog_path(args.database) if args.catalog else None
+    database = final_add_files(files_to_add,args.database,data_exists=args.update,workers=args.workers,cache_dir=args.cache_dir,
+                               compact_every=args.compact_every,profiler=profiler,catalog_path=catalog_path,prefetch=args.prefetch,
+                               compact=args.compact_runs)
+    from database_npz import database_keys
+    print('Cases in database:',sum(len(cases) for cases in database_keys(args.database).values())) # database can have only new cases (update)
+    save_profile(profiler,args)
+
+def stats(args):
+    use_application(db_dir)
+    from read_database_from_file import read_database_from_file
+    from add_statistics_to_case import add_statistics_to_case,statistic_name
+    from database_npz import save_database
+    database = read_database_from_file(args.database)
+    add_statistics_to_case(database,args.function)
+    if args.output:
+        save_database(database,args.output)
+        print('Database saved into',args.output)
+        return
+    for date,cases in database.items():
+        for case_name,case in cases.items():
+            for name in dict.fromkeys(statistic_name(fun) for fun in args.function):
+                print(date,'-',case_name,'-',name)
+                for row in case[name]['data']:
+                    print('    '+' '.join('%12.5g' % value for value in row))
+
+def query(args):
+    use_application(db_dir)
+    from database_catalog import database_catalog
+    if not os.path.exists(args.catalog):
+        raise OSError('Catalog not found: '+args.catalog)
+    case = args.case[0] if args.case is not None and len(args.case) == 1 else args.case
+    values = {(column,args.statistic):(float(minimum),float(maximum)) for column,minimum,maximum in args.range or []}
+    with database_catalog(args.catalog) as catalog:
+        runs = catalog.query(args.date_from,args.date_to,case,args.description,values,limit=args.limit)
+    for run in runs:
+        print(run['date'],run['case_name'],run['run_name'],run['nb_of_samples'],run['file_path'])
+    print('Runs found:',len(runs))
+
+def plot(args):
+    use_application(db_dir)
+    from read_database_from_file import read_database_from_file
+    from render_case_plots import render_case_plots
+    profiler = create_profiler(args)
+    database = read_database_from_file(args.database,lazy=args.database.lower().endswith('.npz'))
+    paths = render_case_plots(database,args.output_dir,args.function,not args.no_traces,args.points,args.method,workers=args.workers,
+                              dpi=args.dpi,image_format=args.format,profiler=profiler)
+    print('Images saved:',len(paths))
+    save_profile(profiler,args)
+
+def convert(args):
+    use_application(db_dir)
+    from database_npz import convert_database
+    convert_database(args.source,args.target)
+    print('Database saved into',args.target)
+
+def watch(args):
+    use_application(mfr_dir)
+    import time
+    from LiveMonitor import live_monitor
+    monitor = live_monitor(args.dir_list,args.weight_column,args.pressure_column,args.window_size)
+    monitor.run(args.interval,callback=lambda monitor,updates: print(time.strftime('%H:%M:%S'),'\n',monitor.summary(),flush=True),
+                duration=args.duration)
+
+def analysis_arguments(parser):
+    parser.add_argument('dir_list',help='*.json file with directories of measurement cases')
+    parser.add_argument('--window-size',type=int,default=100,help='samples per window (default 100)')
+    parser.add_argument('--weight-column',type=int,default=4,help='index of weight column (default 4)')
+    parser.add_argument('--pressure-column',type=int,default=3,help='index of pressure column (default 3)')
+
+def processing_arguments(parser):
+    parser.add_argument('--workers',type=int,help='number of worker processes')
+    parser.add_argument('--cache-dir',help='directory of on-disk cache of results')
+    parser.add_argument('--prefetch',type=int,help='number of files read ahead by background threads (slow, e.g. network storage)')
+    parser.add_argument('--profile',help='save timing profile into *.json file')
+    parser.add_argument('--trace-memory',action='store_true',help='measure peak memory in profile')
+
+def create_parser():
+    parser = argparse.ArgumentParser(description='Batch processing of measurement files',epilog='See module documentation for examples')
+    subparsers = parser.add_subparsers(dest='command',required=True)
+
+    sub = subparsers.add_parser('ingest',help='read measurement cases and print mass flow rate and pressure of files')
+    analysis_arguments(sub)
+    processing_arguments(sub)
+    sub.add_argument('--chunk-rows',type=int,help='read files in chunks of given number of rows')
+    sub.add_argument('--output',help='save summary into *.json file')
+    sub.set_defaults(handler=ingest)
+
+    sub = subparsers.add_parser('report',help='read measurement cases and save Excel report')
+    analysis_arguments(sub)
+    sub.add_argument('report',help='output *.xlsx file')
+    processing_arguments(sub)
+    sub.add_argument('--chunk-rows',type=int,help='read files in chunks of given number of rows')
+    sub.add_argument('--write-only',action='store_true',help='use streaming (write-only) workbook')
+    sub.add_argument('--shard-cases',type=int,help='sharded report: index workbook and one workbook per given number of cases, '
+                     'written by --workers processes')
+    sub.set_defaults(handler=report)
+
+    sub = subparsers.add_parser('fit',help='fit characteristic curves (mass flow rate - pressure) of all cases')
+    analysis_arguments(sub)
+    processing_arguments(sub)
+    sub.add_argument('--chunk-rows',type=int,help='read files in chunks of given number of rows')
+    sub.add_argument('--model',choices=['polynomial','sqrt','power'],default='polynomial',help='model of curves (default polynomial)')
+    sub.add_argument('--degree',type=int,default=2,help='degree of polynomial (default 2)')
+    sub.add_argument('--reference-pressure',type=float,default=1.01325,help='reference pressure of sqrt and power models [bar]')
+    sub.add_argument('--predict',type=float,nargs='+',help='print predicted mass flow rate of all cases at given pressures [bar]')
+    sub.add_argument('--curves',help='file of fitted curves (default <direcory_list>.curves.json), used without reading measurement files while they are unchanged')
+    sub.add_argument('--no-cache',action='store_true',help='do not read or save file of fitted curves')
+    sub.set_defaults(handler=fit)
+
+    sub = subparsers.add_parser('sweep',help='results of measurement cases for many window sizes, every file is read once')
+    sub.add_argument('dir_list',help='*.json file with directories of measurement cases')
+    sub.add_argument('--window-sizes',type=int,nargs='+',default=[10,50,100,1000],help='samples per window')
+    sub.add_argument('--stride',type=int,help='step between windows, by default equal to window size')
+    sub.add_argument('--weight-column',type=int,default=4,help='index of weight column (default 4)')
+    sub.add_argument('--pressure-column',type=int,default=3,help='index of pressure column (default 3)')
+    processing_arguments(sub)
+    sub.add_argument('--chunk-rows',type=int,help='read files in chunks of given number of rows')
+    sub.add_argument('--output',help='save statistics of files into *.json file')
+    sub.set_defaults(handler=sweep)
+
+    sub = subparsers.add_parser('build-db',help='create or update database from measurement files')
+    sub.add_argument('files_to_add',help='*.json file with dictionary of folders (see final_add_files)')
+    sub.add_argument('database',help='database file, *.json or *.npz')
+    sub.add_argument('--update',action='store_true',help='add only new cases to existing database')
+    sub.add_argument('--compact-every',type=int,default=8,help='join segments of database after given number of updates')
+    sub.add_argument('--catalog',action='store_true',help='create or update indexed catalog of runs (<database>.catalog.sqlite)')
+    sub.add_argument('--compact-runs',action='store_true',help='keep raw data of files in typed arrays while building (less memory, the same file)')
+    processing_arguments(sub)
+    sub.set_defaults(handler=build_db)
+
+    sub = subparsers.add_parser('query',help='find runs in catalog of database (see build-db --catalog)')
+    sub.add_argument('catalog',help='*.catalog.sqlite file')
+    sub.add_argument('--date-from',help='first date, e.g. 20220501')
+    sub.add_argument('--date-to',help='last date')
+    sub.add_argument('--case',nargs='+',help='case names, or one pattern with %% wildcard')
+    sub.add_argument('--description',help='description, or pattern with %% wildcard')
+    sub.add_argument('--range',nargs=3,action='append',metavar=('COLUMN','MIN','MAX'),help='range of statistic of column, can be repeated')
+    sub.add_argument('--statistic',default='mean',help='statistic used by --range (default mean)')
+    sub.add_argument('--limit',type=int)
+    sub.set_defaults(handler=query)
+
+    sub = subparsers.add_parser('stats',help='statistics of measurement cases')
+    sub.add_argument('database',help='database file, *.json or *.npz')
+    sub.add_argument('--function',nargs='+',default=['mean'],help='statistics, e.g. mean std min max median 90%% count')
+    sub.add_argument('--output',help='save database with statistics into file instead of printing them')
+    sub.set_defaults(handler=stats)
+
+    sub = subparsers.add_parser('plot',help='render mass flow rate plots of all cases into image files')
+    sub.add_argument('database',help='database file, *.json or *.npz')
+    sub.add_argument('output_dir',help='directory of images')
+    sub.add_argument('--function',default='mean',help='statistic of files (default mean)')
+    sub.add_argument('--no-traces',action='store_true',help='only averaged data, without raw traces')
+    sub.add_argument('--points',type=int,default=2000,help='maximum number of points of one trace (default 2000)')
+    sub.add_argument('--method',default='minmax',choices=['minmax','lttb'],help='decimation of raw traces')
+    sub.add_argument('--dpi',type=int,default=100)
+    sub.add_argument('--format',default='png',help='image format, e.g. png, svg, pdf')
+    sub.add_argument('--workers',type=int,help='number of worker processes')
+    sub.add_argument('--profile',help='save timing profile into *.json file')
+    sub.add_argument('--trace-memory',action='store_true',help='measure peak memory in profile')
+    sub.set_defaults(handler=plot)
+
+    sub = subparsers.add_parser('convert',help='convert database between JSON and *.npz format')
+    sub.add_argument('source')
+    sub.add_argument('target')
+    sub.set_defaults(handler=convert)
+
+    sub = subparsers.add_parser('watch',help='live analysis of measurement files which are still written')
+    analysis_arguments(sub)
+    sub.add_argument('--interval',type=float,default=0.5,help='time between checks [s]')
+    sub.add_argument('--duration',type=float,help='stop after given time [s], by default Ctrl+C')
+    sub.set_defaults(handler=watch)
+    return parser
+
+def main(argv=None):
+    args = create_parser().parse_args(argv)
+    try:
+        args.handler(args)
+    except (OSError,ValueError,KeyError) as e:
+        print('Error:',e,file=sys.stderr)
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())